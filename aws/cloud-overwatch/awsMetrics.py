@@ -0,0 +1,183 @@
+import os
+import json
+import time
+import bisect
+import functools
+import threading
+import contextlib
+
+ENABLED = os.getenv("METRICS_ENABLED", "true").lower() not in ("0", "false", "no")
+NAMESPACE = os.getenv("METRICS_NAMESPACE", "CloudOverwatch")
+FUNCTION = os.getenv("AWS_LAMBDA_FUNCTION_NAME", "local")
+
+# Latency histogram bucket upper bounds (ms); the last bucket is open-ended
+BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+# Error codes AWS services use for throttling; the one list every retry / backoff path checks
+THROTTLE_CODES = {
+    "Throttling", "ThrottlingException", "ThrottledException", "RequestThrottled",
+    "RequestLimitExceeded", "TooManyRequestsException", "SlowDown",
+    "ProvisionedThroughputExceededException", "RequestThrottledException",
+}
+
+# Module-level aggregates, flushed (and reset) once per invocation
+_calls = {}         # (service, operation) -> counters + histogram
+_phases = {}        # phase -> {"wallMs", "calls", "apiMs"}
+_lock = threading.Lock()
+_local = threading.local()
+
+
+# --------------------------------------------------------------------------- #
+# botocore Hooks
+# --------------------------------------------------------------------------- #
+def instrument(client):
+    """Register before-call / after-call hooks on a boto3 client (no-op for stubs or when disabled)."""
+    events = getattr(getattr(client, "meta", None), "events", None)
+    if not ENABLED or events is None:
+        return client
+    # unique_id keeps a client from being hooked twice
+    events.register("before-call.*.*", _before_call, unique_id="overwatch-metrics-before")
+    events.register("after-call.*.*", _after_call, unique_id="overwatch-metrics-after")
+    return client
+
+
+def _before_call(context, **kwargs):
+    context["overwatchStartedAt"] = time.perf_counter()
+
+
+def _after_call(model, parsed, context, **kwargs):
+    started = context.get("overwatchStartedAt")
+    if started is None:
+        return
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    error = (parsed or {}).get("Error", {}).get("Code")
+    retries = (parsed or {}).get("ResponseMetadata", {}).get("RetryAttempts", 0)
+    record(model.service_model.service_name, model.name, elapsed_ms, error, retries)
+
+
+def record(service, operation, elapsed_ms, error=None, retries=0):
+    """Add one API call to the aggregates, attributed to the calling thread's current phase."""
+    phase_name = getattr(_local, "phase", None) or "other"
+    with _lock:
+        stats = _calls.get((service, operation))
+        if stats is None:
+            stats = _calls[(service, operation)] = {
+                "calls": 0, "errors": 0, "throttles": 0, "retries": 0, "totalMs": 0.0, "maxMs": 0.0,
+                "buckets": [0] * (len(BUCKETS_MS) + 1),
+            }
+        stats["calls"] += 1
+        stats["errors"] += 1 if error else 0
+        stats["throttles"] += 1 if error in THROTTLE_CODES else 0
+        stats["retries"] += retries
+        stats["totalMs"] += elapsed_ms
+        stats["maxMs"] = max(stats["maxMs"], elapsed_ms)
+        stats["buckets"][bisect.bisect_left(BUCKETS_MS, elapsed_ms)] += 1
+
+        totals = _phases.setdefault(phase_name, {"wallMs": 0.0, "calls": 0, "apiMs": 0.0})
+        totals["calls"] += 1
+        totals["apiMs"] += elapsed_ms
+
+
+# --------------------------------------------------------------------------- #
+# Phases
+# --------------------------------------------------------------------------- #
+@contextlib.contextmanager
+def phase(name):
+    """
+    Attribute API calls made on this thread to `name` and add the block's wall
+    time to it. Phases: assume-role, tagging-fetch, liveness, persist, delete, notify.
+    """
+    outer = getattr(_local, "phase", None)
+    _local.phase = name
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _local.phase = outer
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if ENABLED:
+            with _lock:
+                _phases.setdefault(name, {"wallMs": 0.0, "calls": 0, "apiMs": 0.0})["wallMs"] += elapsed_ms
+
+
+# --------------------------------------------------------------------------- #
+# Embedded Metric Format Output
+# --------------------------------------------------------------------------- #
+def snapshot(reset=False):
+    with _lock:
+        calls = {key: dict(stats, buckets=list(stats["buckets"])) for key, stats in _calls.items()}
+        phases = {name: dict(totals) for name, totals in _phases.items()}
+        if reset:
+            _calls.clear()
+            _phases.clear()
+    return calls, phases
+
+
+def emf_lines(function=FUNCTION, reset=True):
+    """One EMF JSON document per (service, operation) and one per phase."""
+    calls, phases = snapshot(reset)
+    timestamp = int(time.time() * 1000)
+    lines = []
+    for (service, operation), stats in sorted(calls.items()):
+        lines.append(_emf(timestamp, ["Function", "Service", "Operation"], {
+            "Calls": (stats["calls"], "Count"),
+            "Errors": (stats["errors"], "Count"),
+            "Throttles": (stats["throttles"], "Count"),
+            "Retries": (stats["retries"], "Count"),
+            "LatencyAvg": (round(stats["totalMs"] / stats["calls"], 2), "Milliseconds"),
+            "LatencyP50": (_percentile(stats["buckets"], 0.50, stats["maxMs"]), "Milliseconds"),
+            "LatencyP90": (_percentile(stats["buckets"], 0.90, stats["maxMs"]), "Milliseconds"),
+            "LatencyP99": (_percentile(stats["buckets"], 0.99, stats["maxMs"]), "Milliseconds"),
+            "LatencyMax": (round(stats["maxMs"], 2), "Milliseconds"),
+        }, {"Function": function, "Service": service, "Operation": operation,
+            "latencyHistogram": {"bucketsMs": BUCKETS_MS, "counts": stats["buckets"]}}))
+    for name, totals in sorted(phases.items()):
+        lines.append(_emf(timestamp, ["Function", "Phase"], {
+            "PhaseWallMs": (round(totals["wallMs"], 2), "Milliseconds"),
+            "PhaseApiMs": (round(totals["apiMs"], 2), "Milliseconds"),
+            "PhaseCalls": (totals["calls"], "Count"),
+        }, {"Function": function, "Phase": name}))
+    return lines
+
+
+def flush(function=FUNCTION):
+    """Print the EMF lines for everything recorded since the last flush; CloudWatch Logs extracts them."""
+    for line in emf_lines(function):
+        print(line)
+
+
+def emits_metrics(handler):
+    """Decorator for lambda_handler: flush metrics after every invocation, however it returns."""
+    @functools.wraps(handler)
+    def wrapper(event, context):
+        try:
+            return handler(event, context)
+        finally:
+            if ENABLED:
+                flush(getattr(context, "function_name", None) or FUNCTION)
+    return wrapper
+
+
+def _emf(timestamp, dimensions, metrics, properties):
+    return json.dumps({
+        "_aws": {
+            "Timestamp": timestamp,
+            "CloudWatchMetrics": [{
+                "Namespace": NAMESPACE,
+                "Dimensions": [dimensions],
+                "Metrics": [{"Name": name, "Unit": unit} for name, (_, unit) in metrics.items()],
+            }],
+        },
+        **properties,
+        **{name: value for name, (value, _) in metrics.items()},
+    })
+
+
+def _percentile(buckets, q, max_ms):
+    """Upper bound of the bucket holding the q-th call (capped at the observed max)."""
+    target = q * sum(buckets)
+    seen = 0
+    for n, count in enumerate(buckets):
+        seen += count
+        if seen >= target and count:
+            return round(min(BUCKETS_MS[n] if n < len(BUCKETS_MS) else max_ms, max_ms), 2)
+    return round(max_ms, 2)
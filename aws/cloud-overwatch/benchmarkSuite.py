@@ -0,0 +1,186 @@
+import io
+import sys
+import json
+import time
+import argparse
+import datetime
+import platform
+import tracemalloc
+import contextlib
+import clientPool
+import credentialCache
+import deletionExecutor
+import overwatchCore as core
+import subscriptionIndex
+import scanResourcesLambda
+import deleteNotifyLambda
+import getResourcesLambda
+from fakeAws import FakeAws
+
+ALL_REGIONS = ["ap-south-1", "ap-south-2", "ap-southeast-1", "ap-northeast-1",
+               "ap-southeast-2", "ap-east-1", "me-south-1", "eu-west-1"]
+FAKE_TOPIC_ARN = "arn:aws:sns:ap-south-1:999999999999:cloud-overwatch"
+# Metrics compared between runs (lower is better for all of them)
+COMPARED = ("wallMs", "awsCalls", "readUnits", "writeUnits", "peakMemoryMB")
+
+
+# --------------------------------------------------------------------------- #
+# One Fleet Size
+# --------------------------------------------------------------------------- #
+def run_case(accounts, regions, resources, due_fraction=0.2, latency=0.0, memory=True):
+    """
+    Seed a fake fleet and drive scan (full), rescan (incremental), get (page
+    through every active record), delete (all due items) and track (confirm the
+    long-running deletes) against it.
+    """
+    fake = FakeAws(latency=latency)
+    fake.seed(accounts, regions, resources, due_fraction)
+    real = (clientPool.boto3, credentialCache.boto3, core.SNS_TOPIC_ARN)
+    clientPool.boto3 = credentialCache.boto3 = fake
+    core.SNS_TOPIC_ARN = FAKE_TOPIC_ARN
+    _reset_caches()
+
+    phases = {}
+    try:
+        phases["scan"] = _phase(fake, memory, lambda: scanResourcesLambda.lambda_handler(
+            {"scanMode": "full", "regions": regions}, None))
+        phases["rescan"] = _phase(fake, memory, lambda: scanResourcesLambda.lambda_handler(
+            {"scanMode": "incremental", "regions": regions}, None))
+        phases["get"] = _phase(fake, memory, lambda: _get_all())
+        phases["delete"] = _phase(fake, memory, lambda: deleteNotifyLambda.lambda_handler({}, None))
+        # Long-running deletes finish between runs; the next run confirms them
+        fake.complete_deletes()
+        phases["track"] = _phase(fake, memory, lambda: deleteNotifyLambda.lambda_handler({}, None))
+    finally:
+        clientPool.boto3, credentialCache.boto3, core.SNS_TOPIC_ARN = real
+        _reset_caches()
+
+    return {"accounts": accounts, "regions": len(regions), "resourcesPerRegion": resources,
+            "fleetSize": accounts * len(regions) * resources, "phases": phases}
+
+
+def _phase(fake, memory, run):
+    fake.reset_counters()
+    if memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        response = run()
+    wall_ms = (time.perf_counter() - started) * 1000
+    peak = tracemalloc.get_traced_memory()[1] if memory else None
+    if memory:
+        tracemalloc.stop()
+
+    report = fake.report()
+    return {
+        "statusCode": response["statusCode"],
+        "wallMs": round(wall_ms, 1),
+        "awsCalls": report["awsCalls"],
+        "readUnits": report["dynamodbCapacity"]["readUnits"],
+        "writeUnits": report["dynamodbCapacity"]["writeUnits"],
+        "peakMemoryMB": round(peak / 2 ** 20, 2) if peak is not None else None,
+        "callsPerApi": report["callsPerApi"],
+        "dynamodbCapacity": report["dynamodbCapacity"]["byTable"],
+        "result": _headline(json.loads(response["body"])),
+    }
+
+
+def _get_all():
+    """Page through every active record the way the dashboard would."""
+    token, pages, count = None, 0, 0
+    while True:
+        resp = getResourcesLambda.lambda_handler({"queryStringParameters": {"limit": "1000", "nextToken": token}}, None)
+        if resp["statusCode"] != 200:
+            return resp
+        body = json.loads(resp["body"])
+        pages += 1
+        count += body["count"]
+        token = body.get("nextToken")
+        if not token:
+            return {"statusCode": 200, "body": json.dumps({"pages": pages, "count": count})}
+
+
+def _headline(body):
+    """Keep the scalar fields of a handler response so the JSON stays readable."""
+    return {k: v for k, v in body.items() if isinstance(v, (int, float, str)) and not isinstance(v, bool)}
+
+
+def _reset_caches():
+    credentialCache.invalidate_all()
+    clientPool.clear()
+    core.reset()
+    subscriptionIndex.invalidate()
+    deletionExecutor._buckets.clear()
+
+
+# --------------------------------------------------------------------------- #
+# Suite and Comparison
+# --------------------------------------------------------------------------- #
+def run_suite(account_sizes, region_count=4, resources=5, due_fraction=0.2, latency=0.0, memory=True):
+    regions = ALL_REGIONS[:region_count]
+    cases = []
+    for accounts in account_sizes:
+        print(f"Benchmarking {accounts} accounts × {len(regions)} regions × {resources} resources...", file=sys.stderr)
+        cases.append(run_case(accounts, regions, resources, due_fraction, latency, memory))
+    return {
+        "meta": {
+            "startedAt": datetime.datetime.utcnow().isoformat() + "Z",
+            "python": platform.python_version(),
+            "latency": latency,
+            "dueFraction": due_fraction,
+            "tracemalloc": memory,
+        },
+        "cases": cases,
+    }
+
+
+def compare(old, new, threshold=0.10):
+    """Rows of (case, phase, metric, old, new, change) for cases present in both runs; flags regressions."""
+    def index(run):
+        return {(c["accounts"], c["regions"], c["resourcesPerRegion"]): c for c in run["cases"]}
+
+    old_cases, rows = index(old), []
+    for key, case in index(new).items():
+        if key not in old_cases:
+            continue
+        for phase, metrics in case["phases"].items():
+            before = old_cases[key]["phases"].get(phase, {})
+            for metric in COMPARED:
+                if before.get(metric) is None or metrics.get(metric) is None:
+                    continue
+                change = (metrics[metric] - before[metric]) / before[metric] if before[metric] else 0.0
+                rows.append({"case": "x".join(map(str, key)), "phase": phase, "metric": metric,
+                             "old": before[metric], "new": metrics[metric], "change": round(change, 3),
+                             "regression": change > threshold})
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark scan / get / delete handlers against an in-process AWS fake.")
+    parser.add_argument("--accounts", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--regions", type=int, default=4)
+    parser.add_argument("--resources", type=int, default=5, help="tagged resources per account/region")
+    parser.add_argument("--due-fraction", type=float, default=0.2)
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated seconds per AWS call")
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc (faster, no peak memory)")
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two results files")
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative increase flagged as a regression")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as f_old, open(args.compare[1]) as f_new:
+            rows = compare(json.load(f_old), json.load(f_new), args.threshold)
+        for row in rows:
+            flag = "  REGRESSION" if row["regression"] else ""
+            print(f"{row['case']:>12} {row['phase']:>7} {row['metric']:>12}: "
+                  f"{row['old']:>10} -> {row['new']:>10} ({row['change']:+.1%}){flag}")
+        sys.exit(1 if any(row["regression"] for row in rows) else 0)
+
+    results = run_suite(args.accounts, args.regions, args.resources, args.due_fraction, args.latency,
+                        not args.no_memory)
+    output = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output)
+    print(output)
@@ -0,0 +1,131 @@
+import os
+import time
+import datetime
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import scanState
+
+PURGE_WORKERS = int(os.getenv("PURGE_WORKERS", "8"))
+# DeleteObjects and ListObjectVersions both top out at 1000 keys per call
+BATCH_SIZE = 1000
+PROGRESS_EVERY_PAGES = 10
+
+
+# --------------------------------------------------------------------------- #
+# Checkpoint Persistence (OverwatchState table)
+# --------------------------------------------------------------------------- #
+def _checkpoint_key(account_id, bucket):
+    return f"purge#{account_id}#{bucket}"
+
+
+def load_checkpoint(account_id, bucket):
+    item = scanState.state_table().get_item(Key={"stateKey": _checkpoint_key(account_id, bucket)}).get("Item")
+    return item or {}
+
+
+def save_checkpoint(account_id, bucket, key_marker, version_marker, deleted):
+    scanState.state_table().put_item(Item={
+        "stateKey": _checkpoint_key(account_id, bucket),
+        "accountId": account_id,
+        "bucket": bucket,
+        "keyMarker": key_marker,
+        "versionIdMarker": version_marker,
+        "deleted": deleted,
+        "updatedAt": datetime.datetime.utcnow().isoformat() + "Z",
+    })
+
+
+def clear_checkpoint(account_id, bucket):
+    scanState.state_table().delete_item(Key={"stateKey": _checkpoint_key(account_id, bucket)})
+
+
+# --------------------------------------------------------------------------- #
+# Bucket Purge
+# --------------------------------------------------------------------------- #
+def purge_bucket(s3, bucket, account_id, deadline=None, workers=PURGE_WORKERS):
+    """
+    Delete every object version and delete marker in `bucket`.
+
+    Pages of up to 1000 versions are listed in order and handed to `workers`
+    parallel DeleteObjects calls. After each page, and every page before it,
+    has been deleted, the listing markers are checkpointed. An interrupted
+    purge, whether it timed out or stopped at `deadline` (a time.monotonic()
+    value), resumes from the last checkpoint on the next call.
+
+    Returns {"complete", "deleted", "errors", "pages", "resumed"}.
+    """
+    checkpoint = load_checkpoint(account_id, bucket)
+    key_marker = checkpoint.get("keyMarker")
+    version_marker = checkpoint.get("versionIdMarker")
+    deleted = int(checkpoint.get("deleted", 0))
+    stats = {"complete": False, "deleted": deleted, "errors": 0, "pages": 0, "resumed": bool(checkpoint)}
+    if checkpoint:
+        print(f"Resuming purge of {bucket} after {deleted} deleted versions (key marker {key_marker})")
+
+    in_flight = {}          # future -> page number
+    next_markers = {}       # page number -> markers to resume after that page
+    done_pages = set()
+    committed = -1          # highest page with every page <= it deleted
+    page_no = -1
+    listing_done = False
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            # Keep up to 2x workers pages in flight; stop listing if we are out of time
+            while not listing_done and len(in_flight) < workers * 2:
+                if deadline and time.monotonic() >= deadline:
+                    break
+                params = {"Bucket": bucket, "MaxKeys": BATCH_SIZE}
+                if key_marker:
+                    params["KeyMarker"] = key_marker
+                if version_marker:
+                    params["VersionIdMarker"] = version_marker
+                page = s3.list_object_versions(**params)
+
+                objects = [{"Key": v["Key"], "VersionId": v["VersionId"]}
+                           for v in page.get("Versions", []) + page.get("DeleteMarkers", [])]
+                page_no += 1
+                key_marker = page.get("NextKeyMarker")
+                version_marker = page.get("NextVersionIdMarker")
+                next_markers[page_no] = (key_marker, version_marker)
+                in_flight[pool.submit(_delete_batch, s3, bucket, objects)] = page_no
+                listing_done = not page.get("IsTruncated")
+
+            if not in_flight:
+                break
+
+            finished, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+            for future in finished:
+                done_pages.add(in_flight.pop(future))
+                ok, errors = future.result()
+                stats["deleted"] += ok
+                stats["errors"] += errors
+                stats["pages"] += 1
+
+            # Advance the checkpoint over the contiguous run of finished pages
+            advanced = False
+            while committed + 1 in done_pages:
+                committed += 1
+                advanced = True
+            if advanced and committed in next_markers:
+                resume_key, resume_version = next_markers[committed]
+                if resume_key or resume_version:
+                    save_checkpoint(account_id, bucket, resume_key, resume_version, stats["deleted"])
+                if stats["pages"] % PROGRESS_EVERY_PAGES == 0:
+                    print(f"Purging {bucket}: {stats['deleted']} versions deleted, {stats['pages']} pages")
+
+    stats["complete"] = listing_done and committed == page_no
+    if stats["complete"]:
+        # Keys that failed to delete sit before the last marker; start afresh next time
+        clear_checkpoint(account_id, bucket)
+    print(f"Purge of {bucket}: {stats}")
+    return stats
+
+
+def _delete_batch(s3, bucket, objects):
+    if not objects:
+        return 0, 0
+    resp = s3.delete_objects(Bucket=bucket, Delete={"Objects": objects, "Quiet": True})
+    errors = resp.get("Errors", [])
+    for err in errors[:3]:
+        print(f"Failed to delete s3://{bucket}/{err.get('Key')}: {err.get('Message')}")
+    return len(objects) - len(errors), len(errors)
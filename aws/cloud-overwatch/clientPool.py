@@ -0,0 +1,146 @@
+import os
+import threading
+from collections import OrderedDict
+import boto3
+import awsMetrics
+
+# Pooled clients kept across warm invocations; least recently used are dropped beyond this
+MAX_POOLED_CLIENTS = int(os.getenv("CLIENT_POOL_MAX_CLIENTS", "256"))
+
+# Module-level pool survives across warm Lambda invocations.
+# Keyed by (accountId, region, kind, service); accountId None means the Lambda's own credentials.
+_clients = OrderedDict()
+_identities = {}    # accountId -> AccessKeyId the pooled clients were built with
+_lock = threading.Lock()
+# One botocore session (and one copy of the service models) shared by every client;
+# credentials are passed per client. Sessions are not thread-safe, so creation is serialised.
+_session = None
+_create_lock = threading.Lock()
+
+STATS = {"hits": 0, "misses": 0, "rotations": 0, "evictions": 0}
+
+
+# --------------------------------------------------------------------------- #
+# Pooled Client / Resource Access
+# --------------------------------------------------------------------------- #
+def get_client(account_id, region, service, creds=None):
+    """Return a pooled boto3 client, creating it on first use."""
+    return _get(account_id, region, service, creds, "client")
+
+
+def get_resource(account_id, region, service, creds=None):
+    """Return a pooled boto3 resource, creating it on first use."""
+    return _get(account_id, region, service, creds, "resource")
+
+
+def new_client(region, service, creds=None):
+    """
+    An unpooled client from the shared session, for one-off credentials that
+    would only churn the pool (e.g. verifying a new connection). Dropped by the caller.
+    """
+    with _create_lock:
+        return _shared_session().client(service, region_name=region, **_credential_kwargs(creds))
+
+
+class LazyClients:
+    """Mapping-style view over the pool for one account/region: clients["ec2"] builds ec2 only when asked."""
+
+    def __init__(self, account_id, region, creds=None):
+        self.account_id = account_id
+        self.region = region
+        self.creds = creds
+
+    def __getitem__(self, service):
+        return get_client(self.account_id, self.region, service, self.creds)
+
+
+def drop_account(account_id):
+    with _lock:
+        _drop(account_id)
+
+
+def clear():
+    with _lock:
+        _clients.clear()
+        _identities.clear()
+    global _session
+    with _create_lock:
+        _session = None
+
+
+def pool_stats():
+    with _lock:
+        stats = dict(STATS)
+        stats["pooledClients"] = len(_clients)
+    return stats
+
+
+# --------------------------------------------------------------------------- #
+# Internals
+# --------------------------------------------------------------------------- #
+def _get(account_id, region, service, creds, kind):
+    key_id = creds["AccessKeyId"] if creds else None
+    key = (account_id, region, kind, service)
+
+    with _lock:
+        # Credentials rotated: everything built with the old key is stale
+        if account_id in _identities and _identities[account_id] != key_id:
+            STATS["rotations"] += 1
+            _drop(account_id)
+        _identities[account_id] = key_id
+
+        client = _clients.get(key)
+        if client is not None:
+            _clients.move_to_end(key)
+            STATS["hits"] += 1
+            return client
+
+    with _create_lock:
+        with _lock:
+            client = _clients.get(key)
+            if client is not None:
+                STATS["hits"] += 1
+                return client
+        client = getattr(_shared_session(), kind)(service, region_name=region, **_credential_kwargs(creds))
+        # Every pooled client reports per-operation latency / throttles
+        awsMetrics.instrument(client if kind == "client" else client.meta.client)
+
+    with _lock:
+        STATS["misses"] += 1
+        if _identities.get(account_id) == key_id:
+            _clients.setdefault(key, client)
+            client = _clients[key]
+            _evict()
+    return client
+
+
+def _shared_session():
+    # Called under _create_lock
+    global _session
+    if _session is None:
+        _session = boto3.session.Session()
+    return _session
+
+
+def _credential_kwargs(creds):
+    if not creds:
+        return {}
+    return {
+        "aws_access_key_id": creds["AccessKeyId"],
+        "aws_secret_access_key": creds["SecretAccessKey"],
+        "aws_session_token": creds["SessionToken"],
+    }
+
+
+def _evict():
+    while len(_clients) > MAX_POOLED_CLIENTS:
+        (account_id, *_), _ = _clients.popitem(last=False)
+        STATS["evictions"] += 1
+        if not any(k[0] == account_id for k in _clients):
+            _identities.pop(account_id, None)
+
+
+def _drop(account_id):
+    _identities.pop(account_id, None)
+    for key in [k for k in _clients if k[0] == account_id]:
+        del _clients[key]
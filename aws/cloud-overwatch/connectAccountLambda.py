@@ -1,30 +1,162 @@
+import os
 import json
-import boto3
+import time
+import random
+from concurrent.futures import ThreadPoolExecutor
 from botocore.exceptions import ClientError
 import datetime
-import os
+import awsMetrics
+import clientPool
+import overwatchCore as core
+import subscriptionIndex
+from scanWriter import batch_put_unwritten
 
-# AWS clients
-dynamo = boto3.resource('dynamodb', region_name='ap-south-1')
-sts = boto3.client("sts")
-sns = boto3.client('sns')
+# Clients, tables and config come from overwatchCore: built on first use, reused while warm
 
-# Environment variables
-TABLE_NAME = os.environ.get('CONNECTED_ACCOUNTS_TABLE', 'ConnectedAccounts')
-SNS_TOPIC_ARN = os.environ.get('SNS_TOPIC_ARN')
+# Bulk onboarding: concurrent role verifications (kept low so STS isn't throttled)
+CONNECT_WORKERS = int(os.getenv("CONNECT_WORKERS", "8"))
+MAX_BULK_ENTRIES = int(os.getenv("CONNECT_MAX_BULK_ENTRIES", "1000"))
+ASSUME_ROLE_RETRIES = 5
+REQUIRED_FIELDS = ("roleArn", "externalId", "email")
 
-table = dynamo.Table(TABLE_NAME)
 
+# --------------------------------------------------------------------------- #
+# Helper: Verify a Role Connection
+# --------------------------------------------------------------------------- #
+def verify_connection(role_arn, external_id):
+    """Assume the role and return the account it resolves to; throttled STS calls are retried with backoff."""
+    for attempt in range(ASSUME_ROLE_RETRIES):
+        try:
+            with awsMetrics.phase("assume-role"):
+                creds = core.sts().assume_role(
+                    RoleArn=role_arn,
+                    RoleSessionName="cloud-overwatch-connection",
+                    ExternalId=external_id
+                )["Credentials"]
+                # One-off check: an unpooled client (built on the shared session, serialised), dropped
+                # once the identity is read
+                assumed_sts = clientPool.new_client(core.DB_REGION, "sts", creds)
+                return assumed_sts.get_caller_identity()["Account"]
+        except ClientError as e:
+            if e.response["Error"]["Code"] not in awsMetrics.THROTTLE_CODES or attempt == ASSUME_ROLE_RETRIES - 1:
+                raise
+            time.sleep(min(2.0, 0.1 * (2 ** attempt)) * random.uniform(0.5, 1.0))
+
+
+# --------------------------------------------------------------------------- #
+# Bulk Onboarding
+# --------------------------------------------------------------------------- #
+def connect_bulk(entries):
+    """
+    Verify `entries` ({roleArn, externalId, email}) concurrently, store the
+    connected accounts with BatchWriteItem and subscribe each distinct email
+    once. Returns one result per entry, in input order.
+    """
+    results = [None] * len(entries)
+    valid = []
+    for n, entry in enumerate(entries):
+        entry = entry if isinstance(entry, dict) else {}
+        missing = [field for field in REQUIRED_FIELDS if not entry.get(field)]
+        if missing:
+            results[n] = _entry_result(n, entry, "invalid", error=f"missing {', '.join(missing)}")
+        elif len(entry["roleArn"].split(":")) < 6:
+            results[n] = _entry_result(n, entry, "invalid", error="roleArn is not an IAM role ARN")
+        else:
+            valid.append(n)
+
+    def verify(n):
+        try:
+            return n, verify_connection(entries[n]["roleArn"], entries[n]["externalId"]), None
+        except ClientError as e:
+            return n, None, e.response["Error"]["Message"]
+        except Exception as e:
+            return n, None, str(e)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(CONNECT_WORKERS, len(valid)))) as pool:
+        verified = list(pool.map(verify, valid))
+
+    # One record per account; a later entry for an already-connected account is reported as a duplicate
+    connected_at = datetime.datetime.utcnow().isoformat() + "Z"
+    records = {}
+    for n, account_id, error in verified:
+        entry = entries[n]
+        if error:
+            results[n] = _entry_result(n, entry, "failed", error=error)
+        elif account_id in records:
+            results[n] = _entry_result(n, entry, "duplicate", account_id,
+                                       error=f"same account as entry {records[account_id][0]}")
+        else:
+            records[account_id] = (n, {
+                "accountId": account_id,
+                "roleArn": entry["roleArn"],
+                "externalId": entry["externalId"],
+                "connectedAt": connected_at,
+                "email": entry["email"]
+            })
+
+    with awsMetrics.phase("persist"):
+        unwritten = {item["accountId"] for item in batch_put_unwritten(core.accounts_table(),
+                                                                       [record for _, record in records.values()])}
+    for account_id, (n, _) in records.items():
+        if account_id in unwritten:
+            results[n] = _entry_result(n, entries[n], "failed", account_id, error="Failed to store connection")
+        else:
+            results[n] = _entry_result(n, entries[n], "connected", account_id)
+
+    # Several accounts often share an owner: one subscription per distinct email
+    emails = {}
+    for result in results:
+        if result["status"] == "connected":
+            emails.setdefault(result["email"].lower(), result["email"])
+
+    def subscribe(email):
+        try:
+            with awsMetrics.phase("notify"):
+                sent = subscriptionIndex.ensure_subscription(core.sns(), core.SNS_TOPIC_ARN, email)
+            return "pending confirmation" if sent else "already subscribed"
+        except Exception as e:
+            print(f"SNS subscription error for {email}: {e}")
+            return "failed"
+
+    with ThreadPoolExecutor(max_workers=max(1, min(CONNECT_WORKERS, len(emails)))) as pool:
+        subscriptions = dict(zip(emails, pool.map(subscribe, emails.values())))
+    for result in results:
+        if result["status"] == "connected":
+            result["subscriptionStatus"] = subscriptions[result["email"].lower()]
+
+    summary = {"entries": len(entries), "subscriptionsSent": sum(1 for s in subscriptions.values()
+                                                                 if s == "pending confirmation")}
+    for result in results:
+        summary[result["status"]] = summary.get(result["status"], 0) + 1
+    return {"summary": summary, "results": results}
+
+
+def _entry_result(index, entry, status, account_id=None, error=None):
+    result = {"index": index, "roleArn": entry.get("roleArn"), "email": entry.get("email"), "status": status}
+    if account_id:
+        result["accountId"] = account_id
+    if error:
+        result["error"] = error
+    return result
+
+
+@awsMetrics.emits_metrics
 def lambda_handler(event, context):
     try:
         # Universal body parsing (works for both API Gateway & direct invokes)
-        raw_body = event.get("body", event)
-        if isinstance(raw_body, str):
-            body = json.loads(raw_body)
-        elif isinstance(raw_body, dict):
-            body = raw_body
-        else:
-            body = {}
+        body = core.parse_body(event)
+
+        # Bulk mode: {"accounts": [{roleArn, externalId, email}, ...]}
+        if "accounts" in body:
+            entries = body["accounts"]
+            if not isinstance(entries, list) or not entries or len(entries) > MAX_BULK_ENTRIES:
+                return {
+                    "statusCode": 400,
+                    "body": json.dumps({
+                        "error": f"accounts must be a list of 1 to {MAX_BULK_ENTRIES} entries"
+                    })
+                }
+            return {"statusCode": 200, "body": json.dumps(connect_bulk(entries))}
 
         # Extract parameters
         role_arn = body.get("roleArn")
@@ -39,24 +171,8 @@ def lambda_handler(event, context):
                 })
             }
 
-        # Step 1: Assume the user’s role (to verify connection)
-        response = sts.assume_role(
-            RoleArn=role_arn,
-            RoleSessionName="cloud-overwatch-connection",
-            ExternalId=external_id
-        )
-
-        creds = response["Credentials"]
-
-        # Step 2: Verify connection identity
-        assumed_sts = boto3.client(
-            "sts",
-            aws_access_key_id=creds["AccessKeyId"],
-            aws_secret_access_key=creds["SecretAccessKey"],
-            aws_session_token=creds["SessionToken"]
-        )
-        identity = assumed_sts.get_caller_identity()
-        account_id = identity["Account"]
+        # Step 1 & 2: Assume the user’s role and verify the connection identity
+        account_id = verify_connection(role_arn, external_id)
 
         # Step 3: Prepare connection record
         record = {
@@ -68,12 +184,12 @@ def lambda_handler(event, context):
         }
 
         # Step 4: Store connection in DynamoDB
-        table.put_item(Item=record)
+        core.accounts_table().put_item(Item=record)
 
         # Step 5: Subscribe user's email to SNS topic
         try:
-            sns_response = sns.subscribe(
-                TopicArn=SNS_TOPIC_ARN,
+            sns_response = core.sns().subscribe(
+                TopicArn=core.SNS_TOPIC_ARN,
                 Protocol='email',
                 Endpoint=user_email
             )
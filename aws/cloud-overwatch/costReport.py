@@ -0,0 +1,174 @@
+import os
+import csv
+import sys
+import json
+import argparse
+import datetime
+import snapshotExport
+
+try:
+    import numpy as np
+except ImportError:  # Falls back to a plain loop over each row group
+    np = None
+
+# Local price table (JSON) overriding the estimates below: {"services": {...}, "regionMultipliers": {...}}
+PRICE_TABLE_PATH = os.getenv("PRICE_TABLE_PATH", "")
+EXPIRY_WINDOW_DAYS = int(os.getenv("REPORT_EXPIRY_WINDOW_DAYS", "7"))
+DEFAULT_GROUP_BY = ("accountId", "service", "region")
+
+# Rough on-demand USD per resource-month for a typical small resource of each kind
+DEFAULT_PRICES = {
+    "currency": "USD",
+    "services": {
+        "ec2": 30.37,           # t3.medium, Linux
+        "rds": 15.71,           # db.t3.micro single-AZ + 20 GB gp2
+        "dynamodb": 2.50,       # on-demand, light traffic, 10 GB
+        "s3": 2.30,             # 100 GB Standard
+        "lambda": 0.20,
+        "ecr": 1.00,            # 10 GB stored
+        "cloudformation": 0.0,
+        "ec2-volume": 8.00,     # 100 GB gp3
+    },
+    "default": 5.00,
+    "regionMultipliers": {
+        "us-east-1": 1.0, "us-east-2": 1.0, "us-west-2": 1.0, "us-west-1": 1.17,
+        "ap-south-1": 1.04, "ap-south-2": 1.04, "ap-southeast-1": 1.2, "ap-southeast-2": 1.2,
+        "ap-northeast-1": 1.26, "eu-west-1": 1.1, "eu-central-1": 1.15, "sa-east-1": 1.55,
+    },
+}
+
+
+def load_prices(path=None):
+    path = path or PRICE_TABLE_PATH
+    if not path:
+        return DEFAULT_PRICES
+    with open(path) as f:
+        custom = json.load(f)
+    return {
+        **DEFAULT_PRICES, **custom,
+        "services": {**DEFAULT_PRICES["services"], **custom.get("services", {})},
+        "regionMultipliers": {**DEFAULT_PRICES["regionMultipliers"], **custom.get("regionMultipliers", {})},
+    }
+
+
+# --------------------------------------------------------------------------- #
+# Aggregation over a Snapshot
+# --------------------------------------------------------------------------- #
+def aggregate(snapshot_id, group_by=DEFAULT_GROUP_BY, prices=None, today=None, window_days=EXPIRY_WINDOW_DAYS,
+              location=None):
+    """
+    Count resources and estimate monthly cost per `group_by` key, plus how many
+    expire within `window_days` and how many are already past deleteAfter.
+    Reads only the columns it needs, one row group at a time.
+    """
+    prices = prices or load_prices()
+    today = today or datetime.date.today()
+    bounds = (today.isoformat(), (today + datetime.timedelta(days=window_days)).isoformat())
+    group_by = list(group_by)
+    columns = list(dict.fromkeys(group_by + ["service", "region", "deleteAfter"]))
+
+    totals = {}
+    aggregate_group = _aggregate_numpy if np is not None else _aggregate_python
+    for group in snapshotExport.iter_row_groups(snapshot_id, columns, location):
+        for key, stats in aggregate_group(group, group_by, prices, bounds).items():
+            merged = totals.setdefault(key, {"count": 0, "expiringSoon": 0, "expired": 0, "monthlyCost": 0.0})
+            for field, value in stats.items():
+                merged[field] += value
+
+    rows = [{**dict(zip(group_by, key)), **stats, "monthlyCost": round(stats["monthlyCost"], 2)}
+            for key, stats in sorted(totals.items())]
+    return {
+        "snapshotId": snapshot_id,
+        "groupBy": group_by,
+        "asOf": bounds[0],
+        "windowDays": window_days,
+        "currency": prices.get("currency", "USD"),
+        "totals": {
+            "count": sum(r["count"] for r in rows),
+            "expiringSoon": sum(r["expiringSoon"] for r in rows),
+            "expired": sum(r["expired"] for r in rows),
+            "monthlyCost": round(sum(r["monthlyCost"] for r in rows), 2),
+        },
+        "rows": rows,
+    }
+
+
+def _aggregate_numpy(group, group_by, prices, bounds):
+    # Factorize each key column, fold the codes into one group index, then bincount
+    inverses, uniques = [], []
+    for name in group_by:
+        values, inverse = np.unique(np.asarray(group[name], dtype=str), return_inverse=True)
+        uniques.append(values)
+        inverses.append(inverse.ravel())
+    combined = np.ravel_multi_index(inverses, [len(u) for u in uniques])
+    keys, index = np.unique(combined, return_inverse=True)
+    index = index.ravel()
+
+    services, service_index = np.unique(np.asarray(group["service"], dtype=str), return_inverse=True)
+    regions, region_index = np.unique(np.asarray(group["region"], dtype=str), return_inverse=True)
+    unit_price = np.array([prices["services"].get(s, prices.get("default", 0.0)) for s in services])
+    multiplier = np.array([prices["regionMultipliers"].get(r, 1.0) for r in regions])
+    cost = unit_price[service_index.ravel()] * multiplier[region_index.ravel()]
+
+    # ISO dates compare correctly as strings; a missing date sorts before everything
+    delete_after = np.asarray([d or "" for d in group["deleteAfter"]], dtype=str)
+    expiring = (delete_after >= bounds[0]) & (delete_after < bounds[1])
+    expired = (delete_after < bounds[0]) & (delete_after != "")
+
+    size = len(keys)
+    counts = np.bincount(index, minlength=size)
+    costs = np.bincount(index, weights=cost, minlength=size)
+    soon = np.bincount(index, weights=expiring, minlength=size)
+    past = np.bincount(index, weights=expired, minlength=size)
+
+    parts = np.unravel_index(keys, [len(u) for u in uniques])
+    return {
+        tuple(str(uniques[c][parts[c][n]]) for c in range(len(group_by))): {
+            "count": int(counts[n]), "expiringSoon": int(soon[n]), "expired": int(past[n]),
+            "monthlyCost": float(costs[n]),
+        }
+        for n in range(size)
+    }
+
+
+def _aggregate_python(group, group_by, prices, bounds):
+    out = {}
+    for n, service in enumerate(group["service"]):
+        key = tuple(str(group[name][n]) for name in group_by)
+        delete_after = group["deleteAfter"][n] or ""
+        stats = out.setdefault(key, {"count": 0, "expiringSoon": 0, "expired": 0, "monthlyCost": 0.0})
+        stats["count"] += 1
+        stats["expiringSoon"] += bounds[0] <= delete_after < bounds[1]
+        stats["expired"] += bool(delete_after) and delete_after < bounds[0]
+        stats["monthlyCost"] += (prices["services"].get(service, prices.get("default", 0.0))
+                                 * prices["regionMultipliers"].get(group["region"][n], 1.0))
+    return out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Counts and estimated monthly cost from a scan snapshot.")
+    parser.add_argument("snapshot", nargs="?", default="latest", help="snapshot id (default: the newest)")
+    parser.add_argument("--location", default=None, help="s3://bucket/prefix or directory (SNAPSHOT_LOCATION)")
+    parser.add_argument("--group-by", nargs="+", default=list(DEFAULT_GROUP_BY),
+                        choices=["accountId", "service", "region", "state"])
+    parser.add_argument("--window", type=int, default=EXPIRY_WINDOW_DAYS, help="days counted as expiring soon")
+    parser.add_argument("--prices", default=None, help="price table JSON (PRICE_TABLE_PATH)")
+    parser.add_argument("--csv", action="store_true", help="print rows as CSV instead of JSON")
+    args = parser.parse_args()
+
+    snapshot_id = args.snapshot
+    if snapshot_id == "latest":
+        snapshots = snapshotExport.list_snapshots(args.location)
+        if not snapshots:
+            sys.exit("No snapshots found")
+        snapshot_id = snapshots[-1]
+
+    report = aggregate(snapshot_id, args.group_by, load_prices(args.prices), window_days=args.window,
+                       location=args.location)
+    if args.csv:
+        writer = csv.DictWriter(sys.stdout, fieldnames=args.group_by + ["count", "expiringSoon", "expired",
+                                                                         "monthlyCost"])
+        writer.writeheader()
+        writer.writerows(report["rows"])
+    else:
+        print(json.dumps(report, indent=2))
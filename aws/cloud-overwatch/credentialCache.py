@@ -0,0 +1,152 @@
+import os
+import time
+import datetime
+import threading
+import boto3
+from botocore.exceptions import ClientError
+import awsMetrics
+import clientPool
+
+# Refresh assumed-role credentials this many seconds before they expire
+REFRESH_MARGIN_SECONDS = int(os.getenv("CREDENTIAL_REFRESH_MARGIN_SECONDS", "300"))
+# How long a ConnectedAccounts record is trusted before it is re-read
+ACCOUNT_CACHE_TTL_SECONDS = int(os.getenv("ACCOUNT_CACHE_TTL_SECONDS", "300"))
+# Fallback lifetime when STS omits Expiration
+DEFAULT_CREDENTIAL_TTL_SECONDS = 3600
+# Errors meaning the cached credentials, or the account record they came from (role, externalId), are stale
+AUTH_ERROR_CODES = {
+    "AccessDenied", "AccessDeniedException", "ExpiredToken", "ExpiredTokenException",
+    "InvalidClientTokenId", "UnrecognizedClientException", "AuthFailure",
+}
+
+# Module-level state survives across warm Lambda invocations
+_credentials = {}   # (accountId, roleArn) -> {"creds", "externalId", "expiresAt"}
+_accounts = {}      # accountId -> {"item", "fetchedAt"}
+_key_locks = {}
+_lock = threading.Lock()
+_sts = None
+
+STATS = {
+    "credentialHits": 0,
+    "credentialMisses": 0,
+    "credentialRefreshes": 0,
+    "accountHits": 0,
+    "accountMisses": 0,
+}
+
+
+def _sts_client():
+    global _sts
+    with _lock:
+        if _sts is None:
+            _sts = awsMetrics.instrument(boto3.client("sts"))
+        return _sts
+
+
+def _key_lock(key):
+    with _lock:
+        return _key_locks.setdefault(key, threading.Lock())
+
+
+def _count(stat):
+    with _lock:
+        STATS[stat] += 1
+
+
+# --------------------------------------------------------------------------- #
+# Helper: Cached ConnectedAccounts Lookup
+# --------------------------------------------------------------------------- #
+def get_account(accounts_table, account_id):
+    """Return the ConnectedAccounts item for account_id, or None if it does not exist."""
+    cached = _accounts.get(account_id)
+    if cached and time.monotonic() - cached["fetchedAt"] < ACCOUNT_CACHE_TTL_SECONDS:
+        _count("accountHits")
+        return cached["item"]
+
+    _count("accountMisses")
+    item = accounts_table.get_item(Key={"accountId": account_id}).get("Item")
+    if item:
+        _accounts[account_id] = {"item": item, "fetchedAt": time.monotonic()}
+    else:
+        _accounts.pop(account_id, None)
+    return item
+
+
+# --------------------------------------------------------------------------- #
+# Helper: Cached AssumeRole
+# --------------------------------------------------------------------------- #
+def get_credentials(account, session_name="cloudoverwatch-session"):
+    """
+    Return assumed-role credentials for a ConnectedAccounts item, reusing cached
+    credentials until REFRESH_MARGIN_SECONDS before their Expiration.
+    """
+    key = (account["accountId"], account["roleArn"])
+    with _key_lock(key):
+        entry = _credentials.get(key)
+        if entry and entry["externalId"] == account["externalId"] and not _expiring(entry):
+            _count("credentialHits")
+            return entry["creds"]
+
+        _count("credentialRefreshes" if entry else "credentialMisses")
+        with awsMetrics.phase("assume-role"):
+            creds = _sts_client().assume_role(
+                RoleArn=account["roleArn"],
+                RoleSessionName=session_name,
+                ExternalId=account["externalId"]
+            )["Credentials"]
+        _credentials[key] = {"creds": creds, "externalId": account["externalId"], "expiresAt": _expires_at(creds)}
+        return creds
+
+
+def invalidate(account_id):
+    """Forget cached credentials and account record for an account (e.g. after AccessDenied)."""
+    with _lock:
+        for key in [k for k in _credentials if k[0] == account_id]:
+            _credentials.pop(key, None)
+        _accounts.pop(account_id, None)
+
+
+def invalidate_on_auth_error(account_id, error):
+    """
+    Drop an account's cached credentials, account record and pooled clients when
+    `error` is an auth failure, so the next call re-reads the account and assumes
+    the role again instead of failing until the credentials expire.
+    """
+    code = error.response.get("Error", {}).get("Code") if isinstance(error, ClientError) else None
+    if code not in AUTH_ERROR_CODES:
+        return False
+    print(f"🔑 {code} for account {account_id}: dropping its cached credentials and clients")
+    invalidate(account_id)
+    clientPool.drop_account(account_id)
+    return True
+
+
+def invalidate_all():
+    global _sts
+    with _lock:
+        _credentials.clear()
+        _accounts.clear()
+        _sts = None
+
+
+def cache_stats():
+    with _lock:
+        stats = dict(STATS)
+    stats["cachedCredentials"] = len(_credentials)
+    stats["cachedAccounts"] = len(_accounts)
+    return stats
+
+
+def _expires_at(creds):
+    expiration = creds.get("Expiration")
+    if isinstance(expiration, str):
+        expiration = datetime.datetime.fromisoformat(expiration.replace("Z", "+00:00"))
+    if isinstance(expiration, datetime.datetime):
+        if expiration.tzinfo is None:
+            expiration = expiration.replace(tzinfo=datetime.timezone.utc)
+        return expiration.timestamp()
+    return time.time() + DEFAULT_CREDENTIAL_TTL_SECONDS
+
+
+def _expiring(entry):
+    return time.time() >= entry["expiresAt"] - REFRESH_MARGIN_SECONDS
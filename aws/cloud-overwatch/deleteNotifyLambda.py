@@ -1,22 +1,22 @@
-import boto3
 import json
 import datetime
-import os
-from boto3.dynamodb.conditions import Attr
+import awsMetrics
+import clientPool
+import credentialCache
+import deletionTracker
+import overwatchCore as core
+import recordCodec
+import scanState
+import subscriptionIndex
+from bucketPurger import purge_bucket
+from deletionExecutor import run_deletions, summarize
+from fanOut import SHARD_SIZE, dispatcher_for, handle_queue_batch, iter_accounts, run_fanout, shard
+from notificationDigest import DeletionDigest
+from runCheckpoint import TimeBudget, clear_cursor, continue_run, load_cursor
+from boto3.dynamodb.conditions import Attr, Key
 from botocore.exceptions import ClientError
 
-# AWS Clients
-dynamo = boto3.resource("dynamodb", region_name="ap-south-1")
-sts = boto3.client("sts")
-sns = boto3.client("sns", region_name="ap-south-1")
-
-# Environment variables
-RESULTS_TABLE = os.getenv("RESULTS_TABLE", "AccountScanResults")
-ACCOUNTS_TABLE = os.getenv("ACCOUNTS_TABLE", "ConnectedAccounts")
-SNS_TOPIC_ARN = os.getenv("SNS_TOPIC_ARN")
-
-results_table = dynamo.Table(RESULTS_TABLE)
-accounts_table = dynamo.Table(ACCOUNTS_TABLE)
+# Clients, tables and config come from overwatchCore: built on first use, reused while warm
 
 
 # --------------------------------------------------------------------------- #
@@ -25,13 +25,11 @@ accounts_table = dynamo.Table(ACCOUNTS_TABLE)
 def ensure_subscription(email: str):
     """Subscribe email to SNS topic if not already subscribed."""
     try:
-        paginator = sns.get_paginator("list_subscriptions_by_topic")
-        for page in paginator.paginate(TopicArn=SNS_TOPIC_ARN):
-            for sub in page["Subscriptions"]:
-                if sub["Protocol"] == "email" and sub["Endpoint"].lower() == email.lower():
-                    return  # already subscribed
-        sns.subscribe(TopicArn=SNS_TOPIC_ARN, Protocol="email", Endpoint=email)
-        print(f"Sent SNS subscription confirmation to {email}")
+        # Checked against a per-topic email index instead of paging the topic every call
+        with awsMetrics.phase("notify"):
+            subscribed = subscriptionIndex.ensure_subscription(core.sns(), core.SNS_TOPIC_ARN, email)
+        if subscribed:
+            print(f"Sent SNS subscription confirmation to {email}")
     except Exception as e:
         print(f"Failed SNS subscription check for {email}: {e}")
 
@@ -39,50 +37,10 @@ def ensure_subscription(email: str):
 # --------------------------------------------------------------------------- #
 # Helper: Delete Resource (Multi-Service)
 # --------------------------------------------------------------------------- #
-def delete_resource(service, region, resource_id, creds):
+def delete_resource(service, region, resource_id, creds, account_id):
     """Deletes AWS resource by service type using assumed credentials."""
     try:
-        client = boto3.client(
-            service,
-            region_name=region,
-            aws_access_key_id=creds["AccessKeyId"],
-            aws_secret_access_key=creds["SecretAccessKey"],
-            aws_session_token=creds["SessionToken"]
-        )
-
-        if service == "ec2":
-            client.terminate_instances(InstanceIds=[resource_id])
-        elif service == "s3":
-            s3 = boto3.resource(
-                "s3",
-                region_name=region,
-                aws_access_key_id=creds["AccessKeyId"],
-                aws_secret_access_key=creds["SecretAccessKey"],
-                aws_session_token=creds["SessionToken"]
-            )
-            bucket = s3.Bucket(resource_id)
-            bucket.objects.all().delete()
-            bucket.delete()
-        elif service == "rds":
-            client.delete_db_instance(DBInstanceIdentifier=resource_id, SkipFinalSnapshot=True, DeleteAutomatedBackups=True)
-        elif service == "dynamodb":
-            client.delete_table(TableName=resource_id)
-        elif service == "lambda":
-            client.delete_function(FunctionName=resource_id)
-        elif service == "ecr":
-            client.delete_repository(repositoryName=resource_id, force=True)
-        elif service == "cloudformation":
-            client.delete_stack(StackName=resource_id)
-        elif service == "ec2-volume":
-            ec2_client = boto3.client("ec2", region_name=region, **_session(creds))
-            ec2_client.delete_volume(VolumeId=resource_id)
-        else:
-            print(f"Unsupported service type: {service}")
-            return False
-
-        print(f"Deleted {service} resource: {resource_id}")
-        return True
-
+        return request_delete(service, region, resource_id, creds, account_id)
     except ClientError as e:
         print(f"ClientError deleting {service} {resource_id}: {e.response['Error']['Message']}")
     except Exception as e:
@@ -90,132 +48,348 @@ def delete_resource(service, region, resource_id, creds):
     return False
 
 
+def request_delete(service, region, resource_id, creds, account_id, deadline=None):
+    """
+    Issue the delete call; False for unsupported types, raises on API errors (so callers can retry).
+    deadline (a time.monotonic() value) bounds long bucket purges, which resume on the next run.
+    """
+    # Clients come from the shared pool and are only built for the service being deleted
+    def client(name=service):
+        return clientPool.get_client(account_id, region, name, creds)
+
+    if service == "ec2":
+        client().terminate_instances(InstanceIds=[resource_id])
+    elif service == "s3":
+        # Versions and delete markers too, in parallel 1000-key batches, resumable via checkpoint
+        purge = purge_bucket(client(), resource_id, account_id, deadline=deadline)
+        if not purge["complete"]:
+            raise RuntimeError(f"Bucket purge incomplete ({purge['deleted']} versions deleted); resuming next run")
+        client().delete_bucket(Bucket=resource_id)
+    elif service == "rds":
+        client().delete_db_instance(DBInstanceIdentifier=resource_id, SkipFinalSnapshot=True, DeleteAutomatedBackups=True)
+    elif service == "dynamodb":
+        client().delete_table(TableName=resource_id)
+    elif service == "lambda":
+        client().delete_function(FunctionName=resource_id)
+    elif service == "ecr":
+        client().delete_repository(repositoryName=resource_id, force=True)
+    elif service == "cloudformation":
+        client().delete_stack(StackName=resource_id)
+    elif service == "ec2-volume":
+        client("ec2").delete_volume(VolumeId=resource_id)
+    else:
+        print(f"Unsupported service type: {service}")
+        return False
+
+    if service in deletionTracker.ASYNC_SERVICES:
+        print(f"Delete requested for {service} resource: {resource_id}")
+    else:
+        print(f"Deleted {service} resource: {resource_id}")
+    return True
+
+
 # --------------------------------------------------------------------------- #
-# Helper: Session Builder
+# Helper: Find Items Due for Deletion
 # --------------------------------------------------------------------------- #
-def _session(creds):
-    return {
-        "aws_access_key_id": creds["AccessKeyId"],
-        "aws_secret_access_key": creds["SecretAccessKey"],
-        "aws_session_token": creds["SessionToken"]
+def find_due_items(today, account_id=None):
+    """
+    Return active items with deleteAfter <= today. Across all accounts this is one
+    paginated Query on the due-date index; for one account, a Query on its partition.
+    """
+    if account_id:
+        params = {
+            "KeyConditionExpression": Key("accountId").eq(account_id),
+            "FilterExpression": Attr("deleteAfter").lte(today) & Attr("state").eq("active"),
+        }
+    else:
+        params = {
+            "IndexName": core.STATE_INDEX,
+            "KeyConditionExpression": Key("state").eq("active") & Key("deleteAfter").lte(today),
+        }
+
+    items = []
+    while True:
+        resp = core.results_table().query(**params)
+        items.extend(resp.get("Items", []))
+        if not resp.get("LastEvaluatedKey"):
+            return recordCodec.decode_items(items, with_email=True)
+        params["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+
+
+def find_due_accounts(today):
+    """
+    Account IDs with active items due by `today`, for sharding. Projects only
+    accountId from the due-date index: no decoding and no email lookups.
+    """
+    params = {
+        "IndexName": core.STATE_INDEX,
+        "KeyConditionExpression": Key("state").eq("active") & Key("deleteAfter").lte(today),
+        "ProjectionExpression": "accountId",
     }
+    account_ids = set()
+    while True:
+        resp = core.results_table().query(**params)
+        account_ids.update(item["accountId"] for item in resp.get("Items", []))
+        if not resp.get("LastEvaluatedKey"):
+            return sorted(account_ids)
+        params["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+
+
+# --------------------------------------------------------------------------- #
+# Helper: Settle Deletes Still in Progress
+# --------------------------------------------------------------------------- #
+def track_deletions(digest, account_id=None):
+    """
+    Check RDS / CloudFormation / DynamoDB deletes requested on earlier runs and
+    move each to deleted (notified through `digest`) or delete_failed.
+    """
+    try:
+        pending = deletionTracker.find_deleting(core.results_table(), account_id)
+    except Exception as e:
+        print(f"Failed to query in-progress deletions: {e}")
+        return {"error": "Query failed"}
+    if not pending:
+        return {"tracked": 0}
+
+    summary = deletionTracker.settle(core.results_table(), pending, digest)
+    print(f"Tracked {summary['tracked']} in-progress deletions: {summary['deleted']} completed, "
+          f"{summary['delete_failed']} failed, {summary['deleting']} still deleting.")
+    return summary
 
 
 # --------------------------------------------------------------------------- #
 # Helper: Delete Expired Resources for One Account
 # --------------------------------------------------------------------------- #
-def delete_expired_for_account(account_id):
+def delete_expired_for_account(account_id, expired_resources=None, digest=None, budget=None):
     today = datetime.date.today().isoformat()
     print(f"Checking expired resources for account {account_id} on {today}...")
 
+    if expired_resources is None:
+        try:
+            expired_resources = find_due_items(today, account_id)
+        except Exception as e:
+            print(f"Failed DynamoDB query for {account_id}: {e}")
+            return {"accountId": account_id, "error": "Query failed", "deleted": [], "failed": []}
+    print(f"Found {len(expired_resources)} expired resources in {account_id}.")
+
+    deleted, deleting, failed, deferred = [], [], [], []
+    budget = budget or TimeBudget(None)
+
+    if not expired_resources:
+        return {"accountId": account_id, "deleted": deleted, "failed": failed}
+
     try:
-        scan_response = results_table.scan(
-            FilterExpression=Attr("accountId").eq(account_id) &
-                             Attr("deleteAfter").lte(today) &
-                             Attr("state").ne("deleted")
-        )
-        expired_resources = scan_response.get("Items", [])
-        print(f"Found {len(expired_resources)} expired resources in {account_id}.")
+        acc = credentialCache.get_account(core.accounts_table(), account_id)
     except Exception as e:
-        print(f"Failed DynamoDB scan for {account_id}: {e}")
-        return {"accountId": account_id, "error": "Scan failed", "deleted": [], "failed": []}
+        print(f"Failed to load account {account_id}: {e}")
+        acc = None
+    if not acc:
+        failed.extend(item.get("resourceId") for item in expired_resources)
+        return {"accountId": account_id, "deleted": deleted, "failed": failed}
 
-    deleted, failed = [], []
+    try:
+        creds = credentialCache.get_credentials(acc, session_name="cloudoverwatch-delete-session")
+    except Exception as e:
+        print(f"Failed to assume role for {account_id}: {e}")
+        # e.g. a changed externalId: re-read the account record next time
+        credentialCache.invalidate_on_auth_error(account_id, e)
+        failed.extend(item.get("resourceId") for item in expired_resources)
+        return {"accountId": account_id, "deleted": deleted, "failed": failed}
+
+    for email in {item.get("email") for item in expired_resources if item.get("email")}:
+        ensure_subscription(email)
 
-    for item in expired_resources:
+    def delete_fn(item):
+        service = item.get("resourceType", "unknown").lower()
+        try:
+            with awsMetrics.phase("delete"):
+                return request_delete(service, item.get("region", "ap-south-1"), item.get("resourceId"), creds,
+                                      account_id, deadline=budget.deadline())
+        except Exception as e:
+            credentialCache.invalidate_on_auth_error(account_id, e)
+            raise
+
+    def after_delete(item):
         resource_id = item.get("resourceId")
         service = item.get("resourceType", "unknown").lower()
-        region = item.get("region", "ap-south-1")
-        email = item.get("email")
-        delete_after = item.get("deleteAfter")
+        if service in deletionTracker.ASYNC_SERVICES:
+            # Only the request is done; a later run confirms it and sends the notification
+            with awsMetrics.phase("persist"):
+                deletionTracker.mark_deleting(core.results_table(), account_id, resource_id)
+            return
+
+        deleted_field, deleted_at = recordCodec.stamp("deletedAt")
+        with awsMetrics.phase("persist"):
+            core.results_table().update_item(
+                Key={"accountId": account_id, "resourceId": resource_id},
+                UpdateExpression="SET #s=:state, #t=:t",
+                ExpressionAttributeNames={"#s": "state", "#t": deleted_field},
+                ExpressionAttributeValues={":state": "deleted", ":t": deleted_at}
+            )
 
-        try:
-            acc = accounts_table.get_item(Key={"accountId": account_id}).get("Item")
-            if not acc:
-                failed.append(resource_id)
-                continue
-
-            if email:
-                ensure_subscription(email)
-
-            creds = sts.assume_role(
-                RoleArn=acc["roleArn"],
-                RoleSessionName="cloudoverwatch-delete-session",
-                ExternalId=acc["externalId"]
-            )["Credentials"]
-
-            if delete_resource(service, region, resource_id, creds):
-                results_table.update_item(
-                    Key={"accountId": account_id, "resourceId": resource_id},
-                    UpdateExpression="SET #s=:state, deletedAt=:t",
-                    ExpressionAttributeNames={"#s": "state"},
-                    ExpressionAttributeValues={":state": "deleted", ":t": datetime.datetime.utcnow().isoformat() + "Z"}
-                )
-
-                sns.publish(
-                    TopicArn=SNS_TOPIC_ARN,
-                    Subject=f"CloudOverwatch: {service.upper()} Resource Deleted",
-                    Message=(
-                        f"The following resource has been automatically deleted:\n"
-                        f"- Resource ID: {resource_id}\n"
-                        f"- Account ID: {account_id}\n"
-                        f"- Type: {service}\n"
-                        f"- Region: {region}\n"
-                        f"- Deleted On: {today}\n"
-                        f"- Tag: overwatch-delete-after = {delete_after}"
-                    )
-                )
-
-                deleted.append(resource_id)
-            else:
-                failed.append(resource_id)
+        # Notification is batched into the run's digest, off the deletion path
+        digest.record(account_id, item.get("email"), service, item.get("region", "ap-south-1"),
+                      resource_id, item.get("deleteAfter"))
+
+    own_digest = digest is None
+    if own_digest:
+        digest = DeletionDigest(core.sns(), core.SNS_TOPIC_ARN, today)
+
+    # Deletions run concurrently, rate-limited per service/region and retried on throttling
+    # Items not started before the time budget runs low come back as "deferred"
+    outcomes = run_deletions(expired_resources, delete_fn, after_delete=after_delete, should_stop=budget.exhausted)
+    if own_digest:
+        notifications = digest.wait()
+    else:
+        digest.flush_account(account_id)
+        notifications = None
+    for outcome in outcomes:
+        if outcome["status"] == "deleted" and outcome["service"] in deletionTracker.ASYNC_SERVICES:
+            deleting.append(outcome["resourceId"])
+        elif outcome["status"] == "deleted":
+            deleted.append(outcome["resourceId"])
+        elif outcome["status"] == "deferred":
+            deferred.append(outcome["resourceId"])
+        else:
+            print(f"Failed to delete {outcome['service']} {outcome['resourceId']}: {outcome['error']}")
+            failed.append(outcome["resourceId"])
 
-        except Exception as e:
-            print(f"Error processing resource {resource_id}: {e}")
-            failed.append(resource_id)
+    if deleted or deleting:
+        # Cached getResources responses for this account are now stale
+        scanState.bump_versions([account_id])
 
-    return {"accountId": account_id, "deleted": deleted, "failed": failed}
+    result = {"accountId": account_id, "deleted": deleted, "failed": failed,
+              "outcomes": outcomes, "outcomeSummary": summarize(outcomes)}
+    if deleting:
+        result["deleting"] = deleting
+    if deferred:
+        result["deferred"] = deferred
+    if notifications:
+        result["notifications"] = notifications
+    return result
 
 
 # --------------------------------------------------------------------------- #
 # Lambda Handler
 # --------------------------------------------------------------------------- #
+@awsMetrics.emits_metrics
 def lambda_handler(event, context):
     print("DeleteAndNotifyLambda invoked.")
     today = datetime.date.today().isoformat()
 
+    # Shards delivered through the fan-out queue
+    queued = handle_queue_batch(event, lambda_handler, context)
+    if queued is not None:
+        return queued
+
     # Parse input
-    body = event.get("body") if isinstance(event, dict) else event
-    if isinstance(body, str):
-        try:
-            body = json.loads(body)
-        except Exception:
-            body = {}
-    elif not body:
-        body = {}
+    body = core.parse_body(event)
 
     account_id = body.get("accountId")
+    budget = TimeBudget(context)
 
     # --- CASE 1: Specific Account ---
     if account_id:
         print(f"Running deletion for account {account_id} only.")
-        result = delete_expired_for_account(account_id)
+        digest = DeletionDigest(core.sns(), core.SNS_TOPIC_ARN, today)
+        tracking = track_deletions(digest, account_id)
+        result = delete_expired_for_account(account_id, digest=digest, budget=budget)
+        result["notifications"] = digest.wait()
+        result["tracking"] = tracking
+        result["credentialCache"] = credentialCache.cache_stats()
+        result["clientPool"] = clientPool.pool_stats()
+        result["subscriptionIndex"] = subscriptionIndex.index_stats()
         return {"statusCode": 200, "body": json.dumps(result)}
 
-    # --- CASE 2: All Connected Accounts ---
+    # --- CASE 2: All Connected Accounts (or one fan-out shard of them) ---
     print("No accountId provided — deleting expired resources across all accounts.")
-    try:
-        accounts = accounts_table.scan().get("Items", [])
-        print(f"Found {len(accounts)} connected accounts.")
-    except Exception as e:
-        print(f"Error fetching accounts: {e}")
-        return {"statusCode": 500, "body": json.dumps({"error": "Failed to fetch connected accounts"})}
 
-    overall_summary = {"totalAccounts": len(accounts), "processed": []}
+    # A continuation keeps the original run date and starts from the account it stopped in
+    token = body.get("continuationToken")
+    cursor = {"today": body.get("runDate") or today}
+    if body.get("accountIds"):
+        cursor["accountIds"] = sorted(body["accountIds"])
+    today = cursor["today"]
+    if token:
+        cursor = load_cursor("delete", token)
+        if not cursor:
+            return {"statusCode": 404, "body": json.dumps({"error": "Unknown or expired continuationToken"})}
+        today = cursor["today"]
+        print(f"Resuming deletion run {token} from account {cursor.get('fromAccount')} (hop {cursor.get('hops', 0)}).")
 
-    for acc in accounts:
-        acc_id = acc["accountId"]
-        result = delete_expired_for_account(acc_id)
-        overall_summary["processed"].append(result)
+    try:
+        dispatcher = None if cursor.get("accountIds") or token else dispatcher_for(body.get("dispatch"), context,
+                                                                                   lambda_handler)
+    except ValueError as e:
+        return {"statusCode": 400, "body": json.dumps({"error": str(e)})}
 
+    try:
+        if dispatcher:
+            # Orchestrator: only which accounts have something due; workers fetch their own items
+            due_accounts = find_due_accounts(today)
+        elif cursor.get("accountIds"):
+            # Shard worker: one partition Query per account in the shard
+            due_items = [item for acc_id in cursor["accountIds"] for item in find_due_items(today, acc_id)]
+        else:
+            due_items = find_due_items(today)
+        # totalAccounts keeps its meaning of every connected account; a shard only knows its own
+        total_accounts = (len(cursor["accountIds"]) if cursor.get("accountIds")
+                          else sum(1 for _ in iter_accounts(core.accounts_table(), "accountId")))
+    except Exception as e:
+        print(f"Error querying due resources: {e}")
+        return {"statusCode": 500, "body": json.dumps({"error": "Failed to fetch due resources"})}
+
+    # Deletes in progress are settled once per run, by the orchestrator (or the single inline worker)
+    digest = DeletionDigest(core.sns(), core.SNS_TOPIC_ARN, today)
+    tracking = None if cursor.get("accountIds") or token else track_deletions(digest)
+
+    # --- Orchestrator: shard the accounts with due items across worker invocations ---
+    if dispatcher:
+        print(f"Found due resources across {len(due_accounts)} accounts.")
+        shards = shard(due_accounts, body.get("shardSize") or SHARD_SIZE)
+        summary = run_fanout(shards, dispatcher, lambda account_ids: {
+            "accountIds": account_ids, "runDate": today, "dispatch": "inline",
+            **({"resumeMode": body["resumeMode"]} if body.get("resumeMode") else {})
+        })
+        print(f"Fan-out deletion completed: {len(shards)} shards, {summary['shardsSucceeded']} succeeded.")
+        summary.update({"totalAccounts": total_accounts, "accountsWithDueItems": len(due_accounts)})
+        summary["trackingNotifications"] = digest.wait()
+        summary["tracking"] = tracking
+        return {"statusCode": 200, "body": json.dumps(summary)}
+
+    # Only accounts with something due are visited
+    due_by_account = {}
+    for item in due_items:
+        due_by_account.setdefault(item["accountId"], []).append(item)
+    print(f"Found {len(due_items)} due resources across {len(due_by_account)} accounts.")
+
+    overall_summary = {"totalAccounts": total_accounts, "accountsWithDueItems": len(due_by_account),
+                       "dueResources": len(due_items), "processed": []}
+    if tracking is not None:
+        overall_summary["tracking"] = tracking
+
+    # Deleted items drop out of the due query, so a resumed run only needs to know where to start
+    remaining = sorted(acc_id for acc_id in due_by_account if acc_id >= cursor.get("fromAccount", ""))
+    for acc_id in remaining:
+        if budget.exhausted():
+            cursor["fromAccount"] = acc_id
+            break
+        result = delete_expired_for_account(acc_id, due_by_account[acc_id], digest, budget)
+        overall_summary["processed"].append(result)
+        if result.get("deferred"):
+            cursor["fromAccount"] = acc_id
+            break
+    else:
+        cursor.pop("fromAccount", None)
+
+    overall_summary["notifications"] = digest.wait()
+    if cursor.get("fromAccount"):
+        overall_summary.update(continue_run("delete", cursor, context, body.get("resumeMode")))
+    elif token:
+        clear_cursor(token)
+
+    overall_summary["credentialCache"] = credentialCache.cache_stats()
+    overall_summary["clientPool"] = clientPool.pool_stats()
+    overall_summary["subscriptionIndex"] = subscriptionIndex.index_stats()
     return {"statusCode": 200, "body": json.dumps(overall_summary)}
+
@@ -0,0 +1,148 @@
+import os
+import json
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from botocore.exceptions import ClientError
+from awsMetrics import THROTTLE_CODES
+
+MAX_WORKERS = int(os.getenv("DELETE_MAX_WORKERS", "8"))
+MAX_ATTEMPTS = int(os.getenv("DELETE_MAX_ATTEMPTS", "5"))
+BASE_BACKOFF_SECONDS = float(os.getenv("DELETE_BASE_BACKOFF_SECONDS", "0.5"))
+MAX_BACKOFF_SECONDS = 20.0
+
+# Sustained delete calls per second per (account, service, region); burst = 2x rate.
+# Override with e.g. DELETE_RATE_LIMITS='{"ec2": 10, "rds": 1}'
+RATE_LIMITS = {"ec2": 5, "ec2-volume": 5, "rds": 1, "s3": 10, "dynamodb": 2,
+               "lambda": 5, "ecr": 2, "cloudformation": 2, "default": 2}
+RATE_LIMITS.update(json.loads(os.getenv("DELETE_RATE_LIMITS", "{}")))
+
+
+# --------------------------------------------------------------------------- #
+# Token Bucket Rate Limiter
+# --------------------------------------------------------------------------- #
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, rate * 2))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available; returns seconds spent waiting."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+# Buckets live at module level so back-to-back warm invocations share limits
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def bucket_for(account_id, service, region):
+    key = (account_id, service, region)
+    with _buckets_lock:
+        if key not in _buckets:
+            _buckets[key] = TokenBucket(RATE_LIMITS.get(service, RATE_LIMITS["default"]))
+        return _buckets[key]
+
+
+def is_throttle(error):
+    return isinstance(error, ClientError) and error.response.get("Error", {}).get("Code") in THROTTLE_CODES
+
+
+def backoff_delay(attempt):
+    """Full-jitter exponential backoff."""
+    return random.uniform(0, min(MAX_BACKOFF_SECONDS, BASE_BACKOFF_SECONDS * (2 ** attempt)))
+
+
+# --------------------------------------------------------------------------- #
+# Concurrent Deletion Executor
+# --------------------------------------------------------------------------- #
+def run_deletions(items, delete_fn, max_workers=MAX_WORKERS, after_delete=None, should_stop=None):
+    """
+    Delete `items` concurrently.
+
+    delete_fn(item) performs the API call: it returns False for unsupported
+    resource types and raises on failure. Throttling errors are retried with
+    jittered exponential backoff, and every call first takes a token from the
+    item's (account, service, region) bucket. after_delete(item), if given, runs
+    on the worker thread after a successful delete (e.g. to update DynamoDB).
+    Once should_stop() returns True, items not yet started are skipped with
+    status "deferred" so a later run can pick them up.
+
+    Returns one outcome dict per item, in input order.
+    """
+    if not items:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items)))) as pool:
+        return list(pool.map(lambda item: _delete_one(item, delete_fn, after_delete, should_stop), items))
+
+
+def _delete_one(item, delete_fn, after_delete, should_stop=None):
+    service = item.get("resourceType", "unknown").lower()
+    region = item.get("region", "ap-south-1")
+    outcome = {
+        "resourceId": item.get("resourceId"),
+        "service": service,
+        "region": region,
+        "status": "failed",
+        "attempts": 0,
+        "throttled": 0,
+        "rateLimitWaitMs": 0,
+        "latencyMs": 0,
+        "error": None,
+    }
+    if should_stop and should_stop():
+        outcome["status"] = "deferred"
+        return outcome
+
+    bucket = bucket_for(item.get("accountId"), service, region)
+    started = time.monotonic()
+
+    for attempt in range(MAX_ATTEMPTS):
+        outcome["rateLimitWaitMs"] += int(bucket.acquire() * 1000)
+        outcome["attempts"] += 1
+        try:
+            supported = delete_fn(item)
+            outcome["status"] = "deleted" if supported else "unsupported"
+            outcome["error"] = None if supported else f"Unsupported service type: {service}"
+            break
+        except Exception as e:
+            outcome["error"] = e.response["Error"]["Message"] if isinstance(e, ClientError) else str(e)
+            if not is_throttle(e) or attempt == MAX_ATTEMPTS - 1:
+                break
+            outcome["throttled"] += 1
+            time.sleep(backoff_delay(attempt))
+
+    if outcome["status"] == "deleted" and after_delete:
+        try:
+            after_delete(item)
+        except Exception as e:
+            outcome["status"] = "failed"
+            outcome["error"] = f"Deleted but post-delete step failed: {e}"
+
+    outcome["latencyMs"] = int((time.monotonic() - started) * 1000)
+    return outcome
+
+
+def summarize(outcomes):
+    """Counts by status plus throttle / attempt totals for a list of outcomes."""
+    summary = {"total": len(outcomes), "attempts": 0, "throttled": 0}
+    for outcome in outcomes:
+        summary[outcome["status"]] = summary.get(outcome["status"], 0) + 1
+        summary["attempts"] += outcome["attempts"]
+        summary["throttled"] += outcome["throttled"]
+    return summary
@@ -0,0 +1,194 @@
+import os
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+from boto3.dynamodb.conditions import Attr, Key
+from botocore.exceptions import ClientError
+import awsMetrics
+import clientPool
+import credentialCache
+import overwatchCore as core
+import recordCodec
+
+# Deletes that return before the resource is gone; these are tracked to completion
+ASYNC_SERVICES = {"rds", "cloudformation", "dynamodb"}
+# A delete still in progress after this long is reported as failed
+TIMEOUT_HOURS = int(os.getenv("DELETE_TRACK_TIMEOUT_HOURS", "6"))
+TRACK_WORKERS = int(os.getenv("DELETE_TRACK_WORKERS", "8"))
+RDS_BATCH = 100
+
+
+# --------------------------------------------------------------------------- #
+# Recording a Delete in Progress
+# --------------------------------------------------------------------------- #
+def mark_deleting(table, account_id, resource_id):
+    field, requested_at = recordCodec.stamp("deleteRequestedAt")
+    table.update_item(
+        Key={"accountId": account_id, "resourceId": resource_id},
+        UpdateExpression="SET #s=:state, #t=:t",
+        ExpressionAttributeNames={"#s": "state", "#t": field},
+        ExpressionAttributeValues={":state": "deleting", ":t": requested_at}
+    )
+
+
+def find_deleting(table, account_id=None):
+    """Items still in state `deleting`: one Query on the state index, or on the account's partition."""
+    if account_id:
+        params = {"KeyConditionExpression": Key("accountId").eq(account_id),
+                  "FilterExpression": Attr("state").eq("deleting")}
+    else:
+        params = {"IndexName": core.STATE_INDEX, "KeyConditionExpression": Key("state").eq("deleting")}
+
+    items = []
+    while True:
+        resp = table.query(**params)
+        items.extend(resp.get("Items", []))
+        if not resp.get("LastEvaluatedKey"):
+            return recordCodec.decode_items(items, with_email=True)
+        params["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+
+
+# --------------------------------------------------------------------------- #
+# Bulk Status Checks: one listing / describe per (account, service, region)
+# --------------------------------------------------------------------------- #
+def _rds_status(client, ids):
+    found = {}
+    paginator = client.get_paginator("describe_db_instances")
+    for n in range(0, len(ids), RDS_BATCH):
+        for page in paginator.paginate(Filters=[{"Name": "db-instance-id", "Values": ids[n:n + RDS_BATCH]}]):
+            for db in page.get("DBInstances", []):
+                found[db["DBInstanceIdentifier"]] = db["DBInstanceStatus"]
+    # Gone from DescribeDBInstances means the delete finished
+    return {i: "deleted" if i not in found else "deleting" if found[i] == "deleting" else "delete_failed"
+            for i in ids}
+
+
+def _cloudformation_status(client, ids):
+    # ListStacks includes deleted stacks; keep the newest entry per name / id
+    latest = {}
+    for page in client.get_paginator("list_stacks").paginate():
+        for stack in page.get("StackSummaries", []):
+            for key in (stack["StackName"], stack["StackId"]):
+                if key not in latest or stack["CreationTime"] > latest[key]["CreationTime"]:
+                    latest[key] = stack
+    statuses = {}
+    for stack_id in ids:
+        status = latest.get(stack_id, {}).get("StackStatus", "DELETE_COMPLETE")
+        statuses[stack_id] = ("deleted" if status == "DELETE_COMPLETE" else
+                              "deleting" if status == "DELETE_IN_PROGRESS" else "delete_failed")
+    return statuses
+
+
+def _dynamodb_status(client, ids):
+    existing = set()
+    for page in client.get_paginator("list_tables").paginate():
+        existing.update(page.get("TableNames", []))
+    statuses = {}
+    for table_name in ids:
+        if table_name not in existing:
+            statuses[table_name] = "deleted"
+            continue
+        try:
+            status = client.describe_table(TableName=table_name)["Table"]["TableStatus"]
+            statuses[table_name] = "deleting" if status == "DELETING" else "delete_failed"
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ResourceNotFoundException":
+                raise
+            statuses[table_name] = "deleted"
+    return statuses
+
+
+_CHECKERS = {
+    "rds": _rds_status,
+    "cloudformation": _cloudformation_status,
+    "dynamodb": _dynamodb_status,
+}
+
+
+def check_deletions(items, now=None):
+    """
+    Resolve tracked deletes. Returns one {"item", "status", "reason"} per item
+    with status "deleted", "delete_failed" or "deleting" (still in progress).
+    """
+    now = now or datetime.datetime.utcnow()
+    groups = {}
+    for item in items:
+        key = (item["accountId"], item.get("resourceType", "unknown").lower(), item.get("region", "ap-south-1"))
+        groups.setdefault(key, []).append(item)
+
+    def check_group(key):
+        account_id, service, region = key
+        group = groups[key]
+        try:
+            account = credentialCache.get_account(core.accounts_table(), account_id)
+            if not account:
+                return [_result(item, "deleting", "account not found") for item in group]
+            creds = credentialCache.get_credentials(account, session_name="cloudoverwatch-delete-session")
+            with awsMetrics.phase("delete"):
+                statuses = _CHECKERS[service](clientPool.get_client(account_id, region, service, creds),
+                                              sorted({item["resourceId"] for item in group}))
+        except Exception as e:
+            print(f"Deletion status check failed for {service} in {account_id}/{region}: {e}")
+            statuses, reason = {}, f"status check failed: {e}"
+        else:
+            reason = None
+
+        results = []
+        for item in group:
+            status = statuses.get(item["resourceId"], "deleting")
+            if status == "deleting" and _timed_out(item, now):
+                results.append(_result(item, "delete_failed", f"still deleting after {TIMEOUT_HOURS}h"))
+            else:
+                results.append(_result(item, status, reason if status == "deleting" else None))
+        return results
+
+    with ThreadPoolExecutor(max_workers=max(1, min(TRACK_WORKERS, len(groups) or 1))) as pool:
+        return [result for results in pool.map(check_group, groups) for result in results]
+
+
+# --------------------------------------------------------------------------- #
+# Settling Tracked Deletes
+# --------------------------------------------------------------------------- #
+def settle(table, items, digest=None):
+    """
+    Check every tracked delete in `items` and move finished ones to `deleted`
+    (recorded in `digest` for notification) or `delete_failed`. Returns counts
+    and the per-item results that changed state.
+    """
+    summary = {"tracked": len(items), "deleted": 0, "delete_failed": 0, "deleting": 0, "changed": []}
+    for result in check_deletions(items):
+        item, status = result["item"], result["status"]
+        summary[status] += 1
+        if status == "deleting":
+            continue
+
+        field, stamped_at = recordCodec.stamp("deletedAt" if status == "deleted" else "deleteFailedAt")
+        values = {":state": status, ":t": stamped_at}
+        expression = "SET #s=:state, #t=:t"
+        if result["reason"]:
+            expression += ", deleteError=:e"
+            values[":e"] = result["reason"]
+        with awsMetrics.phase("persist"):
+            table.update_item(
+                Key={"accountId": item["accountId"], "resourceId": item["resourceId"]},
+                UpdateExpression=expression,
+                ExpressionAttributeNames={"#s": "state", "#t": field},
+                ExpressionAttributeValues=values
+            )
+        if status == "deleted" and digest is not None:
+            digest.record(item["accountId"], item.get("email"), item.get("resourceType", "unknown").lower(),
+                          item.get("region", "ap-south-1"), item["resourceId"], item.get("deleteAfter"))
+        summary["changed"].append({"accountId": item["accountId"], "resourceId": item["resourceId"],
+                                   "status": status, "reason": result["reason"]})
+    return summary
+
+
+def _result(item, status, reason=None):
+    return {"item": item, "status": status, "reason": reason}
+
+
+def _timed_out(item, now):
+    requested = item.get("deleteRequestedAt")
+    if not requested:
+        return False
+    started = datetime.datetime.fromisoformat(requested.rstrip("Z"))
+    return now - started > datetime.timedelta(hours=TIMEOUT_HOURS)
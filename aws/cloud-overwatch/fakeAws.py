@@ -0,0 +1,649 @@
+import re
+import json
+import math
+import time
+import zlib
+import random
+import datetime
+import threading
+from collections import Counter
+from types import SimpleNamespace
+from boto3.dynamodb.types import TypeSerializer, TypeDeserializer
+from botocore.exceptions import ClientError
+
+# The Lambda's own account; every other account is a connected customer account
+HOME_ACCOUNT = "999999999999"
+FLEET_SERVICES = ("ec2", "s3", "rds", "dynamodb", "lambda")
+TAG_KEY = "overwatch-delete-after"
+
+# name -> (hash key, range key, {index name: (hash key, range key)})
+TABLES = {
+    "ConnectedAccounts": ("accountId", None, {}),
+    "AccountScanResults": ("accountId", "resourceId", {"state-deleteAfter-index": ("state", "deleteAfter")}),
+    "OverwatchState": ("stateKey", None, {}),
+}
+
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+
+# --------------------------------------------------------------------------- #
+# Fake boto3 Module
+# --------------------------------------------------------------------------- #
+class FakeAws:
+    """
+    Stateful in-process stand-in for the `boto3` module, for benchmarks.
+
+    Patch it in the way scanEngine.StubBoto3 is (clientPool.boto3 and
+    credentialCache.boto3). Unlike the stub it keeps state: the DynamoDB
+    tables, a synthetic tagged fleet per (account, region) and SNS
+    subscriptions. It also counts every call as "service.operation" and the
+    DynamoDB capacity each call would consume, using the on-demand sizing
+    rules: 4 KB per eventually consistent half read unit, 1 KB per write
+    unit, and GSI writes charged again.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = Counter()
+        self.capacity = {}
+        self.tables = {name: _TableStore(name, *spec) for name, spec in TABLES.items()}
+        self.fleet = {}             # (account, region) -> {resourceId: resource}
+        self.objects = {}           # (account, bucket) -> [{"Key", "VersionId"}]
+        self.subscriptions = {}     # topicArn -> [subscription]
+        self._lock = threading.Lock()
+        self.session = SimpleNamespace(Session=self._session)
+
+    # --- boto3 module surface ---------------------------------------------- #
+    def client(self, service, region_name=None, **kwargs):
+        return self._session(**kwargs).client(service, region_name=region_name)
+
+    def resource(self, service, region_name=None, **kwargs):
+        return self._session(**kwargs).resource(service, region_name=region_name)
+
+    def _session(self, aws_access_key_id=None, **kwargs):
+        account = aws_access_key_id[4:] if aws_access_key_id and aws_access_key_id.startswith("FAKE") else HOME_ACCOUNT
+        return _Session(self, account)
+
+    # --- Seeding and reporting --------------------------------------------- #
+    def seed(self, accounts, regions, resources, due_fraction=0.2, seed=7, today=None):
+        """Create `accounts` connected accounts, each with `resources` tagged resources per region."""
+        rng = random.Random(seed)
+        today = today or datetime.date.today()
+        account_ids = [f"{100000000000 + n}" for n in range(accounts)]
+        for account_id in account_ids:
+            self.tables["ConnectedAccounts"].put({
+                "accountId": account_id,
+                "roleArn": f"arn:aws:iam::{account_id}:role/CloudOverwatchRole",
+                "externalId": f"ext-{account_id}",
+                "email": f"owner-{account_id}@example.com",
+            })
+            for r, region in enumerate(regions):
+                fleet = self.fleet.setdefault((account_id, region), {})
+                for n in range(resources):
+                    days = -rng.randint(1, 30) if rng.random() < due_fraction else rng.randint(1, 60)
+                    resource = _make_resource(FLEET_SERVICES[n % len(FLEET_SERVICES)], account_id, region, r, n,
+                                              (today + datetime.timedelta(days=days)).isoformat())
+                    fleet[resource["id"]] = resource
+                    if resource["service"] == "s3":
+                        self.objects[(account_id, resource["id"])] = [
+                            {"Key": f"obj-{k}", "VersionId": f"v{k}"} for k in range(3)
+                        ]
+        return account_ids
+
+    def complete_deletes(self):
+        """Finish every long-running delete (RDS instances, DynamoDB tables), as AWS would between runs."""
+        with self._lock:
+            for fleet in self.fleet.values():
+                for resource in fleet.values():
+                    if resource["status"] in ("deleting", "DELETING"):
+                        resource["status"] = "deleted"
+
+    def reset_counters(self):
+        with self._lock:
+            self.calls.clear()
+            self.capacity.clear()
+
+    def report(self):
+        with self._lock:
+            capacity = {name: {k: round(v, 1) for k, v in units.items()} for name, units in self.capacity.items()}
+            return {
+                "awsCalls": sum(self.calls.values()),
+                "callsPerApi": dict(sorted(self.calls.items())),
+                "dynamodbCapacity": {
+                    "readUnits": round(sum(c["read"] for c in capacity.values()), 1),
+                    "writeUnits": round(sum(c["write"] for c in capacity.values()), 1),
+                    "byTable": capacity,
+                },
+            }
+
+    # --- Dispatch ------------------------------------------------------------ #
+    def call(self, service, operation, account, region, params):
+        with self._lock:
+            self.calls[f"{service}.{operation}"] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if service == "dynamodb" and account == HOME_ACCOUNT:
+            handler = getattr(self, f"_ddb_{operation}", None)
+        else:
+            handler = getattr(self, f"_{service}_{operation}", None)
+        if handler is None:
+            raise NotImplementedError(f"fakeAws does not implement {service}.{operation}")
+        return handler(account, region, **params)
+
+    def _consume(self, table, read=0.0, write=0.0):
+        with self._lock:
+            units = self.capacity.setdefault(table, {"read": 0.0, "write": 0.0})
+            units["read"] += read
+            units["write"] += write
+
+    def _read_units(self, table, items):
+        self._consume(table, read=math.ceil(max(1, sum(_size(i) for i in items)) / 4096) * 0.5)
+
+    def _write_units(self, table, old, new):
+        store = self.tables[table]
+        units = math.ceil(max(_size(old or {}), _size(new or {}), 1) / 1024)
+        for hash_key, range_key in store.indexes.values():
+            if any(item and hash_key in item and (not range_key or range_key in item) for item in (old, new)):
+                units += math.ceil(max(_size(new or old), 1) / 1024)
+        self._consume(table, write=units)
+
+    # --------------------------------------------------------------------- #
+    # DynamoDB (our own tables)
+    # --------------------------------------------------------------------- #
+    def _ddb_get_item(self, account, region, TableName, Key, **kwargs):
+        item = self.tables[TableName].get(Key)
+        self._read_units(TableName, [item] if item else [])
+        return {"Item": _project(item, kwargs)} if item else {}
+
+    def _ddb_put_item(self, account, region, TableName, Item, **kwargs):
+        old = self.tables[TableName].put(Item)
+        self._write_units(TableName, old, Item)
+        return {}
+
+    def _ddb_delete_item(self, account, region, TableName, Key, **kwargs):
+        old = self.tables[TableName].delete(Key)
+        self._write_units(TableName, old, None)
+        return {}
+
+    def _ddb_update_item(self, account, region, TableName, Key, UpdateExpression, **kwargs):
+        store = self.tables[TableName]
+        with store.lock:
+            old = store.get(Key)
+            new = _apply_update(dict(old or Key), UpdateExpression, kwargs.get("ExpressionAttributeNames", {}),
+                                kwargs.get("ExpressionAttributeValues", {}))
+            store.put(new)
+        self._write_units(TableName, old, new)
+        return {"Attributes": new} if kwargs.get("ReturnValues") == "ALL_NEW" else {}
+
+    def _ddb_query(self, account, region, TableName, KeyConditionExpression, **kwargs):
+        evaluated, last_key = self.tables[TableName].query(KeyConditionExpression, kwargs.get("IndexName"),
+                                                           kwargs.get("Limit"), kwargs.get("ExclusiveStartKey"))
+        self._read_units(TableName, evaluated)
+        return _page(evaluated, last_key, kwargs)
+
+    def _ddb_scan(self, account, region, TableName, **kwargs):
+        evaluated, last_key = self.tables[TableName].scan(kwargs.get("Limit"), kwargs.get("ExclusiveStartKey"),
+                                                          kwargs.get("Segment", 0), kwargs.get("TotalSegments", 1))
+        self._read_units(TableName, evaluated)
+        return _page(evaluated, last_key, kwargs)
+
+    def _ddb_batch_get_item(self, account, region, RequestItems):
+        responses = {}
+        for table, request in RequestItems.items():
+            found = [item for item in (self.tables[table].get(key) for key in request["Keys"]) if item]
+            self._read_units(table, found)
+            responses[table] = [_project(item, request) for item in found]
+        return {"Responses": responses, "UnprocessedKeys": {}}
+
+    def _ddb_batch_write_item(self, account, region, RequestItems):
+        for table, requests in RequestItems.items():
+            for request in requests:
+                if "PutRequest" in request:
+                    item = request["PutRequest"]["Item"]
+                    self._write_units(table, self.tables[table].put(item), item)
+                else:
+                    self._write_units(table, self.tables[table].delete(request["DeleteRequest"]["Key"]), None)
+        return {"UnprocessedItems": {}}
+
+    # --------------------------------------------------------------------- #
+    # STS / SNS / Lambda (the Lambda's own account)
+    # --------------------------------------------------------------------- #
+    def _sts_assume_role(self, account, region, RoleArn, **kwargs):
+        target = RoleArn.split(":")[4]
+        return {"Credentials": {
+            "AccessKeyId": f"FAKE{target}", "SecretAccessKey": "fake", "SessionToken": "fake",
+            "Expiration": datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(hours=1),
+        }, "AssumedRoleUser": {"Arn": f"arn:aws:sts::{target}:assumed-role/CloudOverwatchRole/{kwargs.get('RoleSessionName')}"}}
+
+    def _sts_get_caller_identity(self, account, region):
+        return {"Account": account}
+
+    def _sns_list_subscriptions_by_topic(self, account, region, TopicArn, **kwargs):
+        with self._lock:
+            return {"Subscriptions": list(self.subscriptions.get(TopicArn, []))}
+
+    def _sns_subscribe(self, account, region, TopicArn, Protocol, Endpoint, **kwargs):
+        with self._lock:
+            self.subscriptions.setdefault(TopicArn, []).append({"Protocol": Protocol, "Endpoint": Endpoint,
+                                                                "SubscriptionArn": "PendingConfirmation"})
+        return {"SubscriptionArn": "pending confirmation"}
+
+    def _sns_publish(self, account, region, **kwargs):
+        return {"MessageId": f"msg-{random.getrandbits(32):08x}"}
+
+    # --------------------------------------------------------------------- #
+    # Customer Accounts: Tagging, Liveness and Delete APIs
+    # --------------------------------------------------------------------- #
+    def _live(self, account, region, service):
+        return [r for r in self.fleet.get((account, region), {}).values() if r["service"] == service and r["alive"]]
+
+    def _resourcegroupstaggingapi_get_resources(self, account, region, ResourcesPerPage=50, PaginationToken="",
+                                                **kwargs):
+        tagged = [r for r in self.fleet.get((account, region), {}).values() if r["alive"]]
+        start = int(PaginationToken or 0)
+        page = tagged[start:start + ResourcesPerPage]
+        more = start + ResourcesPerPage < len(tagged)
+        return {
+            "ResourceTagMappingList": [{"ResourceARN": r["arn"], "Tags": [{"Key": TAG_KEY, "Value": r["deleteAfter"]}]}
+                                       for r in page],
+            "PaginationToken": str(start + ResourcesPerPage) if more else "",
+        }
+
+    def _ec2_describe_instances(self, account, region, Filters=(), InstanceIds=(), **kwargs):
+        wanted = set(InstanceIds) | {v for f in Filters for v in f["Values"]}
+        instances = [{"InstanceId": r["id"], "State": {"Name": r["status"]}}
+                     for r in self.fleet.get((account, region), {}).values()
+                     if r["service"] == "ec2" and r["id"] in wanted]
+        return {"Reservations": [{"Instances": instances}] if instances else []}
+
+    def _ec2_terminate_instances(self, account, region, InstanceIds):
+        for instance_id in InstanceIds:
+            self._delete(account, region, instance_id, "terminated")
+        return {}
+
+    def _s3_list_buckets(self, account, region):
+        return {"Buckets": [{"Name": r["id"]} for (acc, _), fleet in list(self.fleet.items()) if acc == account
+                            for r in fleet.values() if r["service"] == "s3" and r["alive"]]}
+
+    def _s3_list_object_versions(self, account, region, Bucket, MaxKeys=1000, **kwargs):
+        with self._lock:
+            versions = list(self.objects.get((account, Bucket), []))[:MaxKeys]
+        return {"Versions": versions, "DeleteMarkers": [], "IsTruncated": False}
+
+    def _s3_delete_objects(self, account, region, Bucket, Delete):
+        gone = {(o["Key"], o["VersionId"]) for o in Delete["Objects"]}
+        with self._lock:
+            remaining = [o for o in self.objects.get((account, Bucket), []) if (o["Key"], o["VersionId"]) not in gone]
+            self.objects[(account, Bucket)] = remaining
+        return {"Deleted": [{"Key": k, "VersionId": v} for k, v in gone], "Errors": []}
+
+    def _s3_delete_bucket(self, account, region, Bucket):
+        if self.objects.get((account, Bucket)):
+            raise _client_error("BucketNotEmpty", "The bucket you tried to delete is not empty", "DeleteBucket")
+        for (acc, bucket_region), fleet in self.fleet.items():
+            if acc == account and Bucket in fleet:
+                self._delete(account, bucket_region, Bucket, "deleted")
+        return {}
+
+    def _rds_describe_db_instances(self, account, region, Filters=(), DBInstanceIdentifier=None, **kwargs):
+        wanted = {v for f in Filters for v in f["Values"]} | ({DBInstanceIdentifier} if DBInstanceIdentifier else set())
+        found = [{"DBInstanceIdentifier": r["id"], "DBInstanceStatus": r["status"]}
+                 for r in self.fleet.get((account, region), {}).values()
+                 if r["service"] == "rds" and r["id"] in wanted and r["status"] != "deleted"]
+        if DBInstanceIdentifier and not found:
+            raise _client_error("DBInstanceNotFound", f"DBInstance {DBInstanceIdentifier} not found",
+                                "DescribeDBInstances")
+        return {"DBInstances": found}
+
+    def _rds_delete_db_instance(self, account, region, DBInstanceIdentifier, **kwargs):
+        self._delete(account, region, DBInstanceIdentifier, "deleting")
+        return {"DBInstance": {"DBInstanceIdentifier": DBInstanceIdentifier, "DBInstanceStatus": "deleting"}}
+
+    def _dynamodb_list_tables(self, account, region, **kwargs):
+        return {"TableNames": [r["id"] for r in self.fleet.get((account, region), {}).values()
+                               if r["service"] == "dynamodb" and r["status"] != "deleted"]}
+
+    def _dynamodb_describe_table(self, account, region, TableName):
+        resource = self.fleet.get((account, region), {}).get(TableName)
+        if not resource or resource["status"] == "deleted":
+            raise _client_error("ResourceNotFoundException", f"Table {TableName} not found", "DescribeTable")
+        return {"Table": {"TableName": TableName, "TableStatus": resource["status"]}}
+
+    def _dynamodb_delete_table(self, account, region, TableName):
+        self._delete(account, region, TableName, "DELETING")
+        return {"TableDescription": {"TableName": TableName, "TableStatus": "DELETING"}}
+
+    def _lambda_list_functions(self, account, region, **kwargs):
+        return {"Functions": [{"FunctionName": r["id"]} for r in self._live(account, region, "lambda")]}
+
+    def _lambda_delete_function(self, account, region, FunctionName):
+        self._delete(account, region, FunctionName, "deleted")
+        return {}
+
+    def _delete(self, account, region, resource_id, status):
+        resource = self.fleet.get((account, region), {}).get(resource_id)
+        if not resource or not resource["alive"]:
+            raise _client_error("ResourceNotFoundException", f"{resource_id} not found", "Delete")
+        resource.update(alive=False, status=status)
+
+
+# --------------------------------------------------------------------------- #
+# Sessions, Clients, Resources
+# --------------------------------------------------------------------------- #
+class _Session:
+    def __init__(self, aws, account):
+        self.aws = aws
+        self.account = account
+
+    def client(self, service, region_name=None, **kwargs):
+        # Credentials passed per client (as from a shared session) pick the account
+        if kwargs.get("aws_access_key_id"):
+            return self.aws.client(service, region_name=region_name, **kwargs)
+        return _Client(self.aws, service, self.account, region_name)
+
+    def resource(self, service, region_name=None, **kwargs):
+        if kwargs.get("aws_access_key_id"):
+            return self.aws.resource(service, region_name=region_name, **kwargs)
+        return _DynamoResource(self.aws, self.account, region_name)
+
+
+class _Client:
+    """Low-level client: DynamoDB batch calls speak AttributeValue JSON, like botocore."""
+
+    def __init__(self, aws, service, account, region):
+        self.aws = aws
+        self.service = service
+        self.account = account
+        self.region = region
+        self.meta = SimpleNamespace(region_name=region)
+
+    def get_paginator(self, operation):
+        call = getattr(self, operation)
+        return SimpleNamespace(paginate=lambda **kwargs: iter([call(**kwargs)]))
+
+    def __getattr__(self, operation):
+        if operation.startswith("_"):
+            raise AttributeError(operation)
+
+        def call(**kwargs):
+            typed = self.service == "dynamodb" and self.account == HOME_ACCOUNT
+            params = _untyped_request(kwargs) if typed else kwargs
+            result = self.aws.call(self.service, operation, self.account, self.region, params)
+            return _typed_response(result) if typed else result
+        return call
+
+
+class _DynamoResource:
+    def __init__(self, aws, account, region):
+        self.aws = aws
+        self.account = account
+        self.region = region
+        self.meta = SimpleNamespace(client=_Client(aws, "dynamodb", account, region))
+
+    def Table(self, name):
+        return _Table(self, name)
+
+    def batch_get_item(self, **kwargs):
+        return self.aws.call("dynamodb", "batch_get_item", self.account, self.region, kwargs)
+
+
+class _Table:
+    def __init__(self, resource, name):
+        self.resource = resource
+        self.name = name
+        self.meta = resource.meta
+
+    def __getattr__(self, operation):
+        if operation.startswith("_"):
+            raise AttributeError(operation)
+
+        def call(**kwargs):
+            return self.resource.aws.call("dynamodb", operation, self.resource.account, self.resource.region,
+                                          {"TableName": self.name, **kwargs})
+        return call
+
+
+# --------------------------------------------------------------------------- #
+# In-Memory Table
+# --------------------------------------------------------------------------- #
+class _TableStore:
+    def __init__(self, name, hash_key, range_key, indexes):
+        self.name = name
+        self.hash_key = hash_key
+        self.range_key = range_key
+        self.indexes = indexes
+        self.partitions = {}        # hash value -> {range value: item}
+        self.lock = threading.RLock()
+
+    def _key(self, key):
+        return key[self.hash_key], key.get(self.range_key) if self.range_key else None
+
+    def get(self, key):
+        h, r = self._key(key)
+        with self.lock:
+            item = self.partitions.get(h, {}).get(r)
+            return dict(item) if item else None
+
+    def put(self, item):
+        h, r = self._key(item)
+        with self.lock:
+            partition = self.partitions.setdefault(h, {})
+            old = partition.get(r)
+            partition[r] = dict(item)
+            return old
+
+    def delete(self, key):
+        h, r = self._key(key)
+        with self.lock:
+            return self.partitions.get(h, {}).pop(r, None)
+
+    def query(self, condition, index=None, limit=None, start_key=None):
+        """Items matching the key condition, in key order, one page of at most `limit`."""
+        with self.lock:
+            if index:
+                hash_key, range_key = self.indexes[index]
+                items = sorted((i for p in self.partitions.values() for i in p.values()
+                                if hash_key in i and (not range_key or range_key in i) and _matches(condition, i)),
+                               key=lambda i: (str(i.get(range_key)), self._sort_key(i)))
+                key_names = [self.hash_key, self.range_key, hash_key, range_key]
+            else:
+                h = _hash_value(condition, self.hash_key)
+                items = [i for _, i in sorted(self.partitions.get(h, {}).items(), key=lambda kv: str(kv[0]))
+                         if _matches(condition, i)]
+                key_names = [self.hash_key, self.range_key]
+        return _slice(items, [k for k in key_names if k], limit, start_key)
+
+    def scan(self, limit=None, start_key=None, segment=0, total_segments=1):
+        with self.lock:
+            # Parallel scan: each segment owns a slice of the partitions
+            items = sorted((i for key, p in self.partitions.items()
+                            if zlib.crc32(str(key).encode()) % total_segments == segment
+                            for i in p.values()), key=self._sort_key)
+        return _slice(items, [k for k in (self.hash_key, self.range_key) if k], limit, start_key)
+
+    def _sort_key(self, item):
+        return str(item.get(self.hash_key)), str(item.get(self.range_key)) if self.range_key else ""
+
+
+def _slice(items, key_names, limit, start_key):
+    start = 0
+    if start_key:
+        marker = tuple(start_key.get(k) for k in key_names)
+        for n, item in enumerate(items):
+            if tuple(item.get(k) for k in key_names) == marker:
+                start = n + 1
+                break
+    end = start + limit if limit else len(items)
+    page = [dict(i) for i in items[start:end]]
+    last_key = {k: page[-1][k] for k in key_names if k in page[-1]} if page and end < len(items) else None
+    return page, last_key
+
+
+def _page(evaluated, last_key, params):
+    items = [i for i in evaluated if _matches(params.get("FilterExpression"), i)]
+    resp = {"Items": [_project(i, params) for i in items], "Count": len(items), "ScannedCount": len(evaluated)}
+    if last_key:
+        resp["LastEvaluatedKey"] = last_key
+    return resp
+
+
+# --------------------------------------------------------------------------- #
+# Expression Helpers
+# --------------------------------------------------------------------------- #
+def _matches(condition, item):
+    """Evaluate a boto3.dynamodb.conditions expression against a plain item."""
+    if condition is None:
+        return True
+    expr = condition.get_expression()
+    op, values = expr["operator"], expr["values"]
+    if op == "AND":
+        return _matches(values[0], item) and _matches(values[1], item)
+    if op == "OR":
+        return _matches(values[0], item) or _matches(values[1], item)
+    if op == "NOT":
+        return not _matches(values[0], item)
+
+    name = values[0].name
+    present = name in item
+    value = item.get(name)
+    if op == "attribute_exists":
+        return present
+    if op == "attribute_not_exists":
+        return not present
+    if not present:
+        return False
+    if op == "=":
+        return value == values[1]
+    if op == "<>":
+        return value != values[1]
+    if op == "IN":
+        return value in values[1]
+    if op == "begins_with":
+        return str(value).startswith(values[1])
+    if op == "contains":
+        return values[1] in value
+    if op == "BETWEEN":
+        return values[1] <= value <= values[2]
+    compare = {"<": lambda a, b: a < b, "<=": lambda a, b: a <= b, ">": lambda a, b: a > b, ">=": lambda a, b: a >= b}
+    return compare[op](value, values[1])
+
+
+def _hash_value(condition, hash_key):
+    expr = condition.get_expression()
+    if expr["operator"] == "AND":
+        for part in expr["values"]:
+            found = _hash_value(part, hash_key)
+            if found is not None:
+                return found
+        return None
+    if expr["operator"] == "=" and expr["values"][0].name == hash_key:
+        return expr["values"][1]
+    return None
+
+
+def _project(item, params):
+    projection = params.get("ProjectionExpression")
+    if not projection:
+        return dict(item)
+    names = params.get("ExpressionAttributeNames", {})
+    fields = [names.get(f.strip(), f.strip()) for f in projection.split(",")]
+    return {f: item[f] for f in fields if f in item}
+
+
+def _apply_update(item, expression, names, values):
+    """Apply SET / REMOVE / ADD clauses of an UpdateExpression."""
+    def name(token):
+        return names.get(token.strip(), token.strip())
+
+    def operand(token):
+        token = token.strip()
+        match = re.match(r"if_not_exists\(\s*([^,]+),\s*(:\w+)\s*\)", token)
+        if match:
+            return item.get(name(match.group(1)), values[match.group(2)])
+        if "+" in token or " - " in token:
+            left, sign, right = re.split(r"\s*([+-])\s*", token, maxsplit=1)
+            a, b = operand(left), operand(right)
+            return a + b if sign == "+" else a - b
+        return values[token] if token.startswith(":") else item.get(name(token))
+
+    for action, body in re.findall(r"(SET|REMOVE|ADD|DELETE)\s+(.*?)(?=\s+(?:SET|REMOVE|ADD|DELETE)\s|$)", expression):
+        for clause in re.split(r",(?![^()]*\))", body):
+            if action == "SET":
+                target, value = clause.split("=", 1)
+                item[name(target)] = operand(value)
+            elif action == "REMOVE":
+                item.pop(name(clause), None)
+            elif action == "ADD":
+                target, value = clause.split()
+                item[name(target)] = item.get(name(target), 0) + values[value]
+    return item
+
+
+def _untyped_request(params):
+    out = dict(params)
+    if "RequestItems" in out:
+        request_items = {}
+        for table, request in out["RequestItems"].items():
+            if isinstance(request, dict):
+                request_items[table] = {**request, "Keys": [_plain(k) for k in request["Keys"]]}
+            else:
+                request_items[table] = [
+                    {"PutRequest": {"Item": _plain(r["PutRequest"]["Item"])}} if "PutRequest" in r
+                    else {"DeleteRequest": {"Key": _plain(r["DeleteRequest"]["Key"])}}
+                    for r in request
+                ]
+        out["RequestItems"] = request_items
+    for field in ("Key", "Item"):
+        if field in out:
+            out[field] = _plain(out[field])
+    return out
+
+
+def _typed_response(result):
+    out = dict(result)
+    if "Responses" in out:
+        out["Responses"] = {t: [_typed(i) for i in items] for t, items in out["Responses"].items()}
+    for field in ("Item", "Attributes"):
+        if field in out:
+            out[field] = _typed(out[field])
+    if "Items" in out:
+        out["Items"] = [_typed(i) for i in out["Items"]]
+    return out
+
+
+def _plain(raw):
+    return {k: _deserializer.deserialize(v) for k, v in raw.items()}
+
+
+def _typed(item):
+    return {k: _serializer.serialize(v) for k, v in item.items()}
+
+
+def _size(item):
+    return len(json.dumps(item, default=str))
+
+
+def _client_error(code, message, operation):
+    return ClientError({"Error": {"Code": code, "Message": message}}, operation)
+
+
+def _make_resource(service, account_id, region, r, n, delete_after):
+    suffix = f"{r}{n:05d}"
+    resource = {"service": service, "deleteAfter": delete_after, "alive": True}
+    if service == "ec2":
+        resource.update(id=f"i-{account_id[-6:]}{suffix}", status="running")
+        resource["arn"] = f"arn:aws:ec2:{region}:{account_id}:instance/{resource['id']}"
+    elif service == "s3":
+        resource.update(id=f"ow-{account_id}-{region}-{n}", status="active")
+        resource["arn"] = f"arn:aws:s3:::{resource['id']}"
+    elif service == "rds":
+        resource.update(id=f"db-{region}-{n}", status="available")
+        resource["arn"] = f"arn:aws:rds:{region}:{account_id}:db:{resource['id']}"
+    elif service == "dynamodb":
+        resource.update(id=f"tbl-{region}-{n}", status="ACTIVE")
+        resource["arn"] = f"arn:aws:dynamodb:{region}:{account_id}:table/{resource['id']}"
+    else:
+        resource.update(id=f"fn-{region}-{n}", status="Active")
+        resource["arn"] = f"arn:aws:lambda:{region}:{account_id}:function:{resource['id']}"
+    return resource
@@ -0,0 +1,241 @@
+import os
+import json
+import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import clientPool
+
+# "inline" keeps the old single-invocation behaviour; "lambda", "sqs" or "local" fan out
+DISPATCH_MODE = os.getenv("FANOUT_DISPATCH", "inline")
+SHARD_SIZE = int(os.getenv("FANOUT_SHARD_SIZE", "25"))
+# Concurrent synchronous worker invocations (lambda) or in-process consumers (local)
+MAX_INFLIGHT = int(os.getenv("FANOUT_MAX_INFLIGHT", "10"))
+# Worker function; defaults to the orchestrator's own function
+WORKER_FUNCTION = os.getenv("FANOUT_FUNCTION_NAME")
+QUEUE_URL = os.getenv("FANOUT_QUEUE_URL")
+REGION = os.getenv("AWS_REGION", "ap-south-1")
+
+# Per-worker settings that would be wrong to add up across shards
+NON_ADDITIVE = {"maxWorkers", "maxWorkersPerAccount", "hops", "shardIndex", "shardCount"}
+
+
+# --------------------------------------------------------------------------- #
+# Helper: Read ConnectedAccounts (all pages)
+# --------------------------------------------------------------------------- #
+def iter_accounts(accounts_table, projection="accountId, email"):
+    """Yield every connected account, following LastEvaluatedKey."""
+    params = {"ProjectionExpression": projection} if projection else {}
+    while True:
+        resp = accounts_table.scan(**params)
+        yield from resp.get("Items", [])
+        if not resp.get("LastEvaluatedKey"):
+            return
+        params["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+
+
+def shard(items, size=SHARD_SIZE):
+    size = max(1, int(size))
+    return [items[n:n + size] for n in range(0, len(items), size)]
+
+
+# --------------------------------------------------------------------------- #
+# Dispatchers
+# --------------------------------------------------------------------------- #
+# Each dispatcher takes a list of shard payloads and returns one result per
+# payload, in order: {"shardIndex", "statusCode", "body"} where body is the
+# worker's parsed response, or {"shardIndex", "queued": True} for fire-and-forget.
+
+class LambdaDispatcher:
+    """Synchronously invokes a worker Lambda per shard, up to MAX_INFLIGHT at once."""
+
+    def __init__(self, function_name, max_inflight=MAX_INFLIGHT):
+        self.function_name = function_name
+        self.max_inflight = max_inflight
+
+    def dispatch(self, payloads):
+        client = clientPool.get_client(None, REGION, "lambda")
+
+        def invoke(payload):
+            resp = client.invoke(FunctionName=self.function_name, InvocationType="RequestResponse",
+                                 Payload=json.dumps(payload).encode())
+            result = json.loads(resp["Payload"].read() or b"{}")
+            if resp.get("FunctionError"):
+                return {"shardIndex": payload["shardIndex"], "statusCode": 500,
+                        "body": {"error": result.get("errorMessage", resp["FunctionError"])}}
+            return _worker_result(payload, result)
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_inflight, len(payloads) or 1))) as pool:
+            return list(pool.map(lambda payload: _guarded(invoke, payload), payloads))
+
+
+class SqsDispatcher:
+    """
+    Enqueues one message per shard; a worker Lambda subscribed to the queue
+    (with ReportBatchItemFailures) picks them up via handle_queue_batch.
+    """
+
+    def __init__(self, queue_url):
+        self.queue_url = queue_url
+
+    def dispatch(self, payloads):
+        sqs = clientPool.get_client(None, REGION, "sqs")
+        results = []
+        for batch in shard(payloads, 10):
+            resp = sqs.send_message_batch(QueueUrl=self.queue_url, Entries=[
+                {"Id": str(payload["shardIndex"]), "MessageBody": json.dumps(payload)} for payload in batch
+            ])
+            failed = {entry["Id"]: entry.get("Message") for entry in resp.get("Failed", [])}
+            for payload in batch:
+                error = failed.get(str(payload["shardIndex"]))
+                results.append({"shardIndex": payload["shardIndex"], "queued": error is None,
+                                "statusCode": 500 if error else 202, "body": {"error": error} if error else {}})
+        return results
+
+
+class LocalQueueDispatcher:
+    """
+    In-process stand-in for a queue plus worker fleet: shards go onto a
+    queue.Queue and `workers` threads feed them to `handler(payload, None)`.
+    Used for local runs and tests.
+    """
+
+    def __init__(self, handler, workers=MAX_INFLIGHT):
+        self.handler = handler
+        self.workers = workers
+
+    def dispatch(self, payloads):
+        work = queue.Queue()
+        for payload in payloads:
+            work.put(payload)
+        results = {}
+
+        def consume():
+            while True:
+                try:
+                    payload = work.get_nowait()
+                except queue.Empty:
+                    return
+                results[payload["shardIndex"]] = _guarded(
+                    lambda p: _worker_result(p, self.handler(p, None)), payload
+                )
+
+        threads = [threading.Thread(target=consume) for _ in range(max(1, min(self.workers, len(payloads))))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return [results[payload["shardIndex"]] for payload in payloads]
+
+
+def dispatcher_for(mode, context=None, handler=None):
+    """Build the dispatcher for `mode`, or None for inline processing."""
+    mode = (mode or DISPATCH_MODE).lower()
+    if mode == "inline":
+        return None
+    if mode == "lambda":
+        function_name = WORKER_FUNCTION or getattr(context, "invoked_function_arn", None)
+        if not function_name:
+            raise ValueError("lambda dispatch needs FANOUT_FUNCTION_NAME or a Lambda context")
+        return LambdaDispatcher(function_name)
+    if mode == "sqs":
+        if not QUEUE_URL:
+            raise ValueError("sqs dispatch needs FANOUT_QUEUE_URL")
+        return SqsDispatcher(QUEUE_URL)
+    if mode == "local":
+        return LocalQueueDispatcher(handler)
+    raise ValueError(f"Unknown dispatch mode: {mode}")
+
+
+# --------------------------------------------------------------------------- #
+# Orchestrator
+# --------------------------------------------------------------------------- #
+def run_fanout(shards, dispatcher, make_payload):
+    """
+    Dispatch `shards` (lists of work items) through `dispatcher` and fold the
+    workers' responses into one summary. make_payload(items) builds the
+    worker event for a shard; shard bookkeeping fields are added here.
+    """
+    started = time.monotonic()
+    payloads = [{**make_payload(items), "shardIndex": n, "shardCount": len(shards)}
+                for n, items in enumerate(shards)]
+    results = dispatcher.dispatch(payloads) if payloads else []
+
+    summary = aggregate([r["body"] for r in results if r.get("statusCode") == 200])
+    summary.update({
+        "dispatch": type(dispatcher).__name__,
+        "shards": len(shards),
+        "shardsSucceeded": sum(1 for r in results if r.get("statusCode") == 200),
+        "shardsQueued": sum(1 for r in results if r.get("queued")),
+        "shardErrors": [{"shardIndex": r["shardIndex"], "statusCode": r.get("statusCode"),
+                         "error": r.get("body", {}).get("error")}
+                        for r in results if r.get("statusCode") not in (200, 202)],
+        "fanOutMs": int((time.monotonic() - started) * 1000),
+    })
+    return summary
+
+
+def aggregate(bodies):
+    """Sum numeric fields, concatenate lists and merge nested counters across worker responses."""
+    total = {}
+    for body in bodies:
+        _merge(total, body)
+    return total
+
+
+def _merge(total, body):
+    for key, value in body.items():
+        if isinstance(value, bool) or value is None or key in NON_ADDITIVE:
+            continue
+        if isinstance(value, (int, float)):
+            total[key] = total.get(key, 0) + value
+        elif isinstance(value, list):
+            total.setdefault(key, []).extend(value)
+        elif isinstance(value, dict):
+            _merge(total.setdefault(key, {}), value)
+
+
+# --------------------------------------------------------------------------- #
+# Helpers
+# --------------------------------------------------------------------------- #
+def _worker_result(payload, response):
+    """Normalise a handler response ({"statusCode", "body": json}) into a dispatch result."""
+    body = response.get("body", {})
+    if isinstance(body, str):
+        body = json.loads(body or "{}")
+    return {"shardIndex": payload["shardIndex"], "statusCode": response.get("statusCode", 200), "body": body}
+
+
+def _guarded(fn, payload):
+    try:
+        return fn(payload)
+    except Exception as e:
+        print(f"❌ Shard {payload['shardIndex']} failed: {e}")
+        return {"shardIndex": payload["shardIndex"], "statusCode": 500, "body": {"error": str(e)}}
+
+
+def handle_queue_batch(event, handler, context=None):
+    """
+    Worker side of SqsDispatcher: run every shard in an SQS event through
+    `handler`, or return None for other events. Shards that raise or answer
+    with a non-200 status are listed in batchItemFailures, so SQS redelivers
+    only those messages (and moves them to the queue's DLQ after
+    maxReceiveCount). The event source mapping needs ReportBatchItemFailures.
+    """
+    records = event.get("Records") if isinstance(event, dict) else None
+    if not records or records[0].get("eventSource") != "aws:sqs":
+        return None
+    bodies, failures = [], []
+    for record in records:
+        try:
+            response = handler(json.loads(record["body"]), context)
+            body = json.loads(response.get("body") or "{}")
+        except Exception as e:
+            print(f"❌ Queued shard {record.get('messageId')} failed: {e}")
+            failures.append({"itemIdentifier": record["messageId"]})
+            continue
+        if response.get("statusCode", 200) != 200:
+            print(f"❌ Queued shard {record.get('messageId')} returned {response.get('statusCode')}; will be retried")
+            failures.append({"itemIdentifier": record["messageId"]})
+        bodies.append(body)
+    return {"statusCode": 200, "body": json.dumps(bodies), "batchItemFailures": failures}
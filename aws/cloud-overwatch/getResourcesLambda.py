@@ -1,34 +1,75 @@
 import json
-import boto3
-from boto3.dynamodb.conditions import Attr
+import base64
+import awsMetrics
+import overwatchCore as core
+import recordCodec
+import responseCache
+import scanState
+from boto3.dynamodb.conditions import Attr, Key
 
+# Without a limit the whole result set is returned, as existing consumers expect
+MAX_LIMIT = 1000
+
+# Only the fields the dashboard renders, under both record formats
+_FIELDS = recordCodec.projection_names("accountId", "resourceId", "arn", "deleteAfter", "region", "resourceType",
+                                       "scannedAt")
+PROJECTION = {
+    "ProjectionExpression": ", ".join(f"#p{n}" for n in range(len(_FIELDS))),
+    "ExpressionAttributeNames": {f"#p{n}": field for n, field in enumerate(_FIELDS)},
+}
+
+
+@awsMetrics.emits_metrics
 def lambda_handler(event, context):
     try:
-        # Parse request body
-        body = event.get("body")
-        if isinstance(body, str):
-            body = json.loads(body)
-        elif body is None:
-            body = {}
+        # Parse request body (query string parameters underneath)
+        body = core.parse_body(event, include_query=True)
 
         account_id = body.get("accountId")
+        try:
+            limit = _parse_limit(body.get("limit"))
+        except ValueError:
+            return {"statusCode": 400, "body": json.dumps({"error": "limit must be a positive integer"})}
+        try:
+            start_key = _decode_token(body.get("nextToken"))
+        except ValueError:
+            return {"statusCode": 400, "body": json.dumps({"error": "Invalid nextToken"})}
 
-        dynamo = boto3.resource("dynamodb", region_name="ap-south-1")
-        table = dynamo.Table("AccountScanResults")
+        # Responses only change when a scan or delete run bumps the account's version
+        scope = account_id or scanState.ALL_ACCOUNTS
+        cache_key = (scope, limit, body.get("nextToken"))
+        try:
+            version = scanState.load_version(scope)
+        except Exception as e:
+            print(f"Result version unavailable, serving uncached: {e}")
+            version = None
+        if version is not None:
+            current_etag = responseCache.etag(scope, version, limit, body.get("nextToken"))
+            if responseCache.not_modified(event, current_etag):
+                return responseCache.not_modified_response(current_etag)
+            cached = responseCache.get(cache_key, version)
+            if cached:
+                return responseCache.respond(event, cached, "hit")
+
+        # Reused across warm invocations
+        table = core.results_table()
 
         # Fetch only active resources
         if account_id:
             print(f"Fetching ACTIVE resources for account {account_id}")
-            response = table.scan(
-                FilterExpression=Attr("accountId").eq(account_id) & Attr("state").eq("active")
-            )
+            params = {
+                "KeyConditionExpression": Key("accountId").eq(account_id),
+                "FilterExpression": Attr("state").eq("active"),
+            }
         else:
             print("Fetching all ACTIVE resources (no account filter)")
-            response = table.scan(
-                FilterExpression=Attr("state").eq("active")
-            )
+            params = {
+                "IndexName": core.STATE_INDEX,
+                "KeyConditionExpression": Key("state").eq("active"),
+            }
 
-        items = response.get("Items", [])
+        items, next_key = _query_page(table, {**params, **PROJECTION}, limit, start_key)
+        items = recordCodec.decode_items(items)
 
         # Format for frontend
         formatted = [
@@ -45,15 +86,16 @@ def lambda_handler(event, context):
 
         print(f"Found {len(formatted)} active resources for account {account_id or 'ALL'}")
 
-        return {
-            "statusCode": 200,
-            "headers": {"Content-Type": "application/json"},
-            "body": json.dumps({
-                "message": "Fetched active AWS resources successfully",
-                "count": len(formatted),
-                "resources": formatted
-            }),
-        }
+        response_body = json.dumps({
+            "message": "Fetched active AWS resources successfully",
+            "count": len(formatted),
+            "resources": formatted,
+            "nextToken": _encode_token(next_key),
+        })
+        if version is None:
+            return {"statusCode": 200, "headers": {"Content-Type": "application/json"}, "body": response_body}
+        entry = responseCache.put(cache_key, version, current_etag, response_body)
+        return responseCache.respond(event, entry, "miss")
 
     except Exception as e:
         print(f"Error fetching resources: {e}")
@@ -61,3 +103,51 @@ def lambda_handler(event, context):
             "statusCode": 500,
             "body": json.dumps({"error": str(e)}),
         }
+
+
+# --------------------------------------------------------------------------- #
+# Helper: One Page of Query Results
+# --------------------------------------------------------------------------- #
+def _query_page(table, params, limit, start_key=None):
+    """Query until `limit` items are collected (all of them when None) or the partition is exhausted."""
+    items = []
+    while True:
+        page_params = dict(params) if limit is None else {**params, "Limit": limit - len(items)}
+        if start_key:
+            page_params["ExclusiveStartKey"] = start_key
+        resp = table.query(**page_params)
+        items.extend(resp.get("Items", []))
+        start_key = resp.get("LastEvaluatedKey")
+        if not start_key or (limit is not None and len(items) >= limit):
+            return items, start_key
+
+
+def _parse_limit(value):
+    if value in (None, ""):
+        return None
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("Invalid limit")
+    return min(max(limit, 1), MAX_LIMIT)
+
+
+# --------------------------------------------------------------------------- #
+# Helper: Opaque Pagination Cursor
+# --------------------------------------------------------------------------- #
+def _encode_token(key):
+    if not key:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(key, default=str).encode()).decode()
+
+
+def _decode_token(token):
+    if not token:
+        return None
+    try:
+        key = json.loads(base64.urlsafe_b64decode(token.encode()))
+    except Exception:
+        raise ValueError("Invalid nextToken")
+    if not isinstance(key, dict):
+        raise ValueError("Invalid nextToken")
+    return key
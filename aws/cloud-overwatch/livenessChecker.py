@@ -0,0 +1,156 @@
+from botocore.exceptions import ClientError
+
+# Largest ID list each describe call accepts
+EC2_BATCH = 200
+RDS_BATCH = 100
+ECR_BATCH = 100
+
+
+# --------------------------------------------------------------------------- #
+# Batched Liveness Check
+# --------------------------------------------------------------------------- #
+def check_liveness(resources, clients, memo=None, unchecked=None):
+    """
+    Resolve many resources with a handful of multi-ID describe calls.
+
+    `resources` is an iterable of {"arn", "service", "resourceId"} dicts and
+    `clients` a mapping of service -> boto3 client (e.g. clientPool.LazyClients).
+    Returns {arn: bool} with the same meaning as is_resource_active: running /
+    available / ACTIVE resources are True, missing or unreadable ones False,
+    and services we do not know how to check are assumed active.
+
+    Pass the same `memo` dict across calls for one account/region (e.g. one
+    call per page) so account-wide listings are fetched only once.
+
+    A service whose check errors (throttling, access denied) reports its
+    resources as False; pass an `unchecked` set to collect their resourceIds,
+    so callers can tell "could not check" apart from "gone".
+    """
+    memo = {} if memo is None else memo
+    by_service = {}
+    for res in resources:
+        by_service.setdefault(res["service"], []).append(res)
+
+    active = {}
+    for service, group in by_service.items():
+        checker = _CHECKERS.get(service)
+        if checker is None:
+            active.update({res["arn"]: True for res in group})
+            continue
+        try:
+            live_ids = checker(clients, sorted({res["resourceId"] for res in group}), memo)
+        except Exception as e:
+            print(f"Liveness check failed for {len(group)} {service} resources: {e}")
+            live_ids = set()
+            if unchecked is not None:
+                unchecked.update(res["resourceId"] for res in group)
+        for res in group:
+            active[res["arn"]] = res["resourceId"] in live_ids
+    return active
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+# --------------------------------------------------------------------------- #
+# Per-Service Checkers: return the subset of IDs that are active
+# --------------------------------------------------------------------------- #
+def _ec2_active(clients, ids, memo):
+    # Only instance IDs can be described; filters (unlike InstanceIds) don't fail on unknown IDs
+    ids = [i for i in ids if i.startswith("i-")]
+    live = set()
+    paginator = clients["ec2"].get_paginator("describe_instances")
+    for chunk in _chunks(ids, EC2_BATCH):
+        for page in paginator.paginate(Filters=[{"Name": "instance-id", "Values": chunk}]):
+            for reservation in page.get("Reservations", []):
+                for instance in reservation.get("Instances", []):
+                    if instance["State"]["Name"] in ["running", "pending"]:
+                        live.add(instance["InstanceId"])
+    return live
+
+
+def _s3_active(clients, ids, memo):
+    # Bucket names are global to the account: one ListBuckets replaces a HeadBucket per bucket
+    if "s3" not in memo:
+        memo["s3"] = {b["Name"] for b in clients["s3"].list_buckets().get("Buckets", [])}
+    return memo["s3"].intersection(ids)
+
+
+def _rds_active(clients, ids, memo):
+    live = set()
+    paginator = clients["rds"].get_paginator("describe_db_instances")
+    for chunk in _chunks(ids, RDS_BATCH):
+        for page in paginator.paginate(Filters=[{"Name": "db-instance-id", "Values": chunk}]):
+            for db in page.get("DBInstances", []):
+                if db["DBInstanceStatus"] not in ["deleting", "deleted"]:
+                    live.add(db["DBInstanceIdentifier"])
+    return live
+
+
+def _dynamodb_active(clients, ids, memo):
+    # DynamoDB has no multi-table describe; tables missing from ListTables are skipped outright
+    if "dynamodb" not in memo:
+        memo["dynamodb"] = set()
+        for page in clients["dynamodb"].get_paginator("list_tables").paginate():
+            memo["dynamodb"].update(page.get("TableNames", []))
+    existing = memo["dynamodb"]
+
+    live = set()
+    for table_name in existing.intersection(ids):
+        try:
+            if clients["dynamodb"].describe_table(TableName=table_name)["Table"]["TableStatus"] == "ACTIVE":
+                live.add(table_name)
+        except Exception:
+            pass
+    return live
+
+
+def _lambda_active(clients, ids, memo):
+    if "lambda" not in memo:
+        memo["lambda"] = set()
+        for page in clients["lambda"].get_paginator("list_functions").paginate():
+            memo["lambda"].update(f["FunctionName"] for f in page.get("Functions", []))
+    return memo["lambda"].intersection(ids)
+
+
+def _cloudformation_active(clients, ids, memo):
+    # DescribeStacks without a name lists every non-deleted stack
+    if "cloudformation" not in memo:
+        memo["cloudformation"] = set()
+        for page in clients["cloudformation"].get_paginator("describe_stacks").paginate():
+            for stack in page.get("Stacks", []):
+                if not stack["StackStatus"].startswith("DELETE_"):
+                    memo["cloudformation"].update([stack["StackName"], stack["StackId"]])
+    return memo["cloudformation"].intersection(ids)
+
+
+def _ecr_active(clients, ids, memo):
+    live = set()
+    paginator = clients["ecr"].get_paginator("describe_repositories")
+    try:
+        for chunk in _chunks(ids, ECR_BATCH):
+            for page in paginator.paginate(repositoryNames=chunk):
+                live.update(r["repositoryName"] for r in page.get("repositories", []))
+        return live
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "RepositoryNotFoundException":
+            raise
+    # One missing name fails the whole named call; fall back to listing the registry
+    if "ecr" not in memo:
+        memo["ecr"] = set()
+        for page in paginator.paginate():
+            memo["ecr"].update(r["repositoryName"] for r in page.get("repositories", []))
+    return memo["ecr"].intersection(ids)
+
+
+_CHECKERS = {
+    "ec2": _ec2_active,
+    "s3": _s3_active,
+    "rds": _rds_active,
+    "dynamodb": _dynamodb_active,
+    "lambda": _lambda_active,
+    "cloudformation": _cloudformation_active,
+    "ecr": _ecr_active,
+}
@@ -0,0 +1,113 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import awsMetrics
+
+# SNS caps messages at 256 KB; leave headroom for attributes and encoding
+MAX_MESSAGE_BYTES = int(os.getenv("DIGEST_MAX_MESSAGE_BYTES", "240000"))
+PUBLISH_WORKERS = int(os.getenv("DIGEST_PUBLISH_WORKERS", "4"))
+
+
+# --------------------------------------------------------------------------- #
+# Deletion Digest Aggregator
+# --------------------------------------------------------------------------- #
+class DeletionDigest:
+    """
+    Collects deletion events during a run and publishes one digest per
+    (account, email), grouped by service and region.
+
+    record() is cheap and thread-safe, so it can be called from deletion
+    workers. flush_account() hands an account's digest to a background
+    publisher and returns at once. wait() blocks until every digest is out.
+    """
+
+    def __init__(self, sns, topic_arn, run_date):
+        self.sns = sns
+        self.topic_arn = topic_arn
+        self.run_date = run_date
+        self._events = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=PUBLISH_WORKERS)
+        self._futures = []
+
+    def record(self, account_id, email, service, region, resource_id, delete_after):
+        with self._lock:
+            self._events.setdefault((account_id, email), []).append(
+                {"service": service, "region": region, "resourceId": resource_id, "deleteAfter": delete_after}
+            )
+
+    def flush_account(self, account_id):
+        with self._lock:
+            keys = [key for key in self._events if key[0] == account_id]
+            batches = [(key, self._events.pop(key)) for key in keys]
+        for (acc_id, email), events in batches:
+            self._futures.append(self._pool.submit(self._publish, acc_id, email, events))
+
+    def wait(self):
+        """Flush whatever is left, wait for all publishes and return a report."""
+        with self._lock:
+            accounts = {key[0] for key in self._events}
+        for account_id in accounts:
+            self.flush_account(account_id)
+
+        report = {"digests": 0, "messages": 0, "resources": 0, "failed": 0}
+        for future in self._futures:
+            result = future.result()
+            for key in report:
+                report[key] += result[key]
+        self._futures = []
+        self._pool.shutdown(wait=True)
+        return report
+
+    # ----------------------------------------------------------------------- #
+    def _publish(self, account_id, email, events):
+        parts = build_messages(account_id, events, self.run_date)
+        result = {"digests": 1, "messages": 0, "resources": len(events), "failed": 0}
+        attributes = {"accountId": {"DataType": "String", "StringValue": str(account_id)}}
+        if email:
+            # Lets the topic route digests with subscription filter policies
+            attributes["email"] = {"DataType": "String", "StringValue": email}
+
+        for n, message in enumerate(parts, start=1):
+            subject = f"CloudOverwatch: {len(events)} resources deleted in {account_id}"
+            if len(parts) > 1:
+                subject += f" ({n}/{len(parts)})"
+            try:
+                with awsMetrics.phase("notify"):
+                    self.sns.publish(TopicArn=self.topic_arn, Subject=subject[:100], Message=message,
+                                     MessageAttributes=attributes)
+                result["messages"] += 1
+            except Exception as e:
+                print(f"Failed to publish digest part {n} for {account_id}: {e}")
+                result["failed"] += 1
+        return result
+
+
+# --------------------------------------------------------------------------- #
+# Helper: Render and Split Digest Text
+# --------------------------------------------------------------------------- #
+def build_messages(account_id, events, run_date):
+    """Render events grouped by service then region, split into parts under MAX_MESSAGE_BYTES."""
+    header = (
+        f"The following resources in account {account_id} were automatically deleted on {run_date}:\n"
+    )
+    grouped = {}
+    for event in events:
+        grouped.setdefault(event["service"], {}).setdefault(event["region"], []).append(event)
+
+    lines = []
+    for service in sorted(grouped):
+        lines.append(f"\n{service.upper()}")
+        for region in sorted(grouped[service]):
+            lines.append(f"  {region}:")
+            for event in grouped[service][region]:
+                lines.append(f"    - {event['resourceId']} (overwatch-delete-after = {event['deleteAfter']})")
+
+    parts, current = [], header
+    for line in lines:
+        if len((current + line + "\n").encode()) > MAX_MESSAGE_BYTES and current != header:
+            parts.append(current)
+            current = header + "(continued)\n"
+        current += line + "\n"
+    parts.append(current)
+    return parts
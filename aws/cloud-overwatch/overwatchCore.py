@@ -0,0 +1,100 @@
+import os
+import json
+import time
+import threading
+import clientPool
+
+# --------------------------------------------------------------------------- #
+# Shared Config
+# --------------------------------------------------------------------------- #
+DB_REGION = os.getenv("OVERWATCH_DB_REGION", "ap-south-1")
+RESULTS_TABLE = os.getenv("RESULTS_TABLE", "AccountScanResults")
+ACCOUNTS_TABLE = os.getenv("ACCOUNTS_TABLE") or os.getenv("CONNECTED_ACCOUNTS_TABLE", "ConnectedAccounts")
+SNS_TOPIC_ARN = os.getenv("SNS_TOPIC_ARN")
+# GSI on AccountScanResults: partition key `state`, sort key `deleteAfter`, projection ALL
+STATE_INDEX = os.getenv("STATE_INDEX", "state-deleteAfter-index")
+
+# Module-level state: nothing is built at import, everything is reused while warm
+_tables = {}
+_lock = threading.Lock()
+INIT_MS = {}        # what -> ms spent building it the first time
+
+
+# --------------------------------------------------------------------------- #
+# Lazily Initialised Clients and Tables
+# --------------------------------------------------------------------------- #
+def dynamo():
+    return _timed("dynamodb", lambda: clientPool.get_resource(None, DB_REGION, "dynamodb"))
+
+
+def table(name):
+    with _lock:
+        if name in _tables:
+            return _tables[name]
+    built = _timed(f"table:{name}", lambda: dynamo().Table(name))
+    with _lock:
+        return _tables.setdefault(name, built)
+
+
+def results_table():
+    return table(RESULTS_TABLE)
+
+
+def accounts_table():
+    return table(ACCOUNTS_TABLE)
+
+
+def sns():
+    # Talk to the topic's own region
+    region = SNS_TOPIC_ARN.split(":")[3] if SNS_TOPIC_ARN and SNS_TOPIC_ARN.count(":") >= 5 else DB_REGION
+    return _timed("sns", lambda: clientPool.get_client(None, region, "sns"))
+
+
+def sts():
+    return _timed("sts", lambda: clientPool.get_client(None, None, "sts"))
+
+
+def reset():
+    """Forget cached tables (e.g. after clientPool.clear() or when swapping in stubs)."""
+    with _lock:
+        _tables.clear()
+        INIT_MS.clear()
+
+
+def init_stats():
+    with _lock:
+        return dict(INIT_MS)
+
+
+def _timed(what, build):
+    """Call build(), recording how long it took the first time `what` was built."""
+    with _lock:
+        seen = what in INIT_MS
+    if seen:
+        return build()
+    started = time.perf_counter()
+    result = build()
+    with _lock:
+        INIT_MS.setdefault(what, round((time.perf_counter() - started) * 1000, 2))
+    return result
+
+
+# --------------------------------------------------------------------------- #
+# Request Parsing
+# --------------------------------------------------------------------------- #
+def parse_body(event, include_query=False):
+    """
+    Request body as a dict, for API Gateway proxy events and direct invokes
+    alike. With include_query, queryStringParameters are merged underneath.
+    """
+    body = event.get("body", event) if isinstance(event, dict) else event
+    if isinstance(body, (str, bytes)):
+        try:
+            body = json.loads(body or "{}")
+        except ValueError:
+            body = {}
+    if not isinstance(body, dict):
+        body = {}
+    if include_query and isinstance(event, dict):
+        body = {**(event.get("queryStringParameters") or {}), **body}
+    return body
@@ -0,0 +1,212 @@
+import os
+import datetime
+from decimal import Decimal
+import credentialCache
+import overwatchCore as core
+
+# "compact" writes the short encoding below; "full" writes records as before. Reads accept both.
+RECORD_FORMAT = os.getenv("RECORD_FORMAT", "compact")
+COMPACT_VERSION = 1
+# Tags kept on compact records besides the delete-after tag (which is stored as deleteAfter)
+KEPT_TAGS = [t for t in os.getenv("RECORD_KEPT_TAGS", "Name").split(",") if t]
+DELETE_AFTER_TAG = "overwatch-delete-after"
+
+# accountId, resourceId, state and deleteAfter keep their names and values:
+# they are the table / state-index keys and are used in key and filter expressions.
+
+# Interned values; anything not listed is stored verbatim (codes never collide with real names)
+REGION_CODES = {
+    "us-east-1": "use1", "us-east-2": "use2", "us-west-1": "usw1", "us-west-2": "usw2",
+    "ca-central-1": "cac1", "sa-east-1": "sae1", "af-south-1": "afs1", "il-central-1": "ilc1",
+    "eu-central-1": "euc1", "eu-central-2": "euc2", "eu-west-1": "euw1", "eu-west-2": "euw2",
+    "eu-west-3": "euw3", "eu-north-1": "eun1", "eu-south-1": "eus1", "eu-south-2": "eus2",
+    "me-south-1": "mes1", "me-central-1": "mec1", "ap-east-1": "ape1",
+    "ap-south-1": "aps1", "ap-south-2": "aps2", "ap-southeast-1": "apse1", "ap-southeast-2": "apse2",
+    "ap-southeast-3": "apse3", "ap-southeast-4": "apse4", "ap-northeast-1": "apne1",
+    "ap-northeast-2": "apne2", "ap-northeast-3": "apne3",
+}
+SERVICE_CODES = {
+    "ec2": "e", "s3": "s", "rds": "r", "dynamodb": "d", "lambda": "l", "ecr": "c", "cloudformation": "f",
+}
+_REGIONS = {code: name for name, code in REGION_CODES.items()}
+_SERVICES = {code: name for name, code in SERVICE_CODES.items()}
+
+# Timestamps: full name -> compact name (stored as epoch seconds, fractional to the microsecond,
+# and decoded back to the exact ISO string they were written as)
+TIME_FIELDS = {
+    "scannedAt": "sa", "goneAt": "ga", "deletedAt": "dd",
+    "deleteRequestedAt": "dq", "deleteFailedAt": "df",
+}
+# Compact names of the remaining fields
+REGION, SERVICE, ARN, ARN_SUFFIX, TAGS, TAGS_HASH = "rg", "rt", "a", "ar", "tg", "th"
+
+
+# --------------------------------------------------------------------------- #
+# Encoding
+# --------------------------------------------------------------------------- #
+def encode(item, record_format=None):
+    """Return the stored form of a full scan record (unchanged when writing the full format)."""
+    if (record_format or RECORD_FORMAT) != "compact" or item.get("v") == COMPACT_VERSION:
+        return item
+
+    compact = {"v": COMPACT_VERSION}
+    for field in ("accountId", "resourceId", "state", "deleteAfter", "deleteError"):
+        if item.get(field) is not None:
+            compact[field] = item[field]
+
+    region = item.get("region")
+    service = item.get("resourceType")
+    if region:
+        compact[REGION] = REGION_CODES.get(region, region)
+    if service:
+        compact[SERVICE] = SERVICE_CODES.get(service, service)
+
+    # Most ARNs are arn:aws:<service>:<region>:<account>:<rest>; only <rest> is stored for those
+    arn = item.get("arn")
+    prefix = _arn_prefix(service, region, item.get("accountId"))
+    if arn and arn.startswith(prefix):
+        compact[ARN_SUFFIX] = arn[len(prefix):]
+    elif arn:
+        compact[ARN] = arn
+
+    # The full tag map is only needed for change detection, which the hash covers
+    tags = item.get("tags") or {}
+    kept = {key: tags[key] for key in KEPT_TAGS if key in tags}
+    if kept:
+        compact[TAGS] = kept
+    if item.get("tagsHash"):
+        compact[TAGS_HASH] = item["tagsHash"]
+
+    for field, short in TIME_FIELDS.items():
+        if item.get(field):
+            compact[short] = _encode_time(item[field])
+    # The account's own email is read back from ConnectedAccounts; only a different one (e.g. passed
+    # to a manual scan) is kept on the record, so notifications still go where they did before
+    email = item.get("email")
+    if email and email != _account_email(item.get("accountId")):
+        compact["email"] = email
+    return compact
+
+
+def stamp(field, when=None, record_format=None):
+    """(attribute name, value) for writing timestamp `field` in an update expression."""
+    when = when or datetime.datetime.utcnow()
+    if (record_format or RECORD_FORMAT) == "compact":
+        return TIME_FIELDS[field], _encode_time(when.isoformat() + "Z")
+    return field, when.isoformat() + "Z"
+
+
+# --------------------------------------------------------------------------- #
+# Decoding (accepts either format)
+# --------------------------------------------------------------------------- #
+def decode(item, email=None):
+    """Return the full form of a stored record; full-format records pass through."""
+    if not item:
+        return item
+    full = {key: value for key, value in item.items()
+            if key not in (REGION, SERVICE, ARN, ARN_SUFFIX, TAGS, TAGS_HASH, "v")
+            and key not in _SHORT_TIME_FIELDS}
+
+    if REGION in item:
+        full["region"] = _REGIONS.get(item[REGION], item[REGION])
+    if SERVICE in item:
+        full["resourceType"] = _SERVICES.get(item[SERVICE], item[SERVICE])
+    if ARN_SUFFIX in item:
+        full["arn"] = _arn_prefix(full.get("resourceType"), full.get("region"), full.get("accountId")) + item[ARN_SUFFIX]
+    elif ARN in item:
+        full["arn"] = item[ARN]
+    if TAGS_HASH in item:
+        full["tagsHash"] = item[TAGS_HASH]
+    if "v" in item:
+        tags = dict(item.get(TAGS) or {})
+        if full.get("deleteAfter"):
+            tags[DELETE_AFTER_TAG] = full["deleteAfter"]
+        full["tags"] = tags
+
+    for field, short in TIME_FIELDS.items():
+        if short in item:
+            full[field] = _decode_time(item[short])
+
+    if "email" not in full and email is not None:
+        full["email"] = email
+    return full
+
+
+def decode_items(items, with_email=False):
+    """Decode a list of records; with_email fills the owner email from ConnectedAccounts (cached)."""
+    emails = {}
+    if with_email:
+        for account_id in {item["accountId"] for item in items if "email" not in item}:
+            try:
+                account = credentialCache.get_account(core.accounts_table(), account_id)
+            except Exception as e:
+                print(f"Failed to load account {account_id} for record email: {e}")
+                account = None
+            emails[account_id] = (account or {}).get("email")
+    return [decode(item, emails.get(item["accountId"])) for item in items]
+
+
+def projection_names(*fields):
+    """Stored attribute names for `fields` in both formats, for ProjectionExpressions."""
+    names = []
+    for field in fields:
+        names.append(field)
+        names.extend({
+            "region": [REGION], "resourceType": [SERVICE], "arn": [ARN, ARN_SUFFIX, REGION, SERVICE],
+            "tags": [TAGS, "v"], "tagsHash": [TAGS_HASH],
+        }.get(field, [TIME_FIELDS[field]] if field in TIME_FIELDS else []))
+    return list(dict.fromkeys(names))
+
+
+# --------------------------------------------------------------------------- #
+# Helpers
+# --------------------------------------------------------------------------- #
+_SHORT_TIME_FIELDS = set(TIME_FIELDS.values())
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def is_compact(item):
+    return item.get("v") == COMPACT_VERSION
+
+
+def to_epoch(value):
+    if isinstance(value, (int, float)):
+        return int(value)
+    parsed = datetime.datetime.fromisoformat(value.rstrip("Z"))
+    return int(parsed.replace(tzinfo=datetime.timezone.utc).timestamp())
+
+
+def _encode_time(value):
+    """Epoch seconds as a Decimal with microseconds, or the string itself if that would not round-trip."""
+    if isinstance(value, (int, float, Decimal)):
+        return Decimal(str(value))
+    try:
+        parsed = datetime.datetime.fromisoformat(value.rstrip("Z"))
+    except ValueError:
+        return value
+    if parsed.tzinfo is not None:
+        return value
+    micros = (parsed - _EPOCH) // datetime.timedelta(microseconds=1)
+    encoded = Decimal(micros).scaleb(-6).normalize()
+    return encoded if _decode_time(encoded) == value else value
+
+
+def _decode_time(value):
+    if isinstance(value, str):
+        return value
+    # Exact for Decimal: whole-second values give "...:SSZ", others keep their microseconds
+    micros = int(Decimal(value).scaleb(6))
+    return (_EPOCH + datetime.timedelta(microseconds=micros)).isoformat() + "Z"
+
+
+def _account_email(account_id):
+    try:
+        account = credentialCache.get_account(core.accounts_table(), account_id) if account_id else None
+    except Exception as e:
+        print(f"Failed to load account {account_id} for record email: {e}")
+        return None
+    return (account or {}).get("email")
+
+
+def _arn_prefix(service, region, account_id):
+    return f"arn:aws:{service}:{region}:{account_id}:"
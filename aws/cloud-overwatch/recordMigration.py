@@ -0,0 +1,84 @@
+import json
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+import overwatchCore as core
+import recordCodec
+from scanWriter import batch_put_unwritten
+
+DEFAULT_SEGMENTS = 4
+PAGE_SIZE = 500
+
+
+# --------------------------------------------------------------------------- #
+# Re-encode AccountScanResults
+# --------------------------------------------------------------------------- #
+def migrate(record_format="compact", segments=DEFAULT_SEGMENTS, dry_run=False, table=None):
+    """
+    Re-encode every record not already in `record_format` with a parallel Scan,
+    writing each page back with BatchWriteItem. Safe to re-run: records already
+    in the target format are skipped. Returns counts and estimated item bytes.
+    """
+    table = table or core.results_table()
+
+    def run_segment(segment):
+        stats = {"scanned": 0, "migrated": 0, "skipped": 0, "failed": 0, "bytesBefore": 0, "bytesAfter": 0}
+        params = {"Segment": segment, "TotalSegments": segments, "Limit": PAGE_SIZE}
+        while True:
+            resp = table.scan(**params)
+            batch = []
+            for item in resp.get("Items", []):
+                stats["scanned"] += 1
+                if recordCodec.is_compact(item) == (record_format == "compact"):
+                    stats["skipped"] += 1
+                    continue
+                # Decoding without an email keeps a full record's own email; compact ones never had one
+                converted = recordCodec.encode(recordCodec.decode(item), record_format)
+                stats["bytesBefore"] += item_size(item)
+                stats["bytesAfter"] += item_size(converted)
+                batch.append(converted)
+            if batch and not dry_run:
+                stats["failed"] += len(batch_put_unwritten(table, batch))
+            stats["migrated"] += len(batch)
+            if not resp.get("LastEvaluatedKey"):
+                return stats
+            params["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+
+    with ThreadPoolExecutor(max_workers=segments) as pool:
+        per_segment = list(pool.map(run_segment, range(segments)))
+
+    totals = {key: sum(stats[key] for stats in per_segment) for key in per_segment[0]}
+    totals["migrated"] -= totals["failed"]
+    totals.update({"format": record_format, "segments": segments, "dryRun": dry_run})
+    if totals["bytesBefore"]:
+        totals["sizeRatio"] = round(totals["bytesAfter"] / totals["bytesBefore"], 3)
+    return totals
+
+
+def item_size(item):
+    """Approximate DynamoDB item size in bytes: attribute names plus values."""
+    return sum(len(name.encode()) + _value_size(value) for name, value in item.items())
+
+
+def _value_size(value):
+    if isinstance(value, str):
+        return len(value.encode())
+    if isinstance(value, bool) or value is None:
+        return 1
+    if isinstance(value, (int, float, Decimal)):
+        return len(str(value).lstrip("-").replace(".", "")) // 2 + 2
+    if isinstance(value, dict):
+        return 3 + sum(len(k.encode()) + _value_size(v) + 1 for k, v in value.items())
+    if isinstance(value, (list, set, tuple)):
+        return 3 + sum(_value_size(v) + 1 for v in value)
+    return len(str(value).encode())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-encode AccountScanResults records in batches.")
+    parser.add_argument("--format", choices=["compact", "full"], default="compact",
+                        help="target record format (full rolls compact records back)")
+    parser.add_argument("--segments", type=int, default=DEFAULT_SEGMENTS, help="parallel Scan segments")
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without writing")
+    args = parser.parse_args()
+    print(json.dumps(migrate(args.format, args.segments, args.dry_run), indent=2))
@@ -0,0 +1,119 @@
+import os
+import json
+import time
+import datetime
+import threading
+import clientPool
+import scanState
+
+# Default region set when an account has no per-account "regions" configured
+DEFAULT_REGIONS = json.loads(os.getenv(
+    "SCAN_REGIONS", '["ap-south-1", "ap-south-2", "ap-southeast-1", "ap-northeast-1"]'
+))
+# "configured" sweeps DEFAULT_REGIONS; "enabled" asks EC2 which regions the account has enabled
+DISCOVERY_MODE = os.getenv("REGION_DISCOVERY", "configured")
+# "adaptive" skips cold regions between probes; "all" scans every candidate region every run
+SCHEDULE_MODE = os.getenv("REGION_SCHEDULE", "adaptive")
+# A region is hot if it had tagged resources within this window
+HOT_WINDOW_DAYS = int(os.getenv("REGION_HOT_WINDOW_DAYS", "14"))
+# Cold regions are re-probed at most this often
+COLD_PROBE_INTERVAL_HOURS = int(os.getenv("REGION_COLD_PROBE_INTERVAL_HOURS", "72"))
+ENABLED_REGIONS_TTL_SECONDS = int(os.getenv("ENABLED_REGIONS_TTL_SECONDS", "86400"))
+
+# Module-level cache: accountId -> {"regions", "fetchedAt"}
+_enabled = {}
+_lock = threading.Lock()
+
+
+# --------------------------------------------------------------------------- #
+# Region Discovery
+# --------------------------------------------------------------------------- #
+def enabled_regions(account_id, creds):
+    """Regions enabled in the account (opt-in regions only if opted in), cached per warm container."""
+    with _lock:
+        cached = _enabled.get(account_id)
+        if cached and time.monotonic() - cached["fetchedAt"] < ENABLED_REGIONS_TTL_SECONDS:
+            return cached["regions"]
+
+    ec2 = clientPool.get_client(account_id, DEFAULT_REGIONS[0], "ec2", creds)
+    regions = sorted(r["RegionName"] for r in ec2.describe_regions(AllRegions=False).get("Regions", []))
+    with _lock:
+        _enabled[account_id] = {"regions": regions, "fetchedAt": time.monotonic()}
+    return regions
+
+
+def candidate_regions(account, creds=None, discovery=None):
+    """
+    Regions worth considering for `account`, plus the ones ruled out:
+    a per-account "regions" list wins, otherwise DEFAULT_REGIONS, narrowed to
+    enabled regions in "enabled" discovery mode.
+    """
+    if account.get("regions"):
+        return list(account["regions"]), []
+
+    if (discovery or DISCOVERY_MODE) != "enabled" or not creds:
+        return list(DEFAULT_REGIONS), []
+
+    try:
+        enabled = set(enabled_regions(account["accountId"], creds))
+    except Exception as e:
+        print(f"⚠️ Region discovery failed for {account['accountId']}, using defaults: {e}")
+        return list(DEFAULT_REGIONS), []
+    return ([region for region in DEFAULT_REGIONS if region in enabled],
+            [{"region": region, "reason": "not-enabled"} for region in DEFAULT_REGIONS if region not in enabled])
+
+
+# --------------------------------------------------------------------------- #
+# Adaptive Schedule
+# --------------------------------------------------------------------------- #
+def classify(watermark, now):
+    """Return (scan?, reason) for one region from its watermark."""
+    if not watermark.get("lastScanAt"):
+        return True, "never-scanned"
+    if "lastTaggedCount" not in watermark and not watermark.get("lastActiveAt"):
+        # Scanned before activity was tracked
+        return True, "no-activity-data"
+    last_active = _parse(watermark.get("lastActiveAt"))
+    if last_active and now - last_active <= datetime.timedelta(days=HOT_WINDOW_DAYS):
+        return True, "hot"
+
+    next_probe = _parse(watermark["lastScanAt"]) + datetime.timedelta(hours=COLD_PROBE_INTERVAL_HOURS)
+    if now >= next_probe:
+        return True, "cold-probe"
+    since = f"since {watermark['lastActiveAt']}" if watermark.get("lastActiveAt") else "found yet"
+    return False, f"cold: no tagged resources {since}, next probe after {next_probe.isoformat()}Z"
+
+
+def plan_regions(account, creds=None, schedule=None, discovery=None, now=None):
+    """
+    Decide which regions to scan for `account` this run.
+    Returns {"regions": [...], "skipped": [{"region", "reason"}], "reasons": {region: why scanned}},
+    plus "watermarks" ({region: watermark}) for the scanned regions when the adaptive schedule read them.
+    """
+    now = now or datetime.datetime.utcnow()
+    regions, skipped = candidate_regions(account, creds, discovery)
+    if (schedule or SCHEDULE_MODE) != "adaptive":
+        return {"regions": regions, "skipped": skipped, "reasons": {region: "scheduled" for region in regions}}
+
+    try:
+        watermarks = scanState.load_watermarks(account["accountId"], regions)
+    except Exception as e:
+        print(f"⚠️ Could not load region activity for {account['accountId']}, scanning all: {e}")
+        return {"regions": regions, "skipped": skipped, "reasons": {region: "no-activity-data" for region in regions}}
+
+    # The watermarks go along with the plan so the scan does not read them again
+    plan = {"regions": [], "skipped": skipped, "reasons": {}, "watermarks": {}}
+    for region in regions:
+        scan, reason = classify(watermarks.get(region, {"generation": 0}), now)
+        if scan:
+            plan["regions"].append(region)
+            plan["reasons"][region] = reason
+            if region in watermarks:
+                plan["watermarks"][region] = watermarks[region]
+        else:
+            plan["skipped"].append({"region": region, "reason": reason})
+    return plan
+
+
+def _parse(timestamp):
+    return datetime.datetime.fromisoformat(timestamp.rstrip("Z")) if timestamp else None
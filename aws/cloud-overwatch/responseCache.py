@@ -0,0 +1,115 @@
+import os
+import gzip
+import base64
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Entries kept across warm invocations (least recently used are evicted first)
+MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "256"))
+# Bodies at least this large are gzipped for clients that accept it
+GZIP_MIN_BYTES = int(os.getenv("RESPONSE_GZIP_MIN_BYTES", "8192"))
+
+# Module-level cache: (scope, limit, nextToken) -> {"version", "etag", "body", "gzipped"}
+_entries = OrderedDict()
+_lock = threading.Lock()
+
+STATS = {"hits": 0, "misses": 0, "notModified": 0, "gzipped": 0, "evictions": 0}
+
+
+# --------------------------------------------------------------------------- #
+# Validators
+# --------------------------------------------------------------------------- #
+def etag(scope, version, *request_key):
+    """
+    Weak ETag for a response: a function of the data version and the request,
+    so it can be checked before (or without) building the body. Weak, because
+    gzip and identity encodings of the same response share it.
+    """
+    digest = hashlib.sha256(repr((scope, version) + request_key).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def not_modified(event, current_etag):
+    """True when the request's If-None-Match already names `current_etag`."""
+    header = _header(event, "if-none-match")
+    if not header:
+        return False
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    matched = "*" in tags or current_etag.removeprefix("W/") in tags
+    if matched:
+        with _lock:
+            STATS["notModified"] += 1
+    return matched
+
+
+# --------------------------------------------------------------------------- #
+# Cache
+# --------------------------------------------------------------------------- #
+def get(key, version):
+    """The cached entry for `key` if it was built at `version`, else None."""
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None or entry["version"] != version:
+            STATS["misses"] += 1
+            return None
+        _entries.move_to_end(key)
+        STATS["hits"] += 1
+        return entry
+
+
+def put(key, version, entry_etag, body):
+    entry = {"version": version, "etag": entry_etag, "body": body, "gzipped": None}
+    with _lock:
+        _entries[key] = entry
+        _entries.move_to_end(key)
+        while len(_entries) > MAX_ENTRIES:
+            _entries.popitem(last=False)
+            STATS["evictions"] += 1
+    return entry
+
+
+def clear():
+    with _lock:
+        _entries.clear()
+
+
+def cache_stats():
+    with _lock:
+        return {**STATS, "entries": len(_entries)}
+
+
+# --------------------------------------------------------------------------- #
+# Responses
+# --------------------------------------------------------------------------- #
+def respond(event, entry, cache_status):
+    """200 response for a cache entry, gzipped (and memoized) when large and accepted."""
+    headers = {
+        "Content-Type": "application/json",
+        "ETag": entry["etag"],
+        "Cache-Control": "private, no-cache",
+        "Vary": "Accept-Encoding",
+        "X-Cache": cache_status,
+    }
+    if len(entry["body"]) < GZIP_MIN_BYTES or "gzip" not in (_header(event, "accept-encoding") or ""):
+        return {"statusCode": 200, "headers": headers, "body": entry["body"]}
+
+    if entry["gzipped"] is None:
+        entry["gzipped"] = base64.b64encode(gzip.compress(entry["body"].encode(), compresslevel=6)).decode()
+    with _lock:
+        STATS["gzipped"] += 1
+    return {"statusCode": 200, "headers": {**headers, "Content-Encoding": "gzip"},
+            "body": entry["gzipped"], "isBase64Encoded": True}
+
+
+def not_modified_response(current_etag):
+    return {"statusCode": 304, "headers": {"ETag": current_etag, "Cache-Control": "private, no-cache",
+                                           "Vary": "Accept-Encoding"}, "body": ""}
+
+
+def _header(event, name):
+    # API Gateway header names arrive in whatever case the client sent
+    for key, value in ((event or {}).get("headers") or {}).items():
+        if key.lower() == name:
+            return value
+    return None
@@ -0,0 +1,114 @@
+import os
+import json
+import time
+import uuid
+import datetime
+import clientPool
+import scanState
+
+# Stop starting new work once less than this much Lambda time is left
+RESERVE_MS = int(os.getenv("TIME_BUDGET_RESERVE_MS", "60000"))
+# "reinvoke" (self-invoke asynchronously) or "return" (hand the token back to the caller)
+RESUME_MODE = os.getenv("RESUME_MODE", "reinvoke")
+# Safety valve against a run that never makes progress
+MAX_HOPS = int(os.getenv("RESUME_MAX_HOPS", "50"))
+CURSOR_TTL_DAYS = 7
+# DynamoDB items cap at 400 KB; leave room for the key and the other attributes
+MAX_CURSOR_BYTES = 380 * 1024
+
+
+# --------------------------------------------------------------------------- #
+# Lambda Time Budget
+# --------------------------------------------------------------------------- #
+class TimeBudget:
+    """Wraps context.get_remaining_time_in_millis(); unlimited when there is no context (local runs)."""
+
+    def __init__(self, context, reserve_ms=RESERVE_MS):
+        self.context = context
+        self.reserve_ms = reserve_ms
+
+    def remaining_ms(self):
+        if self.context is None or not hasattr(self.context, "get_remaining_time_in_millis"):
+            return None
+        return self.context.get_remaining_time_in_millis()
+
+    def exhausted(self):
+        remaining = self.remaining_ms()
+        return remaining is not None and remaining <= self.reserve_ms
+
+    def deadline(self):
+        """time.monotonic() value at which the reserve is reached, or None."""
+        remaining = self.remaining_ms()
+        if remaining is None:
+            return None
+        return time.monotonic() + max(0, remaining - self.reserve_ms) / 1000
+
+
+# --------------------------------------------------------------------------- #
+# Cursor Persistence (OverwatchState table)
+# --------------------------------------------------------------------------- #
+def _state_key(token):
+    kind, _, run_id = token.partition(":")
+    return f"run#{kind}#{run_id}"
+
+
+def save_cursor(kind, cursor):
+    """
+    Persist a cursor and return its continuation token ("<kind>:<runId>").
+    Raises ValueError when the cursor would not fit in one state item.
+    """
+    run_id = cursor.setdefault("runId", uuid.uuid4().hex)
+    token = f"{kind}:{run_id}"
+    serialized = json.dumps(cursor, default=str, separators=(",", ":"))
+    if len(serialized.encode()) > MAX_CURSOR_BYTES:
+        raise ValueError(f"{kind} cursor {token} is {len(serialized.encode())} bytes, over the "
+                         f"{MAX_CURSOR_BYTES}-byte checkpoint limit; the run cannot be resumed")
+    scanState.state_table().put_item(Item={
+        "stateKey": _state_key(token),
+        "cursor": serialized,
+        "updatedAt": datetime.datetime.utcnow().isoformat() + "Z",
+        "expiresAt": int(time.time()) + CURSOR_TTL_DAYS * 86400,
+    })
+    return token
+
+
+def load_cursor(kind, token):
+    if not token or not token.startswith(f"{kind}:"):
+        return None
+    item = scanState.state_table().get_item(Key={"stateKey": _state_key(token)}).get("Item")
+    return json.loads(item["cursor"]) if item else None
+
+
+def clear_cursor(token):
+    if token:
+        scanState.state_table().delete_item(Key={"stateKey": _state_key(token)})
+
+
+# --------------------------------------------------------------------------- #
+# Continuation: Persist, then Re-invoke or Return the Token
+# --------------------------------------------------------------------------- #
+def continue_run(kind, cursor, context, mode=None):
+    """
+    Save `cursor` and, in reinvoke mode, start the next slice asynchronously.
+    Returns fields to merge into the handler's response.
+    """
+    cursor["hops"] = int(cursor.get("hops", 0)) + 1
+    token = save_cursor(kind, cursor)
+    mode = (mode or RESUME_MODE).lower()
+    result = {"continuationToken": token, "hops": cursor["hops"], "reinvoked": False}
+
+    if cursor["hops"] > MAX_HOPS:
+        print(f"⚠️ {kind} run {token} hit RESUME_MAX_HOPS; resume manually with the continuation token.")
+        return result
+
+    function_name = getattr(context, "invoked_function_arn", None) or getattr(context, "function_name", None)
+    if mode == "reinvoke" and function_name:
+        region = os.getenv("AWS_REGION", "ap-south-1")
+        clientPool.get_client(None, region, "lambda").invoke(
+            FunctionName=function_name,
+            InvocationType="Event",
+            Payload=json.dumps({"continuationToken": token, "resumeMode": mode}).encode()
+        )
+        result["reinvoked"] = True
+        print(f"🔁 Out of time budget; re-invoked {function_name} to continue {token}")
+    return result
@@ -0,0 +1,227 @@
+import os
+import json
+import time
+import random
+import threading
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Concurrency limits (overridable per invocation via the request body)
+MAX_WORKERS = int(os.getenv("SCAN_MAX_WORKERS", "16"))
+MAX_WORKERS_PER_ACCOUNT = int(os.getenv("SCAN_MAX_WORKERS_PER_ACCOUNT", "4"))
+
+
+# --------------------------------------------------------------------------- #
+# Helper: Resolve Concurrency Limits
+# --------------------------------------------------------------------------- #
+def engine_limits(body=None):
+    """Read global / per-account limits from the request body, falling back to env."""
+    body = body or {}
+    max_workers = int(body.get("maxWorkers") or MAX_WORKERS)
+    per_account = int(body.get("maxWorkersPerAccount") or MAX_WORKERS_PER_ACCOUNT)
+    return max(1, max_workers), max(1, min(per_account, max_workers))
+
+
+# --------------------------------------------------------------------------- #
+# Helper: Build (account, region) Work Units
+# --------------------------------------------------------------------------- #
+def build_units(accounts, regions):
+    return [
+        {"accountId": acc["accountId"], "email": acc.get("email"), "region": region}
+        for acc in accounts
+        for region in regions
+    ]
+
+
+# --------------------------------------------------------------------------- #
+# Bounded-Concurrency Runner
+# --------------------------------------------------------------------------- #
+def run_units(units, worker, max_workers=MAX_WORKERS, per_account=MAX_WORKERS_PER_ACCOUNT, should_stop=None):
+    """
+    Run worker(unit) for every unit with at most `max_workers` in flight overall
+    and at most `per_account` in flight for any one account.
+
+    Units waiting on their account's limit are held back by the scheduler rather
+    than parked inside a pool thread, so a busy account never starves the others.
+    Once should_stop() returns True no new units are started; those are returned
+    under "pending".
+    """
+    started = time.monotonic()
+    pending = list(units)
+    in_flight = {}
+    per_account_running = {}
+    results, errors = [], []
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        while pending or in_flight:
+            # Submit every unit whose account still has headroom
+            i = 0
+            stopping = should_stop is not None and should_stop()
+            while not stopping and i < len(pending) and len(in_flight) < max_workers:
+                unit = pending[i]
+                account_id = unit["accountId"]
+                if per_account_running.get(account_id, 0) >= per_account:
+                    i += 1
+                    continue
+                pending.pop(i)
+                per_account_running[account_id] = per_account_running.get(account_id, 0) + 1
+                in_flight[pool.submit(_timed, worker, unit)] = unit
+
+            if not in_flight:
+                break
+            done, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+            for future in done:
+                unit = in_flight.pop(future)
+                per_account_running[unit["accountId"]] -= 1
+                outcome = future.result()
+                if outcome["error"]:
+                    print(f"⚠️ [{unit['accountId']}] {unit['region']} scan failed: {outcome['error']}")
+                    errors.append({**_unit_key(unit), "error": outcome["error"], "durationMs": outcome["durationMs"]})
+                else:
+                    results.append({**_unit_key(unit), "unit": unit, "result": outcome["result"],
+                                    "durationMs": outcome["durationMs"]})
+
+    return {
+        "units": len(units),
+        "succeeded": len(results),
+        "errors": errors,
+        "results": results,
+        "pending": pending,
+        "durationMs": int((time.monotonic() - started) * 1000),
+        "maxWorkers": max_workers,
+        "maxWorkersPerAccount": per_account,
+    }
+
+
+def _timed(worker, unit):
+    start = time.monotonic()
+    try:
+        result, error = worker(unit), None
+    except Exception as e:
+        result, error = None, str(e)
+    return {"result": result, "error": error, "durationMs": int((time.monotonic() - start) * 1000)}
+
+
+def _unit_key(unit):
+    return {"accountId": unit["accountId"], "region": unit["region"]}
+
+
+# --------------------------------------------------------------------------- #
+# Stub Mode: Offline Speedup Measurement
+# --------------------------------------------------------------------------- #
+class StubClient:
+    """Stand-in for a boto3 client/resource/Table that answers every call after `latency` seconds."""
+
+    def __init__(self, service, latency, fleet):
+        self.service = service
+        self.latency = latency
+        self.fleet = fleet
+        self.name = service
+        self.meta = SimpleNamespace(client=self)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def Table(self, name):
+        return StubClient(name, self.latency, self.fleet)
+
+    def get_paginator(self, operation):
+        call = getattr(self, operation)
+        return SimpleNamespace(paginate=lambda **kwargs: iter([call(**kwargs)]))
+
+    def __getattr__(self, operation):
+        def call(**kwargs):
+            with self._lock:
+                self.calls += 1
+            time.sleep(self.latency * random.uniform(0.8, 1.2))
+            return self._respond(operation, kwargs)
+        return call
+
+    def _respond(self, operation, kwargs):
+        if operation == "assume_role":
+            return {"Credentials": {"AccessKeyId": "stub", "SecretAccessKey": "stub", "SessionToken": "stub"}}
+        if operation == "get_caller_identity":
+            return {"Account": "100000000000"}
+        if operation == "get_item" and "accountId" in kwargs["Key"]:
+            account_id = kwargs["Key"]["accountId"]
+            return {"Item": {"accountId": account_id, "roleArn": f"arn:aws:iam::{account_id}:role/stub", "externalId": "stub"}}
+        if operation == "get_resources":
+            return {"ResourceTagMappingList": [
+                {"ResourceARN": f"arn:aws:ec2:stub:000000000000:instance/i-{n:08x}",
+                 "Tags": [{"Key": "overwatch-delete-after", "Value": "2099-01-01"}]}
+                for n in range(self.fleet)
+            ]}
+        if operation == "describe_instances":
+            ids = kwargs.get("InstanceIds") or [v for f in kwargs.get("Filters", []) for v in f["Values"]]
+            return {"Reservations": [{"Instances": [{"InstanceId": i, "State": {"Name": "running"}} for i in ids]}]}
+        return {}
+
+
+class StubBoto3:
+    """Drop-in for the `boto3` module that hands out StubClients."""
+
+    def __init__(self, latency=0.05, fleet=3):
+        self.latency = latency
+        self.fleet = fleet
+        self.session = SimpleNamespace(Session=lambda **kwargs: self)
+
+    def client(self, service, **kwargs):
+        return StubClient(service, self.latency, self.fleet)
+
+    resource = client
+
+
+def run_stubbed(accounts=10, regions=None, latency=0.05, fleet=3, max_workers=MAX_WORKERS,
+                per_account=MAX_WORKERS_PER_ACCOUNT):
+    """Run the real scan path against stubbed AWS clients, serially and in parallel, and report the speedup."""
+    import clientPool
+    import credentialCache
+    import overwatchCore as core
+    import scanResourcesLambda as scanner
+
+    regions = regions or scanner.TARGET_REGIONS
+    fake_accounts = [{"accountId": f"{100000000000 + n}", "email": f"owner{n}@example.com"} for n in range(accounts)]
+    units = build_units(fake_accounts, regions)
+
+    stubbed_modules = [credentialCache, clientPool]
+    real_boto3 = clientPool.boto3
+    for module in stubbed_modules:
+        module.boto3 = StubBoto3(latency=latency, fleet=fleet)
+    try:
+        results_table = clientPool.boto3.resource("dynamodb").Table("AccountScanResults")
+        worker = lambda unit: scanner.scan_unit(unit, results_table)
+        serial = run_units(units, worker, max_workers=1, per_account=1)
+        credentialCache.invalidate_all()
+        clientPool.clear()
+        core.reset()
+        parallel = run_units(units, worker, max_workers=max_workers, per_account=per_account)
+    finally:
+        for module in stubbed_modules:
+            module.boto3 = real_boto3
+        credentialCache.invalidate_all()
+        clientPool.clear()
+        core.reset()
+
+    return {
+        "units": len(units),
+        "serialMs": serial["durationMs"],
+        "parallelMs": parallel["durationMs"],
+        "speedup": round(serial["durationMs"] / max(parallel["durationMs"], 1), 2),
+        "errors": len(parallel["errors"]),
+        "maxWorkers": max_workers,
+        "maxWorkersPerAccount": per_account,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Measure scan engine speedup against stubbed AWS clients.")
+    parser.add_argument("--accounts", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.05, help="simulated seconds per AWS call")
+    parser.add_argument("--fleet", type=int, default=3, help="tagged resources per account/region")
+    parser.add_argument("--max-workers", type=int, default=MAX_WORKERS)
+    parser.add_argument("--per-account", type=int, default=MAX_WORKERS_PER_ACCOUNT)
+    args = parser.parse_args()
+
+    print(json.dumps(run_stubbed(args.accounts, latency=args.latency, fleet=args.fleet,
+                                 max_workers=args.max_workers, per_account=args.per_account), indent=2))
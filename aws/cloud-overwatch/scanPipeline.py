@@ -0,0 +1,157 @@
+import os
+import time
+import queue
+import threading
+import awsMetrics
+
+# Largest ResourcesPerPage the Resource Groups Tagging API accepts
+PAGE_SIZE = 100
+# Pages allowed to wait between two stages; bounds memory per scan unit
+QUEUE_PAGES = int(os.getenv("SCAN_PIPELINE_QUEUE_PAGES", "2"))
+
+_DONE = object()
+
+
+# --------------------------------------------------------------------------- #
+# Stage 1 Source: Tagged Resource Pages
+# --------------------------------------------------------------------------- #
+def iter_tagged_pages(tag_client, tag_key="overwatch-delete-after", cursor=None, should_stop=None):
+    """
+    Yield get_resources pages one at a time instead of draining them into a list.
+
+    `cursor` ({"token": ...}) sets the starting PaginationToken and is kept up to
+    date, so a caller that stops early via should_stop() knows where to resume;
+    cursor["complete"] is set once the last page has been fetched.
+    """
+    cursor = cursor if cursor is not None else {}
+    token = cursor.get("token")
+    cursor["complete"] = False
+    while True:
+        if should_stop is not None and should_stop():
+            return
+        params = {"TagFilters": [{"Key": tag_key}], "ResourcesPerPage": PAGE_SIZE}
+        if token:
+            params["PaginationToken"] = token
+        with awsMetrics.phase("tagging-fetch"):
+            resp = tag_client.get_resources(**params)
+        token = resp.get("PaginationToken")
+        cursor["token"] = token
+        cursor["complete"] = not token
+        yield resp.get("ResourceTagMappingList", [])
+        if not token:
+            break
+
+
+# --------------------------------------------------------------------------- #
+# fetch → check → write Pipeline
+# --------------------------------------------------------------------------- #
+def run_pipeline(pages, check, write, queue_pages=QUEUE_PAGES):
+    """
+    Stream pages through check(page) -> checked and write(checked) -> counters dict
+    (e.g. {"written": n, "unchanged": m}), which are summed into the stats.
+
+    Fetching, checking and writing each run on their own thread, connected by
+    queues holding at most `queue_pages` pages, so page N+1 is fetched while
+    page N is being checked and page N-1 written, and memory stays bounded
+    however many resources the account has.
+
+    Returns per-stage busy time, item counts and the overall wall time.
+    """
+    started = time.monotonic()
+    stats = {"pages": 0, "fetched": 0, "checked": 0, "fetchMs": 0, "checkMs": 0, "writeMs": 0}
+    to_check = queue.Queue(maxsize=max(1, queue_pages))
+    to_write = queue.Queue(maxsize=max(1, queue_pages))
+    stop = threading.Event()
+    errors = []
+
+    def fetch_stage():
+        try:
+            iterator = iter(pages)
+            while not stop.is_set():
+                t = time.monotonic()
+                page = next(iterator, _DONE)
+                stats["fetchMs"] += _ms(t)
+                if page is _DONE:
+                    break
+                stats["pages"] += 1
+                stats["fetched"] += len(page)
+                _put(to_check, page, stop)
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            _put(to_check, _DONE, stop)
+
+    def check_stage():
+        try:
+            while True:
+                page = _get(to_check, stop)
+                if page is _DONE:
+                    break
+                t = time.monotonic()
+                checked = check(page)
+                stats["checkMs"] += _ms(t)
+                stats["checked"] += len(checked)
+                if checked:
+                    _put(to_write, checked, stop)
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            _put(to_write, _DONE, stop)
+
+    workers = [threading.Thread(target=fetch_stage, daemon=True), threading.Thread(target=check_stage, daemon=True)]
+    for worker in workers:
+        worker.start()
+
+    # Write stage runs on the calling thread
+    try:
+        while True:
+            checked = _get(to_write, stop)
+            if checked is _DONE:
+                break
+            t = time.monotonic()
+            merge_stats(stats, write(checked))
+            stats["writeMs"] += _ms(t)
+    except Exception as e:
+        errors.append(e)
+    finally:
+        stop.set()
+        for worker in workers:
+            worker.join()
+
+    if errors:
+        raise errors[0]
+    stats["skipped"] = stats["fetched"] - stats["checked"]
+    stats["wallMs"] = _ms(started)
+    return stats
+
+
+def merge_stats(total, stats):
+    """Accumulate pipeline stats from several units into `total`."""
+    for key, value in stats.items():
+        total[key] = total.get(key, 0) + value
+    return total
+
+
+def _ms(since):
+    return int((time.monotonic() - since) * 1000)
+
+
+def _put(q, item, stop):
+    # Give up once the pipeline is stopping so a dead consumer can't wedge a producer
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            continue
+
+
+def _get(q, stop):
+    while True:
+        try:
+            return q.get(timeout=0.1)
+        except queue.Empty:
+            if stop.is_set():
+                return _DONE
@@ -1,182 +1,461 @@
-import boto3
 import json
 import datetime
-
-# Predefined India & Nearby AWS Regions
-TARGET_REGIONS = ["ap-south-1", "ap-south-2", "ap-southeast-1", "ap-northeast-1"]
-
+from concurrent.futures import ThreadPoolExecutor
+import awsMetrics
+import clientPool
+import credentialCache
+import overwatchCore as core
+from livenessChecker import check_liveness
+import regionPlanner
+import scanState
+import snapshotExport
+from scanWriter import fetch_stored, tombstone_missing, unchanged_active, write_delta
+from scanPipeline import iter_tagged_pages, merge_stats, run_pipeline
+from fanOut import SHARD_SIZE, dispatcher_for, handle_queue_batch, iter_accounts, run_fanout, shard
+from runCheckpoint import TimeBudget, clear_cursor, continue_run, load_cursor
+from scanEngine import MAX_WORKERS, MAX_WORKERS_PER_ACCOUNT, build_units, engine_limits, run_units
+
+# Predefined India & Nearby AWS Regions (SCAN_REGIONS); per-account lists and discovery live in regionPlanner
+TARGET_REGIONS = regionPlanner.DEFAULT_REGIONS
+# Request-body keys that steer region selection
+REGION_OPTIONS = ("regions", "regionSchedule", "regionDiscovery")
+
+@awsMetrics.emits_metrics
 def lambda_handler(event, context):
-    # --- Parse Input ---
-    body = event.get("body") if isinstance(event, dict) else event
-    if isinstance(body, str):
-        try:
-            body = json.loads(body)
-        except Exception:
-            body = {}
-    elif not body:
-        body = {}
+    # Shards delivered through the fan-out queue
+    queued = handle_queue_batch(event, lambda_handler, context)
+    if queued is not None:
+        return queued
 
-    dynamo = boto3.resource("dynamodb", region_name="ap-south-1")  # primary region for DB access
-    accounts_table = dynamo.Table("ConnectedAccounts")
-    results_table = dynamo.Table("AccountScanResults")
-
-    # --- CASE 1: Auto Scan for All Connected Accounts ---
+    # --- Parse Input ---
+    body = core.parse_body(event)
+
+    # Built on first use, then reused across warm invocations
+    accounts_table = core.accounts_table()
+    results_table = core.results_table()
+
+    # --- CASE 0: Continue a Run That Ran Out of Time ---
+    token = body.get("continuationToken")
+    if token:
+        cursor = load_cursor("scan", token)
+        if not cursor:
+            return {"statusCode": 404, "body": json.dumps({"error": "Unknown or expired continuationToken"})}
+        units = unpack_units(cursor)
+        print(f"🔁 Resuming scan run {token}: {len(units)} units left (hop {cursor.get('hops', 0)}).")
+        run, continuation = _scan_units(units, results_table, cursor, context, token, body.get("resumeMode"))
+        summary = {**_summary(run), **continuation}
+        print(f"✅ Scan slice completed: {summary}")
+        return {"statusCode": 200, "body": json.dumps(summary)}
+
+    # --- CASE 1: Auto Scan for All Connected Accounts (or one fan-out shard of them) ---
     if not body.get("accountId"):
         print("⚙️ No accountId found — running regional scan for all connected accounts.")
         try:
-            accounts = accounts_table.scan().get("Items", [])
+            dispatcher = None if body.get("accounts") else dispatcher_for(body.get("dispatch"), context, lambda_handler)
+        except ValueError as e:
+            return {"statusCode": 400, "body": json.dumps({"error": str(e)})}
+        try:
+            accounts = body.get("accounts") or list(iter_accounts(accounts_table))
             print(f"🔍 Found {len(accounts)} connected accounts to scan.")
+        except Exception as e:
+            print(f"❌ Error fetching accounts: {e}")
+            return {"statusCode": 500, "body": json.dumps({"error": "Failed to fetch connected accounts"})}
 
-            summary = {"accounts_scanned": 0, "total_resources": 0, "failed": []}
-
-            for acc in accounts:
-                account_id = acc["accountId"]
-                email = acc.get("email")
-                try:
-                    print(f"➡️ Scanning account: {account_id}")
-                    result = scan_across_regions(account_id, email, results_table)
-                    result_body = json.loads(result["body"])
-                    summary["accounts_scanned"] += 1
-                    summary["total_resources"] += result_body.get("tagged_resources_stored", 0)
-                except Exception as e:
-                    print(f"❌ Failed scan for {account_id}: {e}")
-                    summary["failed"].append(account_id)
+        try:
+            # Every worker / hop of this run adds its part to the same snapshot
+            snapshot_id = _snapshot_id(body)
+
+            # --- Orchestrator: shard accounts across worker invocations ---
+            if dispatcher:
+                shards = shard(sorted(accounts, key=lambda acc: acc["accountId"]), body.get("shardSize") or SHARD_SIZE)
+                passthrough = {k: body[k] for k in ("scanMode", "maxWorkers", "maxWorkersPerAccount", "resumeMode")
+                               + REGION_OPTIONS if body.get(k)}
+                summary = run_fanout(shards, dispatcher, lambda items: {
+                    **passthrough, "accounts": items, "dispatch": "inline",
+                    **({"snapshotId": snapshot_id} if snapshot_id else {})
+                })
+                if snapshot_id:
+                    summary.setdefault("snapshot", {})["snapshotId"] = snapshot_id
+                print(f"✅ Fan-out scan completed: {len(shards)} shards, {summary['shardsSucceeded']} succeeded.")
+                return {"statusCode": 200, "body": json.dumps(summary)}
+
+            # Stable order so a resumed run's remaining units are well defined
+            cursor = {"scanMode": body.get("scanMode"), "limits": engine_limits(body), "snapshotId": snapshot_id}
+            units, skipped = plan_units(sorted(accounts, key=lambda acc: acc["accountId"]),
+                                        _region_options(body), cursor["limits"][0])
+            run, continuation = _scan_units(units, results_table, cursor, context, resume_mode=body.get("resumeMode"))
+            summary = {**_summary(run, skipped), **continuation}
 
             print(f"✅ Auto-scan completed: {summary}")
             return {"statusCode": 200, "body": json.dumps(summary)}
 
         except Exception as e:
-            print(f"❌ Error fetching accounts: {e}")
-            return {"statusCode": 500, "body": json.dumps({"error": "Failed to fetch connected accounts"})}
+            print(f"❌ Auto-scan failed: {e}")
+            return {"statusCode": 500, "body": json.dumps({"error": f"Auto-scan failed: {e}"})}
 
     # --- CASE 2: Manual Scan for One Account ---
     account_id = body.get("accountId")
     email = body.get("email")
-    return scan_across_regions(account_id, email, results_table)
+    # A user asking for a scan expects every candidate region; cold-region skipping is for the auto scan
+    region_options = {"regionSchedule": "all", **_region_options(body)}
+    return scan_across_regions(account_id, email, results_table, *engine_limits(body), scan_mode=body.get("scanMode"),
+                               context=context, resume_mode=body.get("resumeMode", "return"),
+                               region_options=region_options, snapshot_id=_snapshot_id(body))
 
 
 # --------------------------------------------------------------------------- #
 # Helper: Scan Account Across Selected Regions
 # --------------------------------------------------------------------------- #
-def scan_across_regions(account_id, email, results_table):
-    print(f"🌎 Scanning {account_id} across India and nearby regions: {TARGET_REGIONS}")
-
-    stored_total = 0
-
-    for region in TARGET_REGIONS:
-        try:
-            result = scan_single_account(account_id, email, region, results_table)
-            body = json.loads(result["body"])
-            stored_total += body.get("tagged_resources_stored", 0)
-        except Exception as e:
-            print(f"⚠️ Region {region} scan failed: {e}")
-
-    print(f"✅ [{account_id}] Stored {stored_total} tagged resources across {len(TARGET_REGIONS)} regions.")
+def scan_across_regions(account_id, email, results_table, max_workers=MAX_WORKERS,
+                        per_account=MAX_WORKERS_PER_ACCOUNT, scan_mode=None, context=None, resume_mode=None,
+                        region_options=None, snapshot_id=None):
+    units, skipped = plan_units([{"accountId": account_id, "email": email}], region_options or {})
+    regions = [unit["region"] for unit in units]
+    print(f"🌎 Scanning {account_id} across regions: {regions} (skipping {len(skipped)})")
+
+    cursor = {"scanMode": scan_mode, "limits": [max_workers, per_account], "snapshotId": snapshot_id}
+    run, continuation = _scan_units(units, results_table, cursor, context, resume_mode=resume_mode)
+    stored_total = sum(r["result"]["tagged_resources_stored"] for r in run["results"])
+    stages = _stage_totals(run)
+
+    print(f"✅ [{account_id}] Stored {stored_total} tagged resources across {len(regions)} regions.")
     return {
         "statusCode": 200,
         "body": json.dumps({
             "accountId": account_id,
             "tagged_resources_stored": stored_total,
-            "regions_scanned": TARGET_REGIONS,
-            "scannedAt": datetime.datetime.utcnow().isoformat() + "Z"
+            "regions_scanned": regions,
+            "skippedRegions": skipped,
+            "written": stages.get("written", 0),
+            "unchanged": stages.get("unchanged", 0),
+            "skipped": stages.get("skipped", 0),
+            "gone": stages.get("gone", 0),
+            "errors": run["errors"],
+            "durationMs": run["durationMs"],
+            "stages": stages,
+            "credentialCache": credentialCache.cache_stats(),
+            "clientPool": clientPool.pool_stats(),
+            **({"snapshot": run["snapshot"]} if run.get("snapshot") else {}),
+            "scannedAt": datetime.datetime.utcnow().isoformat() + "Z",
+            **continuation
         })
     }
 
 
 # --------------------------------------------------------------------------- #
-# Single-Region Scan Logic (Same as Before)
+# Helper: Run Units Within the Lambda Time Budget
 # --------------------------------------------------------------------------- #
-def scan_single_account(account_id, email, region, results_table):
-    print(f"🔹 Scanning region: {region} for account: {account_id}")
+def _scan_units(units, results_table, cursor, context, token=None, resume_mode=None):
+    """
+    Scan units until done or until the time budget runs low. Whatever is left,
+    meaning units not started plus units stopped mid-pagination with their
+    PaginationToken, is checkpointed and handed to continue_run.
+    """
+    budget = TimeBudget(context)
+    max_workers, per_account = cursor["limits"]
+    snapshot = None
+    if cursor.get("snapshotId") and snapshotExport.enabled():
+        snapshot = snapshotExport.SnapshotWriter(cursor["snapshotId"])
+    run = run_units(
+        units,
+        lambda unit: scan_unit(unit, results_table, cursor["scanMode"], budget.exhausted, snapshot),
+        max_workers, per_account, should_stop=budget.exhausted
+    )
+    if snapshot:
+        run["snapshot"] = _close_snapshot(snapshot)
+
+    # One version bump per changed account, and one for "*", per invocation rather than per unit
+    changed = {r["accountId"] for r in run["results"] if r["result"].get("changed")}
+    if changed:
+        scanState.bump_versions(changed)
+
+    in_flight = [{**r["unit"], "paginationToken": r["result"]["paginationToken"]}
+                 for r in run["results"] if r["result"].get("incomplete")]
+    if run["pending"] or in_flight:
+        print(f"⏳ Time budget low: checkpointing {len(run['pending']) + len(in_flight)} remaining units.")
+        cursor = {k: v for k, v in cursor.items() if k != "pending"}
+        return run, continue_run("scan", {**cursor, "units": pack_units(run["pending"], in_flight)}, context,
+                                 resume_mode)
+    if token:
+        clear_cursor(token)
+    return run, {}
+
+
+def pack_units(pending, in_flight=()):
+    """
+    Compact form of the units left in a run, small enough for one state item at
+    fleet scale: each region is stored once and each account once, with the
+    indexes of its regions still to scan. Only units stopped mid-pagination
+    keep a unit of their own, for the PaginationToken.
+    """
+    regions, accounts = [], {}
+    for unit in pending:
+        if unit["region"] not in regions:
+            regions.append(unit["region"])
+        entry = accounts.setdefault(unit["accountId"], [unit["accountId"], unit.get("email"), []])
+        entry[2].append(regions.index(unit["region"]))
+    return {
+        "regions": regions,
+        "accounts": list(accounts.values()),
+        "inFlight": [{k: unit.get(k) for k in ("accountId", "email", "region", "paginationToken")}
+                     for unit in in_flight],
+    }
 
-    dynamo = boto3.resource("dynamodb", region_name="ap-south-1")
-    accounts_table = dynamo.Table("ConnectedAccounts")
 
-    acc = accounts_table.get_item(Key={"accountId": account_id}).get("Item")
-    if not acc:
-        return {"statusCode": 404, "body": json.dumps({"error": f"Account {account_id} not found"})}
+def unpack_units(cursor):
+    """Units left in a checkpointed run: the in-flight ones first, then the unstarted ones in order."""
+    if "pending" in cursor:
+        # Cursor saved before the compact form
+        return cursor["pending"]
+    packed = cursor["units"]
+    return list(packed["inFlight"]) + [
+        {"accountId": account_id, "email": email, "region": packed["regions"][n]}
+        for account_id, email, indexes in packed["accounts"]
+        for n in indexes
+    ]
 
-    sts = boto3.client("sts")
-    creds = sts.assume_role(
-        RoleArn=acc["roleArn"],
-        RoleSessionName="scan-session",
-        ExternalId=acc["externalId"]
-    )["Credentials"]
-
-    tag_client = boto3.client(
-        "resourcegroupstaggingapi",
-        aws_access_key_id=creds["AccessKeyId"],
-        aws_secret_access_key=creds["SecretAccessKey"],
-        aws_session_token=creds["SessionToken"],
-        region_name=region
-    )
 
-    # Fetch tagged resources
-    all_tagged = []
-    token = None
-    while True:
-        params = {"TagFilters": [{"Key": "overwatch-delete-after"}], "ResourcesPerPage": 50}
-        if token:
-            params["PaginationToken"] = token
-        resp = tag_client.get_resources(**params)
-        all_tagged.extend(resp.get("ResourceTagMappingList", []))
-        token = resp.get("PaginationToken")
-        if not token:
-            break
-
-    print(f"📦 [{account_id}] Found {len(all_tagged)} tagged resources in {region}")
-
-    clients = {
-        "ec2": boto3.client("ec2", region_name=region, **_session(creds)),
-        "s3": boto3.client("s3", region_name=region, **_session(creds)),
-        "rds": boto3.client("rds", region_name=region, **_session(creds)),
-        "dynamodb": boto3.client("dynamodb", region_name=region, **_session(creds)),
-        "lambda": boto3.client("lambda", region_name=region, **_session(creds)),
-        "cloudformation": boto3.client("cloudformation", region_name=region, **_session(creds)),
-        "ecr": boto3.client("ecr", region_name=region, **_session(creds))
+def _summary(run, skipped_regions=()):
+    succeeded_accounts = {r["accountId"] for r in run["results"]}
+    stages = _stage_totals(run)
+    return {
+        "regionsSkipped": len(skipped_regions),
+        "skippedRegions": list(skipped_regions),
+        "accounts_scanned": len(succeeded_accounts),
+        "total_resources": sum(r["result"]["tagged_resources_stored"] for r in run["results"]),
+        "failed": sorted({e["accountId"] for e in run["errors"]} - succeeded_accounts),
+        "written": stages.get("written", 0),
+        "unchanged": stages.get("unchanged", 0),
+        "skipped": stages.get("skipped", 0),
+        "gone": stages.get("gone", 0),
+        "units": run["units"],
+        "errors": run["errors"],
+        "durationMs": run["durationMs"],
+        "maxWorkers": run["maxWorkers"],
+        "maxWorkersPerAccount": run["maxWorkersPerAccount"],
+        "stages": stages,
+        "credentialCache": credentialCache.cache_stats(),
+        "clientPool": clientPool.pool_stats(),
+        **({"snapshot": run["snapshot"]} if run.get("snapshot") else {}),
     }
 
-    now = datetime.datetime.utcnow().isoformat() + "Z"
-    stored_count = 0
 
-    for res in all_tagged:
-        arn = res["ResourceARN"]
-        tags = {t["Key"]: t["Value"] for t in res.get("Tags", [])}
-        delete_after = tags.get("overwatch-delete-after")
-        service = arn.split(":")[2] if len(arn.split(":")) > 2 else "unknown"
-        resource_id = arn.split("/")[-1] if "/" in arn else arn.split(":")[-1]
+# --------------------------------------------------------------------------- #
+# Helper: Columnar Snapshot of the Run
+# --------------------------------------------------------------------------- #
+def _snapshot_id(body):
+    """The run's snapshot id: handed down by the orchestrator, or new when snapshots are enabled."""
+    if body.get("snapshotId"):
+        return body["snapshotId"]
+    return snapshotExport.new_snapshot_id() if snapshotExport.enabled() else None
 
-        if not delete_after:
-            continue
 
-        active = is_resource_active(service, resource_id, clients)
-        if not active:
-            continue
+def _close_snapshot(snapshot):
+    # The snapshot is a by-product of the scan; failing to write it never fails the scan
+    try:
+        part = snapshot.close()
+    except Exception as e:
+        print(f"⚠️ Snapshot export failed for {snapshot.snapshot_id}: {e}")
+        return {"snapshotId": snapshot.snapshot_id, "rows": 0, "parts": [], "errors": [str(e)]}
+    return {"snapshotId": snapshot.snapshot_id, "rows": part["rows"], "bytes": part["bytes"],
+            "parts": [part["path"]] if part["path"] else []}
+
 
+# --------------------------------------------------------------------------- #
+# Helper: Choose Regions per Account
+# --------------------------------------------------------------------------- #
+def plan_units(accounts, options, max_workers=MAX_WORKERS):
+    """
+    Build scan units from each account's region plan: an explicit "regions"
+    list in the request wins, otherwise regionPlanner decides (configured or
+    enabled regions, hot every run, cold on a slower probe cadence).
+    Returns (units, skipped) where skipped is [{"accountId", "region", "reason"}].
+    Each unit carries its region's watermark, read here in one BatchGetItem per account.
+    """
+    def plan(acc):
+        account_plan = region_plan(acc)
+        missing = [region for region in account_plan["regions"] if region not in account_plan.get("watermarks", {})]
+        if missing:
+            try:
+                account_plan.setdefault("watermarks", {}).update(scanState.load_watermarks(acc["accountId"], missing))
+            except Exception as e:
+                # Each unit then reads its own watermark
+                print(f"⚠️ Could not batch-load watermarks for {acc['accountId']}: {e}")
+        return account_plan
+
+    def region_plan(acc):
+        if options.get("regions"):
+            return {"regions": list(options["regions"]), "skipped": []}
         try:
-            results_table.put_item(Item={
+            # Already needed for the scan itself, so this only warms the cache
+            account = credentialCache.get_account(core.accounts_table(), acc["accountId"]) or acc
+            creds = None
+            if (options.get("regionDiscovery") or regionPlanner.DISCOVERY_MODE) == "enabled" and account.get("roleArn"):
+                creds = credentialCache.get_credentials(account, session_name="scan-session")
+            return regionPlanner.plan_regions(account, creds, options.get("regionSchedule"),
+                                              options.get("regionDiscovery"))
+        except Exception as e:
+            print(f"⚠️ Region planning failed for {acc['accountId']}, scanning defaults: {e}")
+            return {"regions": list(TARGET_REGIONS), "skipped": []}
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(accounts) or 1))) as pool:
+        plans = list(pool.map(plan, accounts))
+
+    units, skipped = [], []
+    for acc, account_plan in zip(accounts, plans):
+        watermarks = account_plan.get("watermarks", {})
+        units.extend({**unit, "watermark": watermarks[unit["region"]]} if unit["region"] in watermarks else unit
+                     for unit in build_units([acc], account_plan["regions"]))
+        skipped.extend({"accountId": acc["accountId"], **entry} for entry in account_plan["skipped"])
+    return units, skipped
+
+
+def _region_options(body):
+    return {k: body[k] for k in REGION_OPTIONS if body.get(k)}
+
+
+def scan_unit(unit, results_table, scan_mode=None, should_stop=None, snapshot=None):
+    """Scan-engine worker: scan one (account, region) unit and return its result body."""
+    try:
+        result = scan_single_account(unit["accountId"], unit["email"], unit["region"], results_table, scan_mode,
+                                     pagination_token=unit.get("paginationToken"), should_stop=should_stop,
+                                     snapshot=snapshot, watermark=unit.get("watermark"))
+    except Exception as e:
+        credentialCache.invalidate_on_auth_error(unit["accountId"], e)
+        raise
+    body = json.loads(result["body"])
+    if result["statusCode"] != 200:
+        raise RuntimeError(body.get("error", f"HTTP {result['statusCode']}"))
+    return body
+
+
+# --------------------------------------------------------------------------- #
+# Single-Region Scan Logic (Same as Before)
+# --------------------------------------------------------------------------- #
+def scan_single_account(account_id, email, region, results_table, scan_mode=None, pagination_token=None,
+                        should_stop=None, snapshot=None, watermark=None):
+    print(f"🔹 Scanning region: {region} for account: {account_id}")
+
+    acc = credentialCache.get_account(core.accounts_table(), account_id)
+    if not acc:
+        return {"statusCode": 404, "body": json.dumps({"error": f"Account {account_id} not found"})}
+
+    creds = credentialCache.get_credentials(acc, session_name="scan-session")
+
+    tag_client = clientPool.get_client(account_id, region, "resourcegroupstaggingapi", creds)
+
+    # Service clients are only built when a resource of that service needs checking
+    clients = clientPool.LazyClients(account_id, region, creds)
+    liveness_memo = {}
+
+    # Units planned in this invocation carry their watermark; resumed ones read it here
+    watermark = watermark or scanState.load_watermark(account_id, region)
+    mode = scanState.resolve_mode(scan_mode, watermark)
+    seen_ids = set()
+
+    now = datetime.datetime.utcnow().isoformat() + "Z"
+
+    def check(page):
+        candidates = []
+        for res in page:
+            arn = res["ResourceARN"]
+            tags = {t["Key"]: t["Value"] for t in res.get("Tags", [])}
+            service = arn.split(":")[2] if len(arn.split(":")) > 2 else "unknown"
+            resource_id = arn.split("/")[-1] if "/" in arn else arn.split(":")[-1]
+
+            if not tags.get("overwatch-delete-after"):
+                continue
+            candidates.append({"arn": arn, "service": service, "resourceId": resource_id, "tags": tags})
+
+        # Incremental: resources already stored active with the same tags skip liveness and writes
+        carried = []
+        if mode == "incremental" and candidates:
+            with awsMetrics.phase("persist"):
+                stored = fetch_stored(results_table, [{"accountId": account_id, "resourceId": res["resourceId"]}
+                                                      for res in candidates])
+            for res in candidates:
+                res["stored"] = stored.get((account_id, res["resourceId"]))
+                res["carried"] = unchanged_active(res["stored"], res["tags"], res["tags"]["overwatch-delete-after"])
+            carried = [res for res in candidates if res["carried"]]
+            candidates = [res for res in candidates if not res["carried"]]
+
+        # One batched describe per service per page instead of one call per resource
+        with awsMetrics.phase("liveness"):
+            unchecked = set()
+            active = check_liveness(candidates, clients, liveness_memo, unchecked)
+        checked = carried + [res for res in candidates if active[res["arn"]]]
+        seen_ids.update(res["resourceId"] for res in checked)
+        # A failed check says nothing about existence: keep those records out of the tombstone pass
+        seen_ids.update(unchecked)
+        return checked
+
+    def write(checked):
+        to_write = [res for res in checked if not res.get("carried")]
+        stored = None
+        if mode == "incremental":
+            stored = {(account_id, res["resourceId"]): res["stored"] for res in to_write if res["stored"]}
+
+        # Batched, and only for records whose tags / deleteAfter / state changed
+        with awsMetrics.phase("persist"):
+            counts = write_delta(results_table, [{
                 "accountId": account_id,
                 "email": email,
                 "region": region,
-                "resourceId": resource_id,
-                "resourceType": service,
-                "arn": arn,
-                "tags": tags,
-                "deleteAfter": delete_after,
+                "resourceId": res["resourceId"],
+                "resourceType": res["service"],
+                "arn": res["arn"],
+                "tags": res["tags"],
+                "deleteAfter": res["tags"]["overwatch-delete-after"],
                 "state": "active",
                 "scannedAt": now
-            })
-            stored_count += 1
-        except Exception as e:
-            print(f"Failed to store {arn}: {e}")
-
-    print(f"✅ {region}: stored {stored_count} active tagged resources.")
+            } for res in to_write], stored=stored)
+        counts["unchanged"] += len(checked) - len(to_write)
+
+        # Every active resource seen (written or carried) goes into the run's snapshot
+        if snapshot is not None:
+            snapshot.add(account_id, region, checked, now)
+        return counts
+
+    pages = {"token": pagination_token}
+    stages = run_pipeline(iter_tagged_pages(tag_client, cursor=pages, should_stop=should_stop), check, write)
+
+    # Only a scan that saw every page (in this invocation) can say what has vanished
+    gone = 0
+    if pages["complete"] and not pagination_token:
+        # Anything still marked active here that we did not see this run has vanished
+        with awsMetrics.phase("persist"):
+            gone = tombstone_missing(results_table, account_id, region, seen_ids, now)
+    stages["gone"] = gone
+
+    stored_count = stages.get("written", 0) + stages.get("unchanged", 0)
+    if pages["complete"]:
+        # The tagged count drives the adaptive region schedule (hot vs. cold); a resumed
+        # scan only saw its tail pages, so an empty tail says nothing about the region
+        tagged = stored_count if stored_count or not pagination_token else None
+        with awsMetrics.phase("persist"):
+            watermark = scanState.save_watermark(account_id, region, watermark, mode, now, tagged=tagged)
+
+    print(f"✅ {region} [{mode}]: {stored_count} active tagged resources "
+          f"({stages.get('written', 0)} written, {stages.get('unchanged', 0)} unchanged, "
+          f"{stages['skipped']} skipped, {gone} gone).")
     return {
         "statusCode": 200,
         "body": json.dumps({
             "accountId": account_id,
             "region": region,
             "tagged_resources_stored": stored_count,
+            "written": stages.get("written", 0),
+            "unchanged": stages.get("unchanged", 0),
+            "skipped": stages["skipped"],
+            "gone": gone,
+            # Cached getResources responses for this account are now stale (bumped once per run)
+            "changed": bool(stages.get("written") or gone),
+            "scanMode": mode,
+            "generation": watermark["generation"],
+            # Stopped early, possibly before the first page (token still None): resume this unit
+            "incomplete": not pages["complete"],
+            "paginationToken": None if pages["complete"] else pages["token"],
+            "stages": stages,
             "scannedAt": now
         })
     }
@@ -185,43 +464,13 @@ def scan_single_account(account_id, email, region, results_table):
 # --------------------------------------------------------------------------- #
 # Helpers
 # --------------------------------------------------------------------------- #
-def _session(creds):
-    return {
-        "aws_access_key_id": creds["AccessKeyId"],
-        "aws_secret_access_key": creds["SecretAccessKey"],
-        "aws_session_token": creds["SessionToken"]
-    }
+def _stage_totals(run):
+    totals = {}
+    for r in run["results"]:
+        merge_stats(totals, r["result"].get("stages", {}))
+    return totals
 
 
 def is_resource_active(service, resource_id, clients):
     """Check if resource is in active/available/running state."""
-    try:
-        if service == "ec2":
-            resp = clients["ec2"].describe_instances(InstanceIds=[resource_id])
-            state = resp["Reservations"][0]["Instances"][0]["State"]["Name"]
-            return state in ["running", "pending"]
-        elif service == "s3":
-            clients["s3"].head_bucket(Bucket=resource_id)
-            return True
-        elif service == "rds":
-            dbs = clients["rds"].describe_db_instances(DBInstanceIdentifier=resource_id)
-            status = dbs["DBInstances"][0]["DBInstanceStatus"]
-            return status not in ["deleting", "deleted"]
-        elif service == "dynamodb":
-            table = clients["dynamodb"].describe_table(TableName=resource_id)
-            status = table["Table"]["TableStatus"]
-            return status == "ACTIVE"
-        elif service == "lambda":
-            clients["lambda"].get_function(FunctionName=resource_id)
-            return True
-        elif service == "cloudformation":
-            stacks = clients["cloudformation"].describe_stacks(StackName=resource_id)
-            status = stacks["Stacks"][0]["StackStatus"]
-            return not status.startswith("DELETE_")
-        elif service == "ecr":
-            repos = clients["ecr"].describe_repositories(repositoryNames=[resource_id])
-            return len(repos["repositories"]) > 0
-        else:
-            return True
-    except Exception:
-        return False
+    return check_liveness([{"arn": resource_id, "service": service, "resourceId": resource_id}], clients)[resource_id]
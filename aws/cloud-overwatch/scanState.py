@@ -0,0 +1,109 @@
+import os
+import datetime
+import overwatchCore as core
+from scanWriter import MAX_RETRIES, backoff
+
+# Small key/value table for scan bookkeeping (partition key: stateKey)
+STATE_TABLE = os.getenv("STATE_TABLE", "OverwatchState")
+# Incremental scans fall back to a full rescan when the last one is older than this
+FULL_RESCAN_INTERVAL_HOURS = int(os.getenv("FULL_RESCAN_INTERVAL_HOURS", "168"))
+DEFAULT_SCAN_MODE = os.getenv("SCAN_MODE", "incremental")
+
+
+def state_table():
+    return core.table(STATE_TABLE)
+
+
+# --------------------------------------------------------------------------- #
+# Per-(account, region) Scan Watermark
+# --------------------------------------------------------------------------- #
+def _watermark_key(account_id, region):
+    return f"scan#{account_id}#{region}"
+
+
+def load_watermark(account_id, region):
+    item = state_table().get_item(Key={"stateKey": _watermark_key(account_id, region)}).get("Item")
+    return item or {"generation": 0}
+
+
+def load_watermarks(account_id, regions):
+    """
+    Watermarks for several regions of one account in a single BatchGetItem: {region: watermark}.
+    Regions whose keys are still unprocessed after the retries are left out.
+    """
+    keys = [{"stateKey": _watermark_key(account_id, region)} for region in regions]
+    found = {}
+    request = {STATE_TABLE: {"Keys": keys}} if keys else {}
+    for attempt in range(MAX_RETRIES):
+        if not request:
+            break
+        if attempt:
+            backoff(attempt - 1)
+        resp = core.dynamo().batch_get_item(RequestItems=request)
+        for item in resp.get("Responses", {}).get(STATE_TABLE, []):
+            found[item["region"]] = item
+        request = resp.get("UnprocessedKeys") or {}
+    unprocessed = {key["stateKey"] for key in request.get(STATE_TABLE, {}).get("Keys", [])}
+    return {region: found.get(region, {"generation": 0}) for region in regions
+            if _watermark_key(account_id, region) not in unprocessed}
+
+
+def save_watermark(account_id, region, watermark, mode, scanned_at, tagged=None):
+    """Record a completed scan; `tagged` (active tagged resources found) feeds region activity tracking."""
+    item = {
+        "stateKey": _watermark_key(account_id, region),
+        "accountId": account_id,
+        "region": region,
+        "generation": int(watermark.get("generation", 0)) + 1,
+        "lastScanAt": scanned_at,
+        "lastMode": mode,
+        "lastFullScanAt": scanned_at if mode == "full" else watermark.get("lastFullScanAt"),
+        "lastTaggedCount": tagged,
+        "lastActiveAt": scanned_at if tagged else watermark.get("lastActiveAt"),
+    }
+    state_table().put_item(Item={k: v for k, v in item.items() if v is not None})
+    return item
+
+
+def resolve_mode(requested, watermark):
+    """'full' when asked for, when there is no earlier full scan, or when the last one is stale."""
+    mode = (requested or DEFAULT_SCAN_MODE).lower()
+    if mode != "incremental":
+        return "full"
+    last_full = watermark.get("lastFullScanAt")
+    if not last_full:
+        return "full"
+    age = datetime.datetime.utcnow() - datetime.datetime.fromisoformat(last_full.rstrip("Z"))
+    return "full" if age > datetime.timedelta(hours=FULL_RESCAN_INTERVAL_HOURS) else "incremental"
+
+
+# --------------------------------------------------------------------------- #
+# Per-account Result Versions (invalidate cached getResources responses)
+# --------------------------------------------------------------------------- #
+# Bumped for every account whose records a scan or delete run changed; "*" moves with any of them
+ALL_ACCOUNTS = "*"
+
+
+def _version_key(scope):
+    return f"version#{scope}"
+
+
+def bump_versions(account_ids):
+    """Increment the result version of each account (and of the all-accounts scope) once."""
+    account_ids = sorted(set(account_ids))
+    for scope in account_ids + ([ALL_ACCOUNTS] if account_ids else []):
+        try:
+            state_table().update_item(
+                Key={"stateKey": _version_key(scope)},
+                UpdateExpression="ADD version :one",
+                ExpressionAttributeValues={":one": 1}
+            )
+        except Exception as e:
+            # A missed bump only means a cached response lives until the next one
+            print(f"Failed to bump result version for {scope}: {e}")
+
+
+def load_version(scope):
+    """Current result version of an account (or ALL_ACCOUNTS); 0 before its first bump."""
+    item = state_table().get_item(Key={"stateKey": _version_key(scope)}, ConsistentRead=True).get("Item")
+    return int(item["version"]) if item else 0
@@ -0,0 +1,160 @@
+import time
+import json
+import random
+import hashlib
+from boto3.dynamodb.conditions import Attr, Key
+from boto3.dynamodb.types import TypeSerializer, TypeDeserializer
+import recordCodec
+
+# DynamoDB batch limits
+BATCH_GET_LIMIT = 100
+BATCH_WRITE_LIMIT = 25
+MAX_RETRIES = 6
+
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+
+
+# --------------------------------------------------------------------------- #
+# Helper: Stable Tag Fingerprint
+# --------------------------------------------------------------------------- #
+def tags_hash(tags):
+    return hashlib.sha256(json.dumps(tags, sort_keys=True).encode()).hexdigest()[:16]
+
+
+# --------------------------------------------------------------------------- #
+# Delta Write of Scan Records
+# --------------------------------------------------------------------------- #
+def write_delta(table, items, stored=None):
+    """
+    Persist scan records, skipping those whose stored tagsHash, deleteAfter and
+    state already match. `stored` may carry records already read by the caller.
+    Returns {"written", "unchanged", "failed"} counts.
+    """
+    if not items:
+        return {"written": 0, "unchanged": 0, "failed": 0}
+
+    for item in items:
+        item["tagsHash"] = tags_hash(item.get("tags", {}))
+
+    if stored is None:
+        stored = fetch_stored(table, [_key(item) for item in items])
+    changed = [item for item in items if _changed(stored.get(key_tuple(item)), item)]
+    failed = batch_put(table, [recordCodec.encode(item) for item in changed])
+    return {"written": len(changed) - failed, "unchanged": len(items) - len(changed), "failed": failed}
+
+
+# --------------------------------------------------------------------------- #
+# Tombstoning of Vanished Resources
+# --------------------------------------------------------------------------- #
+def tombstone_missing(table, account_id, region, seen_ids, now):
+    """
+    Mark every stored `active` record for (account, region) that was not seen in
+    this scan as `gone`, in one batched pass. Returns the number tombstoned.
+    """
+    missing = []
+    params = {
+        "KeyConditionExpression": Key("accountId").eq(account_id),
+        # Either record format: full (region) or compact (interned region code)
+        "FilterExpression": (Attr("region").eq(region) | Attr(recordCodec.REGION).eq(
+            recordCodec.REGION_CODES.get(region, region))) & Attr("state").eq("active"),
+    }
+    while True:
+        resp = table.query(**params)
+        missing.extend(
+            recordCodec.encode({**recordCodec.decode(item), "state": "gone", "goneAt": now})
+            for item in resp.get("Items", [])
+            if item["resourceId"] not in seen_ids
+        )
+        if not resp.get("LastEvaluatedKey"):
+            break
+        params["ExclusiveStartKey"] = resp["LastEvaluatedKey"]
+
+    failed = batch_put(table, missing)
+    return len(missing) - failed
+
+
+def unchanged_active(old, tags, delete_after):
+    """True when the stored record is active and its tags / deleteAfter are what we just saw."""
+    return bool(old) and not _changed(old, {"tagsHash": tags_hash(tags), "deleteAfter": delete_after, "state": "active"})
+
+
+def _changed(old, new):
+    if not old:
+        return True
+    return any(old.get(field) != new.get(field) for field in ("tagsHash", "deleteAfter", "state"))
+
+
+def key_tuple(item):
+    return item["accountId"], item["resourceId"]
+
+
+def _key(item):
+    return {"accountId": item["accountId"], "resourceId": item["resourceId"]}
+
+
+# --------------------------------------------------------------------------- #
+# Batched Reads / Writes with Retry of Unprocessed Items
+# --------------------------------------------------------------------------- #
+def fetch_stored(table, keys):
+    """BatchGetItem the comparison fields for `keys`; returns {(accountId, resourceId): item}."""
+    client = table.meta.client
+    stored = {}
+    unique = list({(k["accountId"], k["resourceId"]): k for k in keys}.values())
+
+    for i in range(0, len(unique), BATCH_GET_LIMIT):
+        request = {table.name: {
+            "Keys": [_serialize(k) for k in unique[i:i + BATCH_GET_LIMIT]],
+            "ProjectionExpression": "accountId, resourceId, tagsHash, th, deleteAfter, #s",
+            "ExpressionAttributeNames": {"#s": "state"},
+        }}
+        for attempt in range(MAX_RETRIES):
+            resp = client.batch_get_item(RequestItems=request)
+            for raw in resp.get("Responses", {}).get(table.name, []):
+                item = recordCodec.decode(_deserialize(raw))
+                stored[key_tuple(item)] = item
+            request = resp.get("UnprocessedKeys") or {}
+            if not request:
+                break
+            backoff(attempt)
+    return stored
+
+
+def batch_put(table, items):
+    """BatchWriteItem in chunks of 25, retrying unprocessed items with backoff. Returns the failure count."""
+    return len(batch_put_unwritten(table, items))
+
+
+def batch_put_unwritten(table, items):
+    """Like batch_put, but returns the items still unwritten after the retries."""
+    client = table.meta.client
+    unwritten = []
+
+    for i in range(0, len(items), BATCH_WRITE_LIMIT):
+        request = {table.name: [{"PutRequest": {"Item": _serialize(item)}} for item in items[i:i + BATCH_WRITE_LIMIT]]}
+        for attempt in range(MAX_RETRIES):
+            try:
+                resp = client.batch_write_item(RequestItems=request)
+            except Exception as e:
+                print(f"Batch write failed: {e}")
+                resp = {"UnprocessedItems": request}
+            request = resp.get("UnprocessedItems") or {}
+            if not request:
+                break
+            backoff(attempt)
+        if request:
+            unwritten.extend(_deserialize(put["PutRequest"]["Item"]) for put in request.get(table.name, []))
+    return unwritten
+
+
+def _serialize(item):
+    return {k: _serializer.serialize(v) for k, v in item.items() if v is not None}
+
+
+def _deserialize(raw):
+    return {k: _deserializer.deserialize(v) for k, v in raw.items()}
+
+
+def backoff(attempt):
+    """Jittered exponential sleep between retries of unprocessed batch keys / items."""
+    time.sleep(min(2.0, 0.05 * (2 ** attempt)) * random.uniform(0.5, 1.0))
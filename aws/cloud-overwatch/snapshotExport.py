@@ -0,0 +1,215 @@
+import io
+import os
+import json
+import gzip
+import uuid
+import datetime
+import threading
+import clientPool
+import overwatchCore as core
+from recordCodec import to_epoch
+
+# Where snapshots go: s3://bucket/prefix or a local directory. Unset disables the export.
+SNAPSHOT_LOCATION = os.getenv("SNAPSHOT_LOCATION", "")
+# "auto" picks Parquet when pyarrow is installed, gzip JSONL otherwise
+SNAPSHOT_FORMAT = os.getenv("SNAPSHOT_FORMAT", "auto")
+ROW_GROUP_SIZE = int(os.getenv("SNAPSHOT_ROW_GROUP_SIZE", "10000"))
+
+# One column per field; scannedAt is epoch seconds
+COLUMNS = ("accountId", "resourceId", "service", "region", "deleteAfter", "state", "scannedAt")
+EXTENSIONS = {"parquet": ".parquet", "jsonl": ".jsonl.gz"}
+
+
+def enabled():
+    return bool(SNAPSHOT_LOCATION)
+
+
+def new_snapshot_id(now=None):
+    now = now or datetime.datetime.utcnow()
+    return f"{now:%Y-%m-%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+
+
+def resolve_format(snapshot_format=None):
+    snapshot_format = snapshot_format or SNAPSHOT_FORMAT
+    if snapshot_format == "auto":
+        return "parquet" if _pyarrow() else "jsonl"
+    if snapshot_format == "parquet" and not _pyarrow():
+        raise ValueError("Parquet snapshots need pyarrow")
+    return snapshot_format
+
+
+def _pyarrow():
+    """(pyarrow, pyarrow.parquet), or None when not installed. Imported on first use, not at cold start."""
+    try:
+        import pyarrow
+        import pyarrow.parquet as parquet
+    except ImportError:  # Parquet is optional; gzip JSONL always works
+        return None
+    return pyarrow, parquet
+
+
+# --------------------------------------------------------------------------- #
+# Writer: One Part File per Invocation
+# --------------------------------------------------------------------------- #
+class SnapshotWriter:
+    """
+    Buffers scan rows column by column and writes them as one part file of
+    snapshot `snapshot_id`. Fan-out workers and resumed hops of the same run
+    each add their own part, so a snapshot is the set of files under its id.
+
+    add() is thread-safe, so scan-engine workers can call it directly.
+    """
+
+    def __init__(self, snapshot_id, location=None, snapshot_format=None):
+        self.snapshot_id = snapshot_id
+        self.location = location or SNAPSHOT_LOCATION
+        self.format = resolve_format(snapshot_format)
+        self.columns = {name: [] for name in COLUMNS}
+        self._lock = threading.Lock()
+
+    def add(self, account_id, region, resources, scanned_at):
+        """Add scanned resources ({"resourceId", "service", "tags"}) for one (account, region)."""
+        scanned_at = to_epoch(scanned_at)
+        with self._lock:
+            for res in resources:
+                self.columns["accountId"].append(account_id)
+                self.columns["resourceId"].append(res["resourceId"])
+                self.columns["service"].append(res["service"])
+                self.columns["region"].append(region)
+                self.columns["deleteAfter"].append(res["tags"].get("overwatch-delete-after"))
+                self.columns["state"].append("active")
+                self.columns["scannedAt"].append(scanned_at)
+
+    def close(self):
+        """Write the part (if any rows) and return {"snapshotId", "path", "rows", "bytes", "format"}."""
+        with self._lock:
+            rows = len(self.columns["accountId"])
+            columns, self.columns = self.columns, {name: [] for name in COLUMNS}
+        if not rows:
+            return {"snapshotId": self.snapshot_id, "path": None, "rows": 0, "bytes": 0, "format": self.format}
+
+        data = _encode_parquet(columns) if self.format == "parquet" else _encode_jsonl(columns)
+        path = _join(self.location, self.snapshot_id, f"part-{uuid.uuid4().hex[:12]}{EXTENSIONS[self.format]}")
+        _put(path, data)
+        print(f"📦 Snapshot part written: {path} ({rows} rows, {len(data)} bytes)")
+        return {"snapshotId": self.snapshot_id, "path": path, "rows": rows, "bytes": len(data), "format": self.format}
+
+
+def _encode_jsonl(columns):
+    # Still columnar: each line is one row group, {"rows": n, "columns": {name: [values]}}
+    buffer = io.BytesIO()
+    rows = len(columns["accountId"])
+    with gzip.GzipFile(fileobj=buffer, mode="wb") as out:
+        for start in range(0, rows, ROW_GROUP_SIZE):
+            group = {name: values[start:start + ROW_GROUP_SIZE] for name, values in columns.items()}
+            out.write(json.dumps({"rows": len(group["accountId"]), "columns": group},
+                                 separators=(",", ":")).encode() + b"\n")
+    return buffer.getvalue()
+
+
+def _encode_parquet(columns):
+    pyarrow, parquet = _pyarrow()
+    buffer = io.BytesIO()
+    parquet.write_table(pyarrow.table(columns), buffer, row_group_size=ROW_GROUP_SIZE, compression="zstd")
+    return buffer.getvalue()
+
+
+# --------------------------------------------------------------------------- #
+# Reader: Stream Row Groups as Columns
+# --------------------------------------------------------------------------- #
+def list_parts(snapshot_id, location=None):
+    location = location or SNAPSHOT_LOCATION
+    prefix = _join(location, snapshot_id, "")
+    if _is_s3(prefix):
+        bucket, key = _split_s3(prefix)
+        pages = clientPool.get_client(None, core.DB_REGION, "s3").get_paginator("list_objects_v2").paginate(
+            Bucket=bucket, Prefix=key)
+        return sorted(f"s3://{bucket}/{obj['Key']}" for page in pages for obj in page.get("Contents", [])
+                      if obj["Key"].endswith(tuple(EXTENSIONS.values())))
+    if not os.path.isdir(prefix):
+        return []
+    return sorted(os.path.join(prefix, name) for name in os.listdir(prefix) if name.endswith(tuple(EXTENSIONS.values())))
+
+
+def list_snapshots(location=None):
+    """Snapshot ids under `location`, oldest first (ids sort by creation time)."""
+    location = location or SNAPSHOT_LOCATION
+    if _is_s3(location):
+        bucket, key = _split_s3(_join(location, ""))
+        pages = clientPool.get_client(None, core.DB_REGION, "s3").get_paginator("list_objects_v2").paginate(
+            Bucket=bucket, Prefix=key, Delimiter="/")
+        return sorted(p["Prefix"][len(key):].rstrip("/") for page in pages for p in page.get("CommonPrefixes", []))
+    if not os.path.isdir(location):
+        return []
+    return sorted(name for name in os.listdir(location) if os.path.isdir(os.path.join(location, name)))
+
+
+def iter_row_groups(snapshot_id, columns=None, location=None):
+    """
+    Yield {name: list} column batches across all parts of a snapshot, one row
+    group at a time. Local Parquet parts are memory-mapped; everything else streams.
+    """
+    wanted = list(columns or COLUMNS)
+    for path in list_parts(snapshot_id, location):
+        if path.endswith(EXTENSIONS["parquet"]):
+            arrow = _pyarrow()
+            if not arrow:
+                raise ValueError(f"{path} is Parquet; reading it needs pyarrow")
+            pyarrow, parquet = arrow
+            source = io.BytesIO(_get(path)) if _is_s3(path) else pyarrow.memory_map(path, "r")
+            part = parquet.ParquetFile(source)
+            for n in range(part.num_row_groups):
+                yield part.read_row_group(n, columns=wanted).to_pydict()
+        else:
+            with _open(path) as stream, gzip.GzipFile(fileobj=stream, mode="rb") as lines:
+                for line in lines:
+                    group = json.loads(line)["columns"]
+                    yield {name: group[name] for name in wanted}
+
+
+def iter_rows(snapshot_id, columns=None, location=None):
+    """Row-at-a-time view over iter_row_groups, for callers that want dicts."""
+    for group in iter_row_groups(snapshot_id, columns, location):
+        names = list(group)
+        for values in zip(*(group[name] for name in names)):
+            yield dict(zip(names, values))
+
+
+# --------------------------------------------------------------------------- #
+# Storage Helpers (S3 or local filesystem)
+# --------------------------------------------------------------------------- #
+def _is_s3(path):
+    return path.startswith("s3://")
+
+
+def _split_s3(path):
+    bucket, _, key = path[len("s3://"):].partition("/")
+    return bucket, key
+
+
+def _join(location, *parts):
+    return "/".join([location.rstrip("/")] + list(parts)) if _is_s3(location) else os.path.join(location, *parts)
+
+
+def _put(path, data):
+    if _is_s3(path):
+        bucket, key = _split_s3(path)
+        clientPool.get_client(None, core.DB_REGION, "s3").put_object(Bucket=bucket, Key=key, Body=data)
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as out:
+        out.write(data)
+
+
+def _get(path):
+    bucket, key = _split_s3(path)
+    return clientPool.get_client(None, core.DB_REGION, "s3").get_object(Bucket=bucket, Key=key)["Body"].read()
+
+
+def _open(path):
+    if _is_s3(path):
+        bucket, key = _split_s3(path)
+        # StreamingBody is read incrementally by GzipFile
+        return clientPool.get_client(None, core.DB_REGION, "s3").get_object(Bucket=bucket, Key=key)["Body"]
+    return open(path, "rb")
+
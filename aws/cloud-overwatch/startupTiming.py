@@ -0,0 +1,160 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import datetime
+import importlib
+import statistics
+import subprocess
+from urllib.parse import parse_qs
+
+# Marks the child's result line among the handlers' own output
+RESULT_PREFIX = "TIMING "
+
+# Representative events per handler (direct-invoke shape)
+HANDLER_EVENTS = {
+    "getResourcesLambda": {"queryStringParameters": {"accountId": "100000000000", "limit": "50"}},
+    "scanResourcesLambda": {"accountId": "100000000000", "email": "owner@example.com"},
+    "deleteNotifyLambda": {"accountId": "100000000000"},
+    "connectAccountLambda": {"roleArn": "arn:aws:iam::100000000000:role/stub", "externalId": "stub",
+                             "email": "owner@example.com"},
+}
+
+
+# --------------------------------------------------------------------------- #
+# Stubbed Network: Real Clients, Canned Responses
+# --------------------------------------------------------------------------- #
+class StubNetwork:
+    """
+    A botocore `before-call` handler (the hook botocore's Stubber uses) that
+    answers every request with a canned response after `latency` seconds.
+    Sessions, clients, resources and Tables are all built by boto3 as usual,
+    and requests are serialized as usual; only the HTTP round trip is skipped.
+    Responses are in wire shape (DynamoDB values typed), so boto3's own
+    response handling still runs.
+    """
+
+    def __init__(self, latency=0.0, fleet=3):
+        self.latency = latency
+        self.fleet = fleet
+        self.calls = 0
+
+    def install(self):
+        # Registered for every botocore session created from now on, whichever module creates it
+        from botocore import handlers
+        handlers.BUILTIN_HANDLERS.append(("before-call", self))
+        # Nothing below may reach the network: no IMDS lookups, no real credentials
+        for name, value in (("AWS_ACCESS_KEY_ID", "stub"), ("AWS_SECRET_ACCESS_KEY", "stub"),
+                            ("AWS_DEFAULT_REGION", "ap-south-1"), ("AWS_EC2_METADATA_DISABLED", "true")):
+            os.environ.setdefault(name, value)
+
+    def __call__(self, model, params, **kwargs):
+        from botocore.awsrequest import AWSResponse
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency * random.uniform(0.8, 1.2))
+        http = AWSResponse(params.get("url"), 200, {}, None)
+        return http, {"ResponseMetadata": {"HTTPStatusCode": 200}, **self._respond(model.name, params)}
+
+    def _respond(self, operation, params):
+        body = params.get("body") or b""
+        if operation == "AssumeRole":
+            expires = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(hours=1)
+            return {"Credentials": {"AccessKeyId": "stub", "SecretAccessKey": "stub", "SessionToken": "stub",
+                                    "Expiration": expires}}
+        if operation == "GetCallerIdentity":
+            return {"Account": "100000000000"}
+        if operation == "GetItem":
+            key = json.loads(body)["Key"]
+            if "accountId" in key:
+                account_id = key["accountId"]["S"]
+                return {"Item": {"accountId": {"S": account_id}, "email": {"S": "owner@example.com"},
+                                 "roleArn": {"S": f"arn:aws:iam::{account_id}:role/stub"},
+                                 "externalId": {"S": "stub"}}}
+            return {}
+        if operation == "GetResources":
+            return {"ResourceTagMappingList": [
+                {"ResourceARN": f"arn:aws:ec2:stub:100000000000:instance/i-{n:08x}",
+                 "Tags": [{"Key": "overwatch-delete-after", "Value": "2099-01-01"}]}
+                for n in range(self.fleet)
+            ]}
+        if operation == "DescribeInstances":
+            # Query-protocol bodies are still a dict of form fields at this point
+            form = body if isinstance(body, dict) else {k: v[0] for k, v in parse_qs(body.decode()).items()}
+            ids = [value for name, value in form.items() if name.startswith("Filter.") and ".Value." in name]
+            return {"Reservations": [{"Instances": [{"InstanceId": i, "State": {"Name": "running"}}
+                                                    for i in ids]}]}
+        return {}
+
+
+# --------------------------------------------------------------------------- #
+# Child: One Fresh Interpreter per Handler
+# --------------------------------------------------------------------------- #
+def measure(handler, warm_runs=5, stub=True, latency=0.0):
+    """
+    Import `handler` and invoke it once cold and `warm_runs` times warm,
+    in this (fresh) process. Returns timings in ms.
+    """
+    if stub:
+        # Before the import, so every session the handler creates carries the stub
+        StubNetwork(latency=latency, fleet=3).install()
+
+    started = time.perf_counter()
+    module = importlib.import_module(handler)
+    import_ms = (time.perf_counter() - started) * 1000
+
+    import overwatchCore as core
+
+    event = HANDLER_EVENTS[handler]
+    started = time.perf_counter()
+    status = module.lambda_handler(event, None)["statusCode"]
+    cold_ms = (time.perf_counter() - started) * 1000
+
+    warm = []
+    for _ in range(warm_runs):
+        started = time.perf_counter()
+        module.lambda_handler(event, None)
+        warm.append((time.perf_counter() - started) * 1000)
+
+    return {
+        "handler": handler,
+        "statusCode": status,
+        "importMs": round(import_ms, 2),
+        "coldInvokeMs": round(cold_ms, 2),
+        "warmInvokeMs": round(statistics.median(warm), 2) if warm else None,
+        "initMs": core.init_stats(),
+    }
+
+
+# --------------------------------------------------------------------------- #
+# Parent: Spawn and Collect
+# --------------------------------------------------------------------------- #
+def run_all(handlers, warm_runs=5, stub=True, latency=0.0):
+    results = []
+    for handler in handlers:
+        cmd = [sys.executable, __file__, "--child", handler, "--warm-runs", str(warm_runs),
+               "--latency", str(latency)] + ([] if stub else ["--live"])
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+        lines = [line[len(RESULT_PREFIX):] for line in proc.stdout.splitlines() if line.startswith(RESULT_PREFIX)]
+        if proc.returncode != 0 or not lines:
+            results.append({"handler": handler, "error": proc.stderr.strip().splitlines()[-1:] or "no output"})
+            continue
+        results.append(json.loads(lines[-1]))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure import, cold-invoke and warm-invoke cost per handler.")
+    parser.add_argument("handlers", nargs="*", default=list(HANDLER_EVENTS))
+    parser.add_argument("--warm-runs", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated seconds per stubbed AWS call")
+    parser.add_argument("--live", action="store_true", help="call real AWS instead of stubbed clients")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(RESULT_PREFIX + json.dumps(measure(args.child, args.warm_runs, not args.live, args.latency)))
+    else:
+        print(json.dumps(run_all(args.handlers, args.warm_runs, not args.live, args.latency), indent=2))
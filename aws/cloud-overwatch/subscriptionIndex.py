@@ -0,0 +1,69 @@
+import os
+import time
+import threading
+
+# How long the subscribed-email set is trusted across warm invocations
+INDEX_TTL_SECONDS = int(os.getenv("SUBSCRIPTION_INDEX_TTL_SECONDS", "900"))
+
+# Module-level index: topicArn -> {"emails": set, "loadedAt": float, "pages": int}
+_indexes = {}
+_lock = threading.Lock()
+
+STATS = {"listCalls": 0, "listCallsAvoided": 0, "hits": 0, "subscribed": 0, "reloads": 0}
+
+
+# --------------------------------------------------------------------------- #
+# Subscribed-Email Index
+# --------------------------------------------------------------------------- #
+def subscribed_emails(sns, topic_arn):
+    """Return the (lower-cased) set of email endpoints on the topic, listing it at most once per TTL."""
+    with _lock:
+        index = _indexes.get(topic_arn)
+        if index and time.monotonic() - index["loadedAt"] < INDEX_TTL_SECONDS:
+            # Answered from the index: that's a full topic pagination saved
+            STATS["listCallsAvoided"] += index["pages"]
+            return index["emails"]
+
+        emails, pages = set(), 0
+        paginator = sns.get_paginator("list_subscriptions_by_topic")
+        for page in paginator.paginate(TopicArn=topic_arn):
+            pages += 1
+            for sub in page["Subscriptions"]:
+                if sub["Protocol"] == "email":
+                    emails.add(sub["Endpoint"].lower())
+
+        STATS["listCalls"] += pages
+        STATS["reloads"] += 1
+        _indexes[topic_arn] = {"emails": emails, "loadedAt": time.monotonic(), "pages": pages}
+        return emails
+
+
+def ensure_subscription(sns, topic_arn, email):
+    """Subscribe email to the topic unless the index already has it. Returns True if a subscription was sent."""
+    emails = subscribed_emails(sns, topic_arn)
+    key = email.lower()
+    with _lock:
+        if key in emails:
+            STATS["hits"] += 1
+            return False
+
+    sns.subscribe(TopicArn=topic_arn, Protocol="email", Endpoint=email)
+    with _lock:
+        emails.add(key)
+        STATS["subscribed"] += 1
+    return True
+
+
+def invalidate(topic_arn=None):
+    with _lock:
+        if topic_arn:
+            _indexes.pop(topic_arn, None)
+        else:
+            _indexes.clear()
+
+
+def index_stats():
+    with _lock:
+        stats = dict(STATS)
+        stats["indexedEmails"] = sum(len(index["emails"]) for index in _indexes.values())
+    return stats